@@ -1,12 +1,30 @@
 # Script for scoring airfoils using csv generated using the sister tool, polar download tool
 # Written by Max Pollard 2022 maxpollardii@gmail.com for use by UTD DBF club
 import os
+import argparse
+import ast
+import contextlib
+import cProfile
+import csv
+import hashlib
+import json
 import regex
 import sys
-from tkinter import Label, Button, Tk
-from tkinter.filedialog import askdirectory, askopenfilename
-import requests
-from bs4 import BeautifulSoup
+import numpy
+import heapq
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from multiprocessing import shared_memory
+# resource is only on unix, peak memory isn't reported without it
+try:
+    import resource
+except ImportError:
+    resource = None
+# tkinter, requests and bs4 are imported where they are used instead of here, so runs that don't show a gui or look up
+# descriptions (the score command, scoring worker processes) don't spend their start up time importing them
 
 # Global dictionary for storing the index corresponding to each data type as it is stored in the CsvData alpha_value
 # dictionary
@@ -20,6 +38,70 @@ value_index_dict = {
     "bot_xtr": 6
 }
 
+# Values worked out once for every polar by compute_polar_metrics (see CsvData.polar_metric), each can be used in a
+# scoring equation by name
+POLAR_METRIC_NAMES = ["stall_angle", "cl_max", "cl_max_alpha", "cd_min", "max_cl_cd", "zero_lift_alpha",
+                      "cm_zero_lift"]
+
+# Range of the angle of attack grid polars are resampled onto when an alpha grid step is set (see AlphaGrid), the
+# polars from airfoiltools.com all fall inside this
+ALPHA_GRID_MIN = -20
+ALPHA_GRID_MAX = 20
+
+# Names of the files the polar store keeps inside the csv directory (see build_polar_store)
+POLAR_STORE_DIRECTORY_NAME = "polar_store"
+POLAR_STORE_HEADER_FILE_NAME = "header_table.json"
+POLAR_STORE_OFFSETS_FILE_NAME = "offsets.bin"
+POLAR_STORE_VERSION = 1
+
+# The metadata indexes find_airfoil_csvs filters with are kept in this folder next to analysis_settings.config, one file
+# for each csv directory, so nothing is written into the csv directories themselves (see PolarIndex)
+POLAR_INDEX_DIRECTORY_NAME = "polar_index"
+POLAR_INDEX_VERSION = 2
+
+# Airfoil descriptions are looked up from this page ({name} is replaced by the airfoil name) and cached in a file next to
+# analysis_settings.config so later runs don't need the network (see DescriptionCache)
+AIRFOIL_DETAILS_URL = "http://airfoiltools.com/airfoil/details?airfoil={name}"
+DESCRIPTION_CACHE_FILE_NAME = "description_cache.json"
+DESCRIPTION_CACHE_VERSION = 1
+DESCRIPTION_CACHE_EXPIRY_SECONDS = 30 * 24 * 60 * 60
+DESCRIPTION_LOOKUP_WORKERS = 8
+DESCRIPTION_REQUEST_TIMEOUT_SECONDS = 10
+# Longest displaying a list of airfoils will wait for their descriptions, anything not found by then is shown as None
+DESCRIPTION_WAIT_SECONDS = 5
+
+# Scores from earlier runs are kept in this folder next to analysis_settings.config, the least recently used equations
+# are deleted once it is bigger than SCORE_CACHE_MAX_BYTES (see ScoreCache)
+SCORE_CACHE_DIRECTORY_NAME = "score_cache"
+SCORE_CACHE_VERSION = 1
+SCORE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# Number of polars find_best_batch loads into each PolarBatch, the polars are scored a chunk at a time (and only the
+# best of them kept, see AirfoilRanking.add) so the batch's matrices don't grow with the number of polars being scored
+BATCH_CHUNK_POLARS = 1024
+
+# Number of csv files find_best_streaming reads ahead of the one being scored (see prefetch_polar_texts)
+STREAM_PREFETCH_COUNT = 32
+
+# Most scores FeatureMatrix.top_k_frequency works out at once (airfoils x weight samples), the samples are scored a few
+# at a time so a big sweep doesn't need an (airfoils x samples) array
+WEIGHT_SWEEP_CHUNK_SCORES = 4 * 1024 * 1024
+
+# Ways find_best_grouped can combine the scores of every polar of an airfoil into one, re_weighted is the mean weighted
+# by each polar's reynolds number
+GROUP_AGGREGATES = ["mean", "min", "re_weighted"]
+
+# Settings the score command uses when they aren't given as arguments or in a --config file, they let every polar
+# through (see headless_config_settings)
+HEADLESS_DEFAULT_SETTINGS = {"nCrit_num": 0, "reynolds_min": 0, "reynolds_max": 1000000, "thickness_min": 0,
+                             "thickness_max": 100, "camber_min": 0, "camber_max": 100}
+
+# Settings for the serve command (see run_server), how often the csv directory is checked for changed files and how many
+# PolarBatches are kept for the most recently requested filters (see ResidentPolars)
+SERVER_DEFAULT_PORT = 8765
+SERVER_POLL_SECONDS = 5
+SERVER_BATCH_CACHE_SIZE = 8
+
 config_template_string = "# Configuration settings for csv scoring analysis\n" \
 "# Absolute file path to the directory where the csv files are stored (In quotation marks)\n" \
 "# For example, csv_directory_path = \"C:\\Users\\maxpo\\Desktop\\csv edited folder\"\n" \
@@ -40,12 +122,17 @@ config_template_string = "# Configuration settings for csv scoring analysis\n" \
 "Camber_Min = {camber_min}%\n" \
 "Camber_Max = {camber_max}%\n\n" \
 "# For a hopefully thorough explanation of how to construct and format a scoring equation, please see the README.txt\n"\
-"Scoring_Equation = {scoring_equation}\n"
+"Scoring_Equation = {scoring_equation}\n\n" \
+"# Optional, set to a step in degrees (i.e. .25) to resample every polar onto one grid of angles of attack so norm() of\n" \
+"# lists compares every angle both polars cover instead of only the angles both have data for, 0 to turn off\n" \
+"Alpha_Grid_Step = {alpha_grid_step}\n"
 
 # Regex for extracting the name, reynolds num, ncrit num, etc. from csv file name
 AIRFOIL_NAME_CSV_REGEX = regex.compile(r"((?<=/)(\S*?)(?=_R_))")
 REYNOLDS_NUM_REGEX = regex.compile(r"((?<=_R_)(\S*?)(?=_N_))")
 N_CRIT_NUM_REGEX = regex.compile(r"((?<=_N_)(\S*?)(?=.csv))")
+# Same as AIRFOIL_NAME_CSV_REGEX but for a bare file name instead of a path
+AIRFOIL_NAME_FILE_REGEX = regex.compile(r"(^(\S*?)(?=_R_))")
 
 # Regex for extracting airfoil name from download link
 # AIRFOIL_NAME_LINK_REGEX = regex.compile("((?<=polar=)(\S*?)(?=-il-))")
@@ -66,6 +153,7 @@ CONFIG_THICKNESS_MAX_REGEX = regex.compile(r"((?<=\nthickness_max *= *)[\d.]*(?=
 CONFIG_CAMBER_MIN_REGEX = regex.compile(r"((?<=\ncamber_min *= )[\d.]*(?= *%? *\n))", regex.IGNORECASE)
 CONFIG_CAMBER_MAX_REGEX = regex.compile(r"((?<=\ncamber_max *= )[\d.]*(?= *%? *\n))", regex.IGNORECASE)
 CONFIG_EQUATION_STRING_REGEX = regex.compile("((?<=\nscoring_equation *= *)[^\n]*(?=$|\n))", regex.IGNORECASE)
+CONFIG_ALPHA_GRID_STEP_REGEX = regex.compile(r"((?<=\nalpha_grid_step *= *)[\d.]*(?= *(\n|$)))", regex.IGNORECASE)
 
 
 # Exception for when the equation can't be evaluated for whatever reason
@@ -76,6 +164,7 @@ class UnableToEvaluate(Exception):
 # Tkinter class that handles the prompting of the csv directory and the norming file
 class PromptFileGui:
     def __init__(self, master, prompt_type):
+        from tkinter import Label, Button
         self.prompt_return = None
         self.master = master
         self.master.title("Airfoil Scoring Tool")
@@ -97,24 +186,36 @@ class PromptFileGui:
             self.choose_file_button.pack()
 
     def prompt_directory(self):
+        from tkinter.filedialog import askdirectory
         self.prompt_return = askdirectory()
         self.master.quit()
 
     def prompt_file(self):
+        from tkinter.filedialog import askopenfilename
         self.prompt_return = askopenfilename()
         self.master.quit()
 
 
 # Class for storing an Airfoil
+# An Airfoil is made for every polar that gets scored, so it has __slots__ instead of a dictionary of attributes, and
+# csv_data is set back to None (see AirfoilRanking.add) once the airfoil can't make it into the best airfoils
 class Airfoil:
-    def __init__(self, name, file_path):
-        self.airfoil_details_link = f"http://airfoiltools.com/airfoil/details?airfoil={name}"
+    __slots__ = ("name", "file_path", "score", "description", "csv_data")
+
+    def __init__(self, name, file_path, polar_store=None, load_data=True, alpha_grid=None):
+        # load_data is False for airfoils that were already scored somewhere else (i.e. by a scoring worker) and only
+        # need to be displayed
         self.description = None
         self.score = None
         self.name = name
         self.file_path = file_path
-        if file_path is not None:
-            self.csv_data = CsvData(file_path)
+        self.csv_data = None
+        if file_path is not None and load_data:
+            self.csv_data = CsvData(file_path, polar_store, alpha_grid)
+
+    @property
+    def airfoil_details_link(self):
+        return AIRFOIL_DETAILS_URL.format(name=self.name)
 
     def __str__(self):
         if self.description is None:
@@ -130,107 +231,1002 @@ class Airfoil:
                "Score {score}\t File Path: {file_path}".format(name=self.name, description=self.description,
                                                                score=self.score, file_path=self.file_path)
 
-    def score_airfoil(self, parsed_equation_string, normed_airfoil_data):
-        self.score = self.csv_data.score_csv(parsed_equation_string, normed_airfoil_data)
+    def score_airfoil(self, parsed_equation, normed_airfoil_data):
+        # parsed_equation is either a CompiledEquation or a string from process_equation_string to be run with eval()
+        if isinstance(parsed_equation, CompiledEquation):
+            self.score = parsed_equation.score(self.csv_data)
+        else:
+            self.score = self.csv_data.score_csv(parsed_equation, normed_airfoil_data)
 
     def find_description(self):
+        # Only uses descriptions the description cache already has, displaying an airfoil never waits on the network
+        # (descriptions are looked up in the background by DescriptionCache.prefetch)
+        if airfoil_description_cache is not None:
+            self.description = airfoil_description_cache.cached_description(self.name)
+
+
+# Airfoil descriptions from airfoiltools.com, looked up concurrently by a pool of threads and kept in a json file so
+# later runs don't need the network. Cached descriptions are looked up again after expiry_seconds
+# Failed lookups aren't cached so they get tried again next time
+class DescriptionCache:
+    def __init__(self, cache_file_path, details_url=AIRFOIL_DETAILS_URL, expiry_seconds=DESCRIPTION_CACHE_EXPIRY_SECONDS,
+                 workers=DESCRIPTION_LOOKUP_WORKERS):
+        self.cache_file_path = cache_file_path
+        self.details_url = details_url
+        self.expiry_seconds = expiry_seconds
+        self.workers = workers
+        # Dictionary pairing each airfoil name with [description, time it was looked up], description is None for
+        # airfoils whose page has no description
+        self.descriptions = {}
+        # Lookups that have been started but might not be finished yet, by airfoil name
+        self.pending_lookups = {}
+        self.lookup_pool = None
+        self.lock = threading.Lock()
+        self.unsaved_changes = False
+        self.load()
+
+    def load(self):
         try:
-            airfoil_description_soup = BeautifulSoup(requests.get(self.airfoil_details_link).content, "html.parser")
-            airfoil_description_class = airfoil_description_soup.find("td", {'class': 'cell1'})
-            if airfoil_description_class is None:
-                print(f"No airfoil description class found for {self.name}")
-            else:
-                try:
-                    self.description = (str(airfoil_description_class).split('<br/>')[1])
-                except IndexError:
-                    print("No Description found in airfoil description class")
-        except requests.exceptions.RequestException:
-            print(f"Description could not be parsed from airfoil {self.name}")
+            with open(self.cache_file_path, "r") as cache_file:
+                cache_table = json.load(cache_file)
+        except (OSError, ValueError):
+            return
+        if cache_table.get("version") != DESCRIPTION_CACHE_VERSION:
+            return
+        self.descriptions = cache_table["descriptions"]
+
+    def save(self):
+        with self.lock:
+            if not self.unsaved_changes:
+                return
+            cache_table = {"version": DESCRIPTION_CACHE_VERSION, "descriptions": dict(self.descriptions)}
+            self.unsaved_changes = False
+        try:
+            with open(self.cache_file_path + ".tmp", "w") as cache_file:
+                json.dump(cache_table, cache_file)
+            os.replace(self.cache_file_path + ".tmp", self.cache_file_path)
+        except OSError:
+            print(f"Airfoil descriptions could not be saved to {self.cache_file_path}")
+
+    def is_cached(self, airfoil_name):
+        cached_entry = self.descriptions.get(airfoil_name)
+        return cached_entry is not None and time.time() - cached_entry[1] < self.expiry_seconds
+
+    def cached_description(self, airfoil_name):
+        # Description of the airfoil if it has been looked up, otherwise None
+        cached_entry = self.descriptions.get(airfoil_name)
+        return None if cached_entry is None else cached_entry[0]
+
+    def look_up_description(self, airfoil_name):
+        # Runs in the lookup threads, reads the description off of the airfoil's details page
+        import requests
+        from bs4 import BeautifulSoup
+        with profile_stage("description lookup"):
+            count_event("http_requests")
+            try:
+                airfoil_details_page = requests.get(self.details_url.format(name=airfoil_name),
+                                                    timeout=DESCRIPTION_REQUEST_TIMEOUT_SECONDS)
+                airfoil_details_page.raise_for_status()
+            except requests.exceptions.RequestException:
+                count_event("http_errors")
+                return
+            count_event("bytes_downloaded", len(airfoil_details_page.content))
+        airfoil_description_soup = BeautifulSoup(airfoil_details_page.content, "html.parser")
+        airfoil_description_class = airfoil_description_soup.find("td", {'class': 'cell1'})
+        description = None
+        if airfoil_description_class is not None:
+            description_parts = str(airfoil_description_class).split('<br/>')
+            if len(description_parts) > 1:
+                description = description_parts[1]
+        with self.lock:
+            self.descriptions[airfoil_name] = [description, time.time()]
+            self.unsaved_changes = True
+
+    def prefetch(self, airfoil_names):
+        # Starts looking up every airfoil that isn't cached or already being looked up, returns without waiting
+        with self.lock:
+            for airfoil_name in airfoil_names:
+                if self.is_cached(airfoil_name) or airfoil_name in self.pending_lookups:
+                    continue
+                if self.lookup_pool is None:
+                    self.lookup_pool = ThreadPoolExecutor(self.workers)
+                self.pending_lookups[airfoil_name] = self.lookup_pool.submit(self.look_up_description, airfoil_name)
+
+    def wait_for(self, airfoil_names, timeout=DESCRIPTION_WAIT_SECONDS):
+        # Looks up these airfoils if they haven't been already and waits up to timeout seconds for them to be found
+        self.prefetch(airfoil_names)
+        with self.lock:
+            lookups = [self.pending_lookups[airfoil_name] for airfoil_name in airfoil_names
+                       if airfoil_name in self.pending_lookups]
+        if lookups:
+            wait(lookups, timeout)
+        with self.lock:
+            for airfoil_name in [name for name, lookup in self.pending_lookups.items() if lookup.done()]:
+                del self.pending_lookups[airfoil_name]
+        self.save()
+
+    def close(self):
+        # Lookups that haven't started are dropped, ones that are running are left to time out on their own
+        if self.lookup_pool is not None:
+            self.lookup_pool.shutdown(wait=False, cancel_futures=True)
+        self.save()
+
+
+# Shared by every Airfoil for finding descriptions, None (no descriptions) unless the program sets one up in __main__
+airfoil_description_cache = None
+
+
+# Times and counts what each stage of a scoring run does, for finding out where the time of a slow run goes
+# Stages are entered with profile_stage and can be nested, a stage inside another is reported as "outer/inner" and
+# everything it counts is counted for the stages around it too. Each thread has its own stack of stages (description
+# lookups run in their own threads), scoring worker processes aren't covered
+class RunProfiler:
+    def __init__(self):
+        # Dictionary pairing each stage name with its calls, wall and cpu seconds, peak memory and counters
+        self.stages = {}
+        self.thread_state = threading.local()
+        self.lock = threading.Lock()
+        self.start_time = time.perf_counter()
+
+    def stage_stack(self):
+        if not hasattr(self.thread_state, "stage_stack"):
+            self.thread_state.stage_stack = []
+        return self.thread_state.stage_stack
+
+    def stage_record(self, stage_name):
+        if stage_name not in self.stages:
+            self.stages[stage_name] = {"calls": 0, "wall_seconds": 0.0, "cpu_seconds": 0.0, "peak_memory_bytes": None,
+                                       "counters": {}}
+        return self.stages[stage_name]
+
+    @contextlib.contextmanager
+    def stage(self, stage_name):
+        stage_stack = self.stage_stack()
+        if len(stage_stack) > 0:
+            stage_name = stage_stack[-1] + "/" + stage_name
+        stage_stack.append(stage_name)
+        start_wall_time = time.perf_counter()
+        # Thread time so stages in the description lookup threads don't get the main thread's cpu time
+        start_cpu_time = time.thread_time()
+        try:
+            yield
+        finally:
+            wall_seconds = time.perf_counter() - start_wall_time
+            cpu_seconds = time.thread_time() - start_cpu_time
+            stage_stack.pop()
+            with self.lock:
+                stage_record = self.stage_record(stage_name)
+                stage_record["calls"] += 1
+                stage_record["wall_seconds"] += wall_seconds
+                stage_record["cpu_seconds"] += cpu_seconds
+                stage_record["peak_memory_bytes"] = peak_memory_bytes()
+
+    def count(self, counter_name, amount=1):
+        # Adds to the counter of every stage this thread is in, or "outside stages" if it isn't in any
+        stage_stack = self.stage_stack()
+        with self.lock:
+            for stage_name in stage_stack or ["outside stages"]:
+                stage_counters = self.stage_record(stage_name)["counters"]
+                stage_counters[counter_name] = stage_counters.get(counter_name, 0) + amount
+
+    def report(self):
+        with self.lock:
+            return {"wall_seconds": time.perf_counter() - self.start_time,
+                    "cpu_seconds": time.process_time(),
+                    "peak_memory_bytes": peak_memory_bytes(),
+                    "stages": {stage_name: dict(stage_record, counters=dict(stage_record["counters"]))
+                               for stage_name, stage_record in self.stages.items()}}
+
+    def write_report(self, report_file_path):
+        try:
+            with open(report_file_path, "w") as report_file:
+                json.dump(self.report(), report_file, indent=1)
+            print(f"Profiling report written to {report_file_path}")
+        except OSError:
+            print(f"Profiling report could not be written to {report_file_path}")
 
 
-# Class for parsing and storing the values of an airfoil simulation
-class CsvData:
-    def __init__(self, csv_file_path):
-        self.csv_file_path = csv_file_path
-        self.parse_values_return = self.parse_values()
-        self.alpha_value_dict = self.parse_values_return[1]
-        self.alpha_list = self.parse_values_return[0]
-        self.max_Cl_Cd = self.parse_values_return[2]
-        self.max_Cl_Cd_Alpha = self.parse_values_return[3]
+# Highest memory use of this process so far in bytes, None where it can't be found (windows)
+def peak_memory_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on linux and bytes on mac
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
 
-    def parse_values(self):
-        # Opens the scv, returns the tasty goodies
-        csv_file = open(self.csv_file_path, "r")
 
-        # List of every angle of attack for which this airfoil has data
-        alpha_list = []
+# None unless the program was started with --profile-report (see RunProfiler), everything below does nothing then
+run_profiler = None
+
+# Totals of every counter over the whole run, kept whether or not the run is profiled (find_best reports how many polars
+# came out of the polar store with them, see print_polar_sources)
+event_counts = {}
+event_counts_lock = threading.Lock()
+
+
+def profile_stage(stage_name):
+    if run_profiler is None:
+        return contextlib.nullcontext()
+    return run_profiler.stage(stage_name)
+
 
-        # Dictionary with the key being the angle of attack and the value being a list of all values
-        # (angle of attack, Cl, etc)
-        alpha_value_dict = {}
+def count_event(counter_name, amount=1):
+    with event_counts_lock:
+        event_counts[counter_name] = event_counts.get(counter_name, 0) + amount
+    if run_profiler is not None:
+        run_profiler.count(counter_name, amount)
 
-        # Starts at the 14th line (The original download starts at 12 but the polar download tool I made adds
-        # Max thickness and camber so new beginning is 14)
-        current_line_index = 13
 
-        all_lines = csv_file.readlines()
-        num_lines = len(all_lines)
+# Says how many of the polars loaded since counts_before (a copy of event_counts) were read out of the polar store and
+# how many were parsed from their csv file
+def print_polar_sources(counts_before):
+    polar_counts = [event_counts.get(counter_name, 0) - counts_before.get(counter_name, 0)
+                    for counter_name in ["polars_from_store", "polars_from_csv"]]
+    print(f"{polar_counts[0]} polars read from the polar store, {polar_counts[1]} parsed from their csv files")
 
-        if all_lines[0][0:12] != "Xfoil polar.":
-            # This means that this is not an airfoil data file in the format for which this script is written
-            raise IndexError
 
-        max_Cl_Cd = all_lines[6].split(',')[1]
-        max_Cl_Cd_Alpha = all_lines[7].split(',')[1]
+# Writes the --profile-report json and the --profile-dump cProfile stats (for pstats or snakeviz) at the end of a run,
+# either can be None if it wasn't asked for
+def finish_profiling(report_file_path, function_profiler, dump_file_path):
+    if function_profiler is not None:
+        function_profiler.disable()
+        try:
+            function_profiler.dump_stats(dump_file_path)
+            print(f"cProfile stats written to {dump_file_path}")
+        except OSError:
+            print(f"cProfile stats could not be written to {dump_file_path}")
+    if run_profiler is not None:
+        run_profiler.write_report(report_file_path)
+
+
+# Scores from earlier runs, so scoring the same polars with the same equation again only scores the polars that changed
+# Each scoring equation + norming airfoil (+ alpha grid) gets its own entry file, named by a hash of the equation's
+# syntax tree (so spacing, capitalization and extra parentheses don't matter), the contents of the norming airfoil's
+# csv and the alpha grid step. An entry keeps the score of every polar it has scored (None if it couldn't be scored)
+# with the size and modification time the csv had, so a polar that changes is scored again
+# Entry files are touched whenever they are used, once the folder is bigger than max_bytes the least recently used
+# entries are deleted
+class ScoreCache:
+    entry_fields = ["file_paths", "file_sizes", "file_mtimes", "scores"]
+
+    def __init__(self, cache_directory_path, max_bytes=SCORE_CACHE_MAX_BYTES):
+        self.cache_directory_path = cache_directory_path
+        self.max_bytes = max_bytes
+
+    def entry_key(self, given_equation_string, norm_file_path, alpha_grid=None):
+        # Returns None if the equation can't be parsed (those aren't cached)
+        try:
+            equation_tree = ast.parse(given_equation_string.replace(" ", "").lower(), mode="eval")
+            norm_file_hash = hash_polar_file(norm_file_path)
+        except (SyntaxError, ValueError, OSError):
+            return None
+        key_text = "\n".join([str(SCORE_CACHE_VERSION), ast.dump(equation_tree), norm_file_hash,
+                              "off" if alpha_grid is None else repr(alpha_grid.alpha_step)])
+        return hashlib.blake2b(key_text.encode(), digest_size=16).hexdigest()
 
-        while current_line_index < num_lines:
-            line_tokens = regex.split(r',', all_lines[current_line_index])
+    def entry_file_path(self, entry_key):
+        return os.path.join(self.cache_directory_path, entry_key + ".json")
+
+    def load_entry(self, entry_key):
+        # Dictionary pairing each file path in the entry with [file size, file modification time, score]
+        try:
+            with open(self.entry_file_path(entry_key), "r") as entry_file:
+                entry_table = json.load(entry_file)
+        except (OSError, ValueError):
+            return {}
+        if entry_table.get("version") != SCORE_CACHE_VERSION:
+            return {}
+        return {field_values[0]: list(field_values[1:])
+                for field_values in zip(*(entry_table[field] for field in self.entry_fields))}
+
+    def cached_scores(self, entry_key, csv_file_paths):
+        # Returns a dictionary of the cached score of every csv that hasn't changed since it was scored, and a list of
+        # the csv files that need to be scored
+        entry = self.load_entry(entry_key)
+        cached_scores = {}
+        unscored_file_paths = []
+        for file_path in csv_file_paths:
+            cached_score = entry.get(file_path)
             try:
-                alpha_value_dict[float(line_tokens[0])] = tuple((float(line_tokens[index]) for index in range(0, 7)))
-                alpha_list.append(float(line_tokens[0]))
+                file_stat = os.stat(file_path)
+            except OSError:
+                cached_score = None
+            if cached_score is not None and cached_score[0] == file_stat.st_size and \
+                    cached_score[1] == file_stat.st_mtime_ns:
+                cached_scores[file_path] = cached_score[2]
+            else:
+                unscored_file_paths.append(file_path)
+        if len(entry) > 0:
+            self.touch(entry_key)
+        return cached_scores, unscored_file_paths
+
+    def store_scores(self, entry_key, file_scores):
+        # Adds the scores in file_scores (file path: score or None) to the entry, then evicts old entries if needed
+        entry = self.load_entry(entry_key)
+        for file_path, score in file_scores.items():
+            try:
+                file_stat = os.stat(file_path)
+            except OSError:
+                continue
+            entry[file_path] = [file_stat.st_size, file_stat.st_mtime_ns, score]
+        file_paths = sorted(entry)
+        entry_table = {"version": SCORE_CACHE_VERSION,
+                       "file_paths": file_paths,
+                       "file_sizes": [entry[file_path][0] for file_path in file_paths],
+                       "file_mtimes": [entry[file_path][1] for file_path in file_paths],
+                       "scores": [entry[file_path][2] for file_path in file_paths]}
+        try:
+            os.makedirs(self.cache_directory_path, exist_ok=True)
+            with open(self.entry_file_path(entry_key) + ".tmp", "w") as entry_file:
+                json.dump(entry_table, entry_file)
+            os.replace(self.entry_file_path(entry_key) + ".tmp", self.entry_file_path(entry_key))
+        except OSError:
+            print(f"Scores could not be saved to {self.cache_directory_path}")
+            return
+        self.evict(entry_key)
+
+    def touch(self, entry_key):
+        try:
+            os.utime(self.entry_file_path(entry_key))
+        except OSError:
+            pass
 
-            except ValueError:
-                print(f"Error reading line {current_line_index} in {self.csv_file_path}")
-            current_line_index += 1
+    def evict(self, kept_entry_key=None):
+        # Deletes the least recently used entries (never kept_entry_key) until the folder fits in max_bytes
+        try:
+            with os.scandir(self.cache_directory_path) as directory_entries:
+                entry_stats = [(directory_entry.stat().st_mtime_ns, directory_entry.stat().st_size, directory_entry.path)
+                               for directory_entry in directory_entries if directory_entry.name[-5:] == ".json"]
+        except OSError:
+            return
+        total_bytes = sum(entry_size for _, entry_size, _ in entry_stats)
+        kept_file_path = None if kept_entry_key is None else self.entry_file_path(kept_entry_key)
+        for _, entry_size, entry_file_path in sorted(entry_stats):
+            if total_bytes <= self.max_bytes:
+                break
+            if entry_file_path == kept_file_path:
+                continue
+            try:
+                os.remove(entry_file_path)
+                total_bytes -= entry_size
+            except OSError:
+                pass
+
+
+# Reads an xfoil polar csv, returns (value_rows, header_values, malformed_line_indices)
+# value_rows is an (n, 7) float array of every data row with its columns in the same order as value_index_dict,
+# header_values is (max Cl/Cd, max Cl/Cd alpha, max thickness, max camber) and malformed_line_indices are the lines that
+# couldn't be read as 7 numbers (they are left out of value_rows and printed)
+# The data block is parsed all at once by numpy, only files with a malformed row get read line by line
+def read_polar_csv(csv_file_path, csv_text=None):
+    # csv_text is the contents of the file if it has already been read (see find_best_streaming)
+    if csv_text is None:
+        with open(csv_file_path, "r") as csv_file:
+            csv_text = csv_file.read()
+        count_event("files_opened")
+        count_event("bytes_read", len(csv_text))
+    all_lines = csv_text.split("\n")
+
+    if all_lines[0][0:12] != "Xfoil polar.":
+        # This means that this is not an airfoil data file in the format for which this script is written
+        raise IndexError
+
+    max_Cl_Cd = float(all_lines[6].split(',')[1])
+    max_Cl_Cd_Alpha = float(all_lines[7].split(',')[1])
+    try:
+        max_thickness = float(all_lines[8].split(',')[1])
+        max_camber = float(all_lines[9].split(',')[1])
+    except (ValueError, IndexError):
+        print(f"Error parsing max thickness or max camber for {csv_file_path}")
+        max_thickness = None
+        max_camber = None
+    header_values = (max_Cl_Cd, max_Cl_Cd_Alpha, max_thickness, max_camber)
+
+    # Starts at the 14th line (The original download starts at 12 but the polar download tool adds Max thickness and
+    # camber so new beginning is 14), the empty string after the last newline is skipped by loadtxt
+    data_lines = all_lines[13:]
+    malformed_line_indices = []
+    try:
+        value_rows = numpy.loadtxt(data_lines, delimiter=',', usecols=range(len(value_index_dict)), comments=None,
+                                   ndmin=2)
+    except ValueError:
+        value_row_list = []
+        for line_index, data_line in enumerate(data_lines, 13):
+            if data_line == "" and line_index == len(all_lines) - 1:
+                continue
+            line_tokens = data_line.split(',')
+            try:
+                value_row_list.append([float(line_tokens[column_index]) for column_index in value_index_dict.values()])
+            except (ValueError, IndexError):
+                print(f"Error reading line {line_index} in {csv_file_path}")
+                malformed_line_indices.append(line_index)
+        value_rows = numpy.array(value_row_list, dtype=numpy.float64).reshape(-1, len(value_index_dict))
+    count_event("rows_parsed", len(value_rows))
+    return value_rows, header_values, malformed_line_indices
+
+
+# Works out every polar metric (POLAR_METRIC_NAMES) for one polar from its columns in a single numpy pass, returns a
+# dictionary of them plus stall_angle_found. Anything a polar doesn't have (i.e. no zero lift angle because the Cl never
+# crosses 0) is nan, so equations using it can't score that polar
+def compute_polar_metrics(value_columns, max_Cl_Cd):
+    polar_metrics = {metric_name: float("nan") for metric_name in POLAR_METRIC_NAMES}
+    polar_metrics["max_cl_cd"] = float("nan") if max_Cl_Cd is None else float(max_Cl_Cd)
+    polar_metrics["stall_angle_found"] = False
+    alphas = numpy.asarray(value_columns[value_index_dict["alpha"]])
+    if len(alphas) == 0:
+        return polar_metrics
+    Cl_column = numpy.asarray(value_columns[value_index_dict["cl"]])
+    Cd_column = numpy.asarray(value_columns[value_index_dict["cd"]])
+    Cm_column = numpy.asarray(value_columns[value_index_dict["cm"]])
+
+    # Same as find_stall_angle used to do: the first angle of attack where the Cl is positive and lower than the Cl
+    # before it, or the last angle of attack if there isn't one
+    stall_rows = numpy.flatnonzero((Cl_column[:-1] > Cl_column[1:]) & (Cl_column[1:] > 0))
+    polar_metrics["stall_angle_found"] = len(stall_rows) > 0
+    polar_metrics["stall_angle"] = float(alphas[stall_rows[0] + 1] if len(stall_rows) > 0 else alphas[-1])
+
+    Cl_max_row = int(numpy.argmax(Cl_column))
+    polar_metrics["cl_max"] = float(Cl_column[Cl_max_row])
+    polar_metrics["cl_max_alpha"] = float(alphas[Cl_max_row])
+    polar_metrics["cd_min"] = float(numpy.min(Cd_column))
+
+    # Zero lift angle and the Cm there are interpolated between the two angles of attack where the Cl first goes from
+    # 0 or less to above 0
+    crossing_rows = numpy.flatnonzero((Cl_column[:-1] <= 0) & (Cl_column[1:] > 0))
+    if len(crossing_rows) > 0:
+        row = crossing_rows[0]
+        crossing_fraction = -Cl_column[row] / (Cl_column[row + 1] - Cl_column[row])
+        polar_metrics["zero_lift_alpha"] = float(alphas[row] + crossing_fraction * (alphas[row + 1] - alphas[row]))
+        polar_metrics["cm_zero_lift"] = float(Cm_column[row] + crossing_fraction * (Cm_column[row + 1] - Cm_column[row]))
+    return polar_metrics
+
+
+# Fixed grid of angles of attack (every alpha_step degrees from ALPHA_GRID_MIN to ALPHA_GRID_MAX) that polars can be
+# resampled onto by linear interpolation, so that every polar has values at the same angles of attack and lining two
+# polars up is just finding where their ranges overlap (see CsvData.norm_alignment)
+# Each polar only gets values for the grid points inside its own range of angles of attack. Resampled columns are kept
+# by csv file path, so a polar is only ever resampled once per run no matter how many times it is loaded
+class AlphaGrid:
+    def __init__(self, alpha_step, alpha_min=ALPHA_GRID_MIN, alpha_max=ALPHA_GRID_MAX):
+        self.alpha_step = alpha_step
+        # Rounded so grid points land exactly on the angles of attack in the csvs (3 * .1 isn't .3 otherwise)
+        first_step = int(numpy.ceil(alpha_min / alpha_step - 1e-9))
+        last_step = int(numpy.floor(alpha_max / alpha_step + 1e-9))
+        self.alpha_values = numpy.round(numpy.arange(first_step, last_step + 1) * alpha_step, 9)
+        self.resampled_polars = {}
+
+    def resample(self, csv_file_path, value_columns):
+        # Returns the index of the first grid point inside the polar's range and the polar's columns resampled onto the
+        # grid points from there to the end of its range (the alpha column is those grid points)
+        if csv_file_path not in self.resampled_polars:
+            alpha_column = numpy.asarray(value_columns[0])
+            if len(alpha_column) == 0:
+                self.resampled_polars[csv_file_path] = (0, tuple(numpy.zeros((len(value_columns), 0))))
+                return self.resampled_polars[csv_file_path]
+            sort_order = None if numpy.all(alpha_column[1:] >= alpha_column[:-1]) \
+                else numpy.argsort(alpha_column, kind="stable")
+            sorted_columns = [numpy.asarray(column) if sort_order is None else numpy.asarray(column)[sort_order]
+                              for column in value_columns]
+            first_index = int(numpy.searchsorted(self.alpha_values, sorted_columns[0][0] - 1e-9, "left"))
+            end_index = int(numpy.searchsorted(self.alpha_values, sorted_columns[0][-1] + 1e-9, "right"))
+            grid_alphas = self.alpha_values[first_index:max(first_index, end_index)]
+            # The resampled columns are the rows of one array, so each polar kept here is a single block of memory
+            resampled_values = numpy.empty((len(sorted_columns), len(grid_alphas)))
+            resampled_values[0] = grid_alphas
+            for column_index in range(1, len(sorted_columns)):
+                resampled_values[column_index] = numpy.interp(grid_alphas, sorted_columns[0],
+                                                              sorted_columns[column_index])
+            self.resampled_polars[csv_file_path] = (first_index, tuple(resampled_values))
+        return self.resampled_polars[csv_file_path]
 
-        csv_file.close()
-        return [alpha_list, alpha_value_dict, max_Cl_Cd, max_Cl_Cd_Alpha]
+
+# Class for parsing and storing the values of an airfoil simulation
+# Every polar's values are one block of memory, value_columns are views of its rows (or slices of the polar store's
+# columns) and alpha_list and alpha_value_dict are only made if something asks for them
+class CsvData:
+    __slots__ = ("csv_file_path", "value_columns", "max_Cl_Cd", "max_Cl_Cd_Alpha", "max_thickness", "max_camber",
+                 "alpha_grid", "alpha_grid_start", "_alpha_list", "_alpha_value_dict", "_alpha_sort_order",
+                 "_norm_alignment_csv_data", "_norm_alignment", "_polar_metrics")
+
+    def __init__(self, csv_file_path, polar_store=None, alpha_grid=None, csv_text=None):
+        self.csv_file_path = csv_file_path
+        self._alpha_list = None
+        self._alpha_value_dict = None
+        self._alpha_sort_order = None
+        self._norm_alignment_csv_data = None
+        self._norm_alignment = None
+        self._polar_metrics = None
+        self.alpha_grid = None
+        self.alpha_grid_start = None
+
+        # If the polar has been packed into a polar store (and hasn't changed since), the columns are read straight
+        # out of the memory mapped store instead of parsing the csv
+        polar_index = None if polar_store is None else polar_store.find_polar(csv_file_path)
+        if polar_index is not None:
+            count_event("polars_from_store")
+            self.value_columns = polar_store.polar_columns(polar_index)
+            polar_header = polar_store.polar_header(polar_index)
+            self.max_Cl_Cd = polar_header["max_cl_cd"]
+            self.max_Cl_Cd_Alpha = polar_header["max_cl_cd_alpha"]
+            self.max_thickness = polar_header["max_thickness"]
+            self.max_camber = polar_header["max_camber"]
+            # Stores made before metrics were added don't have them, they are worked out from the columns instead
+            if "metrics" in polar_header:
+                self._polar_metrics = {metric_name: float("nan") if metric_value is None else metric_value
+                                       for metric_name, metric_value in polar_header["metrics"].items()}
+        else:
+            count_event("polars_from_csv")
+            value_rows, header_values, _ = read_polar_csv(csv_file_path, csv_text)
+            self.max_Cl_Cd, self.max_Cl_Cd_Alpha, self.max_thickness, self.max_camber = header_values
+
+            # Repeated angles of attack use the values of the last row with that angle (like alpha_value_dict), polars
+            # are almost always sorted so this is only checked for when they aren't
+            alphas = value_rows[:, 0]
+            if not numpy.all(alphas[1:] > alphas[:-1]):
+                last_row_index_dict = {alpha: row_index for row_index, alpha in enumerate(alphas.tolist())}
+                value_rows = value_rows[[last_row_index_dict[alpha] for alpha in alphas.tolist()]]
+
+            # One array per column (alpha, cl, cd, etc.) in the same order as value_index_dict
+            self.value_columns = tuple(numpy.ascontiguousarray(value_rows.T))
+
+        if alpha_grid is not None:
+            self.resample(alpha_grid)
+
+    @classmethod
+    def from_value_columns(cls, csv_file_path, value_columns, max_Cl_Cd, max_Cl_Cd_Alpha, max_thickness, max_camber,
+                           alpha_grid=None, alpha_grid_start=None):
+        # Makes a CsvData out of columns that have already been loaded (i.e. from shared memory) without reading the csv
+        # Columns that were already resampled onto an alpha grid are passed with that grid and where on it they start
+        csv_data = cls.__new__(cls)
+        csv_data.csv_file_path = csv_file_path
+        csv_data._alpha_list = None
+        csv_data._alpha_value_dict = None
+        csv_data._alpha_sort_order = None
+        csv_data._norm_alignment_csv_data = None
+        csv_data._norm_alignment = None
+        csv_data._polar_metrics = None
+        csv_data.alpha_grid = alpha_grid
+        csv_data.alpha_grid_start = alpha_grid_start
+        csv_data.value_columns = tuple(value_columns)
+        csv_data.max_Cl_Cd = max_Cl_Cd
+        csv_data.max_Cl_Cd_Alpha = max_Cl_Cd_Alpha
+        csv_data.max_thickness = max_thickness
+        csv_data.max_camber = max_camber
+        return csv_data
+
+    @property
+    def alpha_list(self):
+        # List of every angle of attack for which this airfoil has data (built from the alpha column when this polar
+        # was loaded from a polar store)
+        if self._alpha_list is None:
+            self._alpha_list = self.value_columns[0].tolist()
+        return self._alpha_list
+
+    @property
+    def alpha_value_dict(self):
+        # Dictionary with the key being the angle of attack and the value being a tuple of all values at that angle
+        if self._alpha_value_dict is None:
+            self._alpha_value_dict = {value_row[0]: value_row
+                                      for value_row in zip(*(column.tolist() for column in self.value_columns))}
+        return self._alpha_value_dict
+
+    def parse_values(self):
+        # Opens the scv, returns the tasty goodies
+        # [alpha_list, alpha_value_dict, max_Cl_Cd, max_Cl_Cd_Alpha, max_thickness, max_camber]
+        value_rows, header_values, _ = read_polar_csv(self.csv_file_path)
+        alpha_list = value_rows[:, 0].tolist()
+        alpha_value_dict = {value_row[0]: tuple(value_row) for value_row in value_rows.tolist()}
+        return [alpha_list, alpha_value_dict, *header_values]
+
+    @property
+    def polar_metrics(self):
+        # Dictionary of every metric in POLAR_METRIC_NAMES, worked out once (or read from the polar store)
+        if self._polar_metrics is None:
+            self._polar_metrics = compute_polar_metrics(self.value_columns, self.max_Cl_Cd)
+        return self._polar_metrics
+
+    def polar_metric(self, metric_name):
+        # Raises UnableToEvaluate for metrics this polar doesn't have (i.e. the Cl never crosses 0 for zero_lift_alpha)
+        if metric_name == "stall_angle":
+            return self.find_stall_angle()
+        metric_value = self.polar_metrics[metric_name]
+        if numpy.isnan(metric_value):
+            raise UnableToEvaluate(f"{metric_name} could not be found for {self.csv_file_path}")
+        return metric_value
+
+    def metric_value(self, metric_index):
+        # polar_metric by its index in POLAR_METRIC_NAMES (equations evaluated with eval() use this, because the metric
+        # names would get mixed up with the column names)
+        return self.polar_metric(POLAR_METRIC_NAMES[metric_index])
 
     def find_stall_angle(self):
-        # Iterates through the angles of attack, finds first angle of attack where the Cl is lower than the last
+        # First angle of attack where the Cl is lower than the last (see compute_polar_metrics)
         # If a stall angle is negative, probably a sailplane airfoil lmao
-        previous_Cl = self.alpha_value_dict[self.alpha_list[0]][1]
-
-        for angle in self.alpha_list:
-            current_Cl = (self.alpha_value_dict[angle])[1]
-            if previous_Cl > current_Cl > 0:
-                return angle
-            previous_Cl = current_Cl
-        print(f"No stall angle could be found for airfoil at {self.csv_file_path} so the maximum angle of attack for \n"
-              f"which there is data was used instead")
-        return self.alpha_list[-1]
+        if len(self.value_columns[0]) == 0:
+            raise IndexError(f"No data to find a stall angle from in {self.csv_file_path}")
+        if not self.polar_metrics["stall_angle_found"]:
+            print(f"No stall angle could be found for airfoil at {self.csv_file_path} so the maximum angle of attack for \n"
+                  f"which there is data was used instead")
+        return self.polar_metrics["stall_angle"]
 
     def alpha_norm_tuple(self, norm_csv_data):
         # Makes a new list of angles of attack that are shared between this airfoil and the
-        # norming airfoil for a fair comparison (same value dict can be used... yay dictionaries)
-        alpha_tuple_normed = (angle for angle in norm_csv_data.alpha_list if angle in self.alpha_list)
-        return alpha_tuple_normed
+        # norming airfoil for a fair comparison (in the norming airfoil's order, see norm_alignment)
+        _, norm_rows = self.norm_alignment(norm_csv_data)
+        return tuple(norm_csv_data.value_columns[0][norm_rows].tolist())
 
     def score_csv(self, parsed_equation_string, normed_airfoil_data):
+        count_event("evaluations")
         try:
             return eval(parsed_equation_string)
         except Exception as e:
+            count_event("exceptions_swallowed")
             print("CSV could not be scored\nError Output:")
             print(repr(e))
             return None
 
+    def alpha_rows(self, alpha_values):
+        # Row index of each angle of attack in alpha_values, found with a binary search of the (sorted) alpha column
+        # Returns the rows and a mask of which angles of attack this airfoil actually has data for
+        alpha_column = self.value_columns[0]
+        if self._alpha_sort_order is None:
+            # Polars are almost always already sorted, unsorted ones are searched through a sorted order instead
+            self._alpha_sort_order = False if numpy.all(alpha_column[1:] >= alpha_column[:-1]) \
+                else numpy.argsort(alpha_column, kind="stable")
+        sorted_alphas = alpha_column if self._alpha_sort_order is False else alpha_column[self._alpha_sort_order]
+
+        sorted_rows = numpy.minimum(numpy.searchsorted(sorted_alphas, alpha_values), max(len(sorted_alphas) - 1, 0))
+        found_mask = sorted_alphas[sorted_rows] == alpha_values if len(sorted_alphas) > 0 \
+            else numpy.zeros(len(alpha_values), dtype=bool)
+        rows = sorted_rows if self._alpha_sort_order is False else self._alpha_sort_order[sorted_rows]
+        return rows.astype(numpy.intp), found_mask
+
+    def resample(self, alpha_grid):
+        # Replaces the columns with the polar resampled onto alpha_grid (see AlphaGrid), metrics are still worked out
+        # from the polar's own data
+        if self._polar_metrics is None:
+            self._polar_metrics = compute_polar_metrics(self.value_columns, self.max_Cl_Cd)
+        self.alpha_grid_start, self.value_columns = alpha_grid.resample(self.csv_file_path, self.value_columns)
+        self.alpha_grid = alpha_grid
+        self._alpha_list = None
+        self._alpha_value_dict = None
+        self._alpha_sort_order = False
+        self._norm_alignment_csv_data = None
+
+    def norm_alignment(self, norm_csv_data):
+        # Row indices of this airfoil and of the norming airfoil for every angle of attack they both have data for, in
+        # the order of the norming airfoil (same angles of attack as alpha_norm_tuple)
+        # Worked out once for each norming airfoil and reused by every norm() in the equation
+        if self._norm_alignment_csv_data is not norm_csv_data and self.alpha_grid is not None and \
+                self.alpha_grid is norm_csv_data.alpha_grid:
+            # Both polars are on the same grid, so the shared angles of attack are the overlap of their ranges
+            first_grid_index = max(self.alpha_grid_start, norm_csv_data.alpha_grid_start)
+            end_grid_index = min(self.alpha_grid_start + len(self.value_columns[0]),
+                                 norm_csv_data.alpha_grid_start + len(norm_csv_data.value_columns[0]))
+            shared_grid_indices = numpy.arange(first_grid_index, max(first_grid_index, end_grid_index), dtype=numpy.intp)
+            self._norm_alignment = (shared_grid_indices - self.alpha_grid_start,
+                                    shared_grid_indices - norm_csv_data.alpha_grid_start)
+            self._norm_alignment_csv_data = norm_csv_data
+        elif self._norm_alignment_csv_data is not norm_csv_data:
+            norm_alphas = numpy.asarray(norm_csv_data.value_columns[0])
+            rows, found_mask = self.alpha_rows(norm_alphas)
+            self._norm_alignment = (rows[found_mask], numpy.flatnonzero(found_mask).astype(numpy.intp))
+            self._norm_alignment_csv_data = norm_csv_data
+        return self._norm_alignment
+
     def find_data_list(self, data_index, alpha_values):
         # Returns a list with each element being the value at index "data_index" of the tuple that is the value pair of
         # the key of an element in alpha_values
         # For example, if this is passed 1 in data_index, it will return every Coefficient of lift for this data set, 2
         # will return the coefficients of drag, etc
-        data_list = [self.alpha_value_dict[alpha_value][data_index] for alpha_value in alpha_values]
-        return data_list
+        if alpha_values is self._alpha_list:
+            return self.value_columns[data_index].tolist()
+        alpha_array = numpy.fromiter(alpha_values, dtype=numpy.float64)
+        rows, found_mask = self.alpha_rows(alpha_array)
+        if not numpy.all(found_mask):
+            raise KeyError(alpha_array[~found_mask][0].item())
+        return self.value_columns[data_index][rows].tolist()
+
+
+# Class for reading a polar store made by build_polar_store
+# Every column (alpha, cl, cd, etc.) of every polar is stored back to back in one binary file per column, the offsets
+# table says which rows belong to which polar and the header table holds everything else from the top of each csv.
+# The column files are opened with numpy.memmap, so polars are never copied out of the store and concurrent runs share
+# the same pages in the OS page cache
+class PolarStore:
+    def __init__(self, store_directory_path):
+        self.store_directory_path = store_directory_path
+        with open(os.path.join(store_directory_path, POLAR_STORE_HEADER_FILE_NAME), "r") as header_file:
+            header_table = json.load(header_file)
+        if header_table["version"] != POLAR_STORE_VERSION:
+            raise ValueError(f"Polar store at {store_directory_path} was made by a different version of this tool")
+
+        self.polar_headers = header_table["polars"]
+        self.row_count = header_table["row_count"]
+        self.offsets = self.open_array(POLAR_STORE_OFFSETS_FILE_NAME, "<i8", len(self.polar_headers) + 1)
+        self.columns = tuple(self.open_array(f"{column_name}.bin", "<f8", self.row_count)
+                             for column_name in value_index_dict)
+
+        # Dictionary pairing the file name of each polar with its index in the store
+        self.polar_index_dict = {polar_header["file_name"]: polar_index
+                                 for polar_index, polar_header in enumerate(self.polar_headers)}
+
+    def open_array(self, file_name, dtype, length):
+        # numpy.memmap can't map an empty file, so an empty store just gets empty arrays
+        # The memmap is viewed as a plain ndarray (still backed by the mapped file), because every slice of a
+        # numpy.memmap gets a dictionary of its own, which is most of the memory a polar loaded from the store takes
+        if length == 0:
+            return numpy.zeros(0, dtype=dtype)
+        return numpy.memmap(os.path.join(self.store_directory_path, file_name), dtype=dtype, mode="r",
+                            shape=(length,)).view(numpy.ndarray)
+
+    def find_polar(self, csv_file_path):
+        # Returns the index of this csv in the store, or None if it isn't stored or the file changed after the store
+        # was built (so the csv has to be parsed instead)
+        polar_index = self.polar_index_dict.get(os.path.basename(csv_file_path))
+        if polar_index is None:
+            return None
+        try:
+            file_stat = os.stat(csv_file_path)
+        except OSError:
+            return None
+        polar_header = self.polar_headers[polar_index]
+        if file_stat.st_size != polar_header["file_size"] or file_stat.st_mtime_ns != polar_header["file_mtime"]:
+            return None
+        return polar_index
+
+    def polar_columns(self, polar_index):
+        # Slices of the memory mapped columns, these are views into the store and not copies
+        start = int(self.offsets[polar_index])
+        end = int(self.offsets[polar_index + 1])
+        return tuple(column[start:end] for column in self.columns)
+
+    def polar_header(self, polar_index):
+        return self.polar_headers[polar_index]
+
+
+# Class for the metadata index that find_airfoil_csvs filters with, saved so the thickness and camber of each polar only
+# ever has to be read out of the csv once
+# The index file is kept in index_directory_path (by default the polar_index folder next to analysis_settings.config)
+# and named after a hash of the csv directory's absolute path, so every csv directory has its own
+# The index file keeps one list per field (file names, reynolds numbers, etc.) so it loads straight into numpy arrays
+class PolarIndex:
+    index_fields = ["file_name", "airfoil_name", "reynolds_num", "n_crit_num", "max_thickness", "max_camber",
+                    "max_cl_cd", "file_size", "file_mtime"]
+
+    def __init__(self, csv_directory_path, index_directory_path=None):
+        self.csv_directory_path = csv_directory_path
+        if index_directory_path is None:
+            index_directory_path = os.path.join(os.path.abspath(os.path.dirname(sys.executable)),
+                                                POLAR_INDEX_DIRECTORY_NAME)
+        self.index_directory_path = index_directory_path
+        csv_directory_hash = hashlib.blake2b(os.path.abspath(csv_directory_path).encode(), digest_size=16).hexdigest()
+        self.index_file_path = os.path.join(index_directory_path, csv_directory_hash + ".json")
+        # Dictionary pairing each file name with a dictionary of its index fields
+        self.polar_entries = {}
+        self.load()
+
+        # Arrays used for range queries, remade by build_arrays whenever the entries change
+        self.file_names = None
+        self.reynolds_nums = None
+        self.n_crit_nums = None
+        self.max_thicknesses = None
+        self.max_cambers = None
+        self.thickness_order = None
+        self.sorted_thicknesses = None
+        self.build_arrays()
+
+    def load(self):
+        try:
+            with open(self.index_file_path, "r") as index_file:
+                index_table = json.load(index_file)
+        except (OSError, ValueError):
+            return
+        if index_table.get("version") != POLAR_INDEX_VERSION or \
+                index_table.get("csv_directory_path") != os.path.abspath(self.csv_directory_path):
+            return
+        self.polar_entries = {field_values[0]: dict(zip(self.index_fields, field_values))
+                              for field_values in zip(*(index_table[field] for field in self.index_fields))}
+
+    def save(self):
+        entries = [self.polar_entries[file_name] for file_name in sorted(self.polar_entries)]
+        index_table = {field: [entry[field] for entry in entries] for field in self.index_fields}
+        index_table["version"] = POLAR_INDEX_VERSION
+        index_table["csv_directory_path"] = os.path.abspath(self.csv_directory_path)
+        try:
+            os.makedirs(self.index_directory_path, exist_ok=True)
+            with open(self.index_file_path + ".tmp", "w") as index_file:
+                json.dump(index_table, index_file)
+            os.replace(self.index_file_path + ".tmp", self.index_file_path)
+        except OSError:
+            print(f"Polar index could not be saved to {self.index_file_path}")
+
+    def update(self):
+        # Brings the index up to date with the directory, only files that are new or have a different size or
+        # modification time than when they were indexed get opened. Returns the number of files that were (re)indexed
+        indexed_count = 0
+        found_file_names = set()
+        with os.scandir(self.csv_directory_path) as directory_entries:
+            for directory_entry in directory_entries:
+                file_name = directory_entry.name
+                if file_name[-4:] != '.csv':
+                    continue
+                found_file_names.add(file_name)
+
+                file_stat = directory_entry.stat()
+                polar_entry = self.polar_entries.get(file_name)
+                if polar_entry is not None and polar_entry["file_size"] == file_stat.st_size and \
+                        polar_entry["file_mtime"] == file_stat.st_mtime_ns:
+                    continue
+
+                try:
+                    r_num_current = int(REYNOLDS_NUM_REGEX.search(file_name).group())
+                    n_crit_current = int(N_CRIT_NUM_REGEX.search(file_name).group())
+                    airfoil_name = AIRFOIL_NAME_FILE_REGEX.search(file_name).group()
+                except (AttributeError, ValueError):
+                    continue
+
+                polar_header = self.read_polar_header(directory_entry.path)
+                self.polar_entries[file_name] = {"file_name": file_name,
+                                                 "airfoil_name": airfoil_name,
+                                                 "reynolds_num": r_num_current,
+                                                 "n_crit_num": n_crit_current,
+                                                 "max_thickness": polar_header[0],
+                                                 "max_camber": polar_header[1],
+                                                 "max_cl_cd": polar_header[2],
+                                                 "file_size": file_stat.st_size,
+                                                 "file_mtime": file_stat.st_mtime_ns}
+                indexed_count += 1
+
+        count_event("csv_files_listed", len(found_file_names))
+        removed_file_names = [file_name for file_name in self.polar_entries if file_name not in found_file_names]
+        for file_name in removed_file_names:
+            del self.polar_entries[file_name]
+
+        if indexed_count > 0 or len(removed_file_names) > 0:
+            self.save()
+            self.build_arrays()
+        return indexed_count
+
+    def read_polar_header(self, file_path):
+        # Reads the max thickness, max camber and max Cl/Cd from the top of a csv, None for anything unreadable
+        # (polars with no thickness or camber never match a query, same as when find_airfoil_csvs read the files)
+        try:
+            with open(file_path, "r") as csv_file:
+                header_lines = [csv_file.readline() for _ in range(10)]
+            count_event("files_opened")
+            count_event("bytes_read", sum(len(header_line) for header_line in header_lines))
+        except OSError:
+            print("Error reading %s\n" % file_path)
+            return [None, None, None]
+        return parse_polar_header(header_lines, file_path)
+
+    def build_arrays(self):
+        file_names = sorted(self.polar_entries)
+        entries = [self.polar_entries[file_name] for file_name in file_names]
+        self.file_names = file_names
+        self.reynolds_nums = numpy.array([entry["reynolds_num"] for entry in entries], dtype=numpy.int64)
+        self.n_crit_nums = numpy.array([entry["n_crit_num"] for entry in entries], dtype=numpy.int64)
+        # None (unreadable) becomes nan, which fails every range comparison
+        self.max_thicknesses = numpy.array([entry["max_thickness"] for entry in entries], dtype=float)
+        self.max_cambers = numpy.array([entry["max_camber"] for entry in entries], dtype=float)
+        self.thickness_order = numpy.argsort(self.max_thicknesses, kind="stable")
+        self.sorted_thicknesses = self.max_thicknesses[self.thickness_order]
+
+    def query(self, config_settings):
+        # Returns the paths of every indexed csv within the ranges in config_settings, in file name order
+        # The thickness range is found with a binary search on the sorted thicknesses, everything else is checked on
+        # just the polars inside that range
+        range_start = numpy.searchsorted(self.sorted_thicknesses, config_settings.thickness_min, "left")
+        range_end = numpy.searchsorted(self.sorted_thicknesses, config_settings.thickness_max, "right")
+        candidates = self.thickness_order[range_start:range_end]
+
+        in_range = (self.reynolds_nums[candidates] >= config_settings.reynolds_min) & \
+                   (self.reynolds_nums[candidates] <= config_settings.reynolds_max) & \
+                   (self.max_cambers[candidates] >= config_settings.camber_min) & \
+                   (self.max_cambers[candidates] <= config_settings.camber_max)
+        if config_settings.nCrit_num != 0:
+            in_range &= self.n_crit_nums[candidates] == config_settings.nCrit_num
+
+        return [self.csv_directory_path + '/' + self.file_names[polar_index]
+                for polar_index in numpy.sort(candidates[in_range])]
+
+
+# Max thickness, max camber and max Cl/Cd out of the first 10 lines of a polar csv, None for anything unreadable
+def parse_polar_header(header_lines, file_path):
+    max_thickness = None
+    max_camber = None
+    max_cl_cd = None
+    try:
+        max_cl_cd = float(header_lines[6].split(',')[1])
+    except (ValueError, IndexError):
+        pass
+    try:
+        max_thickness = float(header_lines[8].split(',')[1])
+        max_camber = float(header_lines[9].split(',')[1])
+    except (ValueError, IndexError):
+        print("Error parsing max thickness or max camber for %s\n" % os.path.basename(file_path))
+    return [max_thickness, max_camber, max_cl_cd]
+
+
+# Class for scoring many polars at once (see CompiledEquation.score_batch)
+# Every polar is a row of a (polars x angles of attack) matrix, the columns being every angle of attack any of the
+# polars (or the norming airfoil) have data for. value_mask says which cells of the matrix each polar actually has data
+# for, so max, min, average, etc. are numpy reductions along the rows that only look at those cells
+class PolarBatch:
+    def __init__(self, csv_data_list, norm_csv_data=None, alpha_axis=None):
+        self.csv_data_list = csv_data_list
+        self.polar_count = len(csv_data_list)
+
+        alpha_columns = [csv_data.value_columns[0] for csv_data in csv_data_list]
+        all_alphas = numpy.concatenate(alpha_columns) if len(alpha_columns) > 0 else numpy.zeros(0)
+        polar_lengths = numpy.array([len(alpha_column) for alpha_column in alpha_columns], dtype=numpy.intp)
+        # The row and column of the matrix each value of every polar goes in
+        self.matrix_rows = numpy.repeat(numpy.arange(self.polar_count), polar_lengths)
+
+        # Polars resampled onto the same alpha grid (see AlphaGrid) use the grid as the axis, each polar's values go in
+        # the run of columns starting at its first grid point so nothing has to be searched for
+        alpha_grid = csv_data_list[0].alpha_grid if len(csv_data_list) > 0 else None
+        if alpha_grid is not None and (alpha_axis is None or alpha_axis is alpha_grid.alpha_values) and \
+                all(csv_data.alpha_grid is alpha_grid for csv_data in csv_data_list) and \
+                (norm_csv_data is None or norm_csv_data.alpha_grid is alpha_grid):
+            self.alpha_axis = alpha_grid.alpha_values
+            polar_starts = numpy.array([csv_data.alpha_grid_start for csv_data in csv_data_list], dtype=numpy.intp)
+            first_values = numpy.cumsum(polar_lengths) - polar_lengths
+            self.matrix_columns = numpy.arange(len(all_alphas)) + numpy.repeat(polar_starts - first_values,
+                                                                                polar_lengths)
+        else:
+            if alpha_axis is None:
+                axis_alphas = [all_alphas]
+                if norm_csv_data is not None:
+                    axis_alphas.append(norm_csv_data.value_columns[0])
+                alpha_axis = numpy.unique(numpy.concatenate(axis_alphas))
+            self.alpha_axis = alpha_axis
+            self.matrix_columns = numpy.searchsorted(self.alpha_axis, all_alphas)
+        self.value_mask = numpy.zeros((self.polar_count, len(self.alpha_axis)), dtype=bool)
+        self.value_mask[self.matrix_rows, self.matrix_columns] = True
+
+        # Polars that can't be scored (division by zero, etc.)
+        self.failed = numpy.zeros(self.polar_count, dtype=bool)
+
+        # The matrices are only made for the columns the equation actually uses
+        self.column_matrices = {}
+
+        # The norming airfoil as a batch of one on the same angle of attack axis
+        self.norm_batch = None
+        if norm_csv_data is not None:
+            self.norm_batch = PolarBatch([norm_csv_data], alpha_axis=self.alpha_axis)
+
+    def mark_failed(self, polar_failed):
+        self.failed |= polar_failed
+
+    def reset_failed(self):
+        # For scoring the same batch with another equation (see ResidentPolars)
+        self.failed[:] = False
+
+    def column_matrix(self, column_index):
+        if column_index not in self.column_matrices:
+            column_matrix = numpy.zeros(self.value_mask.shape)
+            if self.polar_count > 0:
+                column_matrix[self.matrix_rows, self.matrix_columns] = numpy.concatenate(
+                    [csv_data.value_columns[column_index] for csv_data in self.csv_data_list])
+            self.column_matrices[column_index] = column_matrix
+        return self.column_matrices[column_index]
+
+    def header_values(self, attribute_name):
+        # Anything missing becomes nan, so that polar fails
+        return numpy.array([getattr(csv_data, attribute_name) for csv_data in self.csv_data_list], dtype=float)
+
+    def polar_metrics(self, metric_name):
+        # One of the POLAR_METRIC_NAMES values for every polar, anything missing becomes nan so that polar fails
+        metric_values = numpy.empty(self.polar_count)
+        for polar_index, csv_data in enumerate(self.csv_data_list):
+            if len(csv_data.value_columns[0]) == 0:
+                metric_values[polar_index] = numpy.nan
+            elif metric_name == "stall_angle":
+                metric_values[polar_index] = csv_data.find_stall_angle()
+            else:
+                metric_values[polar_index] = csv_data.polar_metrics[metric_name]
+        return metric_values
 
 
 # Class for handling the configuration settings of this program
@@ -246,16 +1242,20 @@ class ConfigSettings:
         self.camber_min = None
         self.camber_max = None
         self.scoring_equation = None
+        self.alpha_grid_step = 0
 
-    def parse_config_file(self):
-        # Reads the config file, stores everything in the places that they should go, returns errors on fail
+    def parse_config_file(self, config_file_path=None):
+        # Reads the config file (analysis_settings.config next to the program unless config_file_path is given), stores
+        # everything in the places that they should go, returns errors on fail
         parse_succeed_flag = True
         try:
-            # Because this isn't really a proper application, when this executes, it is relegated to a temporary
-            # file where the config file is stored, this returns path to the executable
-            cwd = os.path.abspath(os.path.dirname(sys.executable))
+            if config_file_path is None:
+                # Because this isn't really a proper application, when this executes, it is relegated to a temporary
+                # file where the config file is stored, this returns path to the executable
+                cwd = os.path.abspath(os.path.dirname(sys.executable))
+                config_file_path = os.path.join(cwd, "analysis_settings.config")
 
-            with open(os.path.join(cwd, "analysis_settings.config"), "r") as config_file:
+            with open(config_file_path, "r") as config_file:
                 config_file_text = config_file.read()
                 config_file.close()
                 csv_directory_match = CONFIG_CSV_DIRECTORY_REGEX.search(config_file_text)
@@ -355,6 +1355,15 @@ class ConfigSettings:
                 else:
                     print("Scoring equation count not be parsed")
                     parse_succeed_flag = False
+
+                # Config files made before the alpha grid was added don't have it, which just means it is off
+                alpha_grid_step_match = CONFIG_ALPHA_GRID_STEP_REGEX.search(config_file_text)
+                if alpha_grid_step_match is not None:
+                    try:
+                        self.alpha_grid_step = float(alpha_grid_step_match.group())
+                    except ValueError:
+                        print("Invalid value passed to alpha_grid_step")
+                        parse_succeed_flag = False
         except IOError:
             print("Config file could not be opened")
             parse_succeed_flag = False
@@ -362,6 +1371,7 @@ class ConfigSettings:
 
     def input_config_settings(self):
         # Prompts the user for config settings and stores them to object
+        from tkinter import Tk
         # Creates a tkinter gui to prompt a directory choice for csv file choice
         root = Tk()
         prompt_directory_gui = PromptFileGui(root, "directory")
@@ -448,6 +1458,9 @@ class ConfigSettings:
         if self.camber_min > self.camber_max:
             print("Camber maximum small than camber minimum")
             valid_flag = False
+        if self.alpha_grid_step < 0:
+            print("Alpha grid step can't be negative (use 0 to turn the alpha grid off)")
+            valid_flag = False
         return valid_flag
 
     def write(self):
@@ -464,7 +1477,8 @@ class ConfigSettings:
                                                               thickness_max=self.thickness_max,
                                                               camber_min=self.camber_min,
                                                               camber_max=self.camber_max,
-                                                              scoring_equation=self.scoring_equation)
+                                                              scoring_equation=self.scoring_equation,
+                                                              alpha_grid_step=self.alpha_grid_step)
 
         cwd = os.path.abspath(os.path.dirname(sys.executable))
         with open(os.path.join(cwd, "analysis_settings.config"), "w") as config_file:
@@ -476,7 +1490,8 @@ class ConfigSettings:
         return f"directory path: \"{self.csv_directory_path}\"\nnorm_file_path: {self.norm_file_path}\nNcrit num: " \
                f"{self.nCrit_num}\nReynolds number between {self.reynolds_min}, {self.reynolds_max}\n" \
                f"Max thickness percentage between {self.thickness_min}% and {self.thickness_max}%\nMax Camber between "\
-               f"{self.camber_min}% and {self.camber_max}%\nScoring Equation= {self.scoring_equation}\n"
+               f"{self.camber_min}% and {self.camber_max}%\nScoring Equation= {self.scoring_equation}\n" \
+               f"Alpha grid step: {self.alpha_grid_step or 'off'}\n"
 
 
 # Makes a dictionary of each pair of parentheses
@@ -508,6 +1523,10 @@ def process_equation_string(given_equation_string, csv_data_object):
     # Replaces parameters that have already been calculated with the csv object members, so they don't need to be
     # recalculated (more efficient yay)
     processed_string = processed_string.replace("stall_angle", "self.find_stall_angle()")
+    # Longest names first, so cl_max_alpha isn't mistaken for cl_max
+    for metric_name in sorted(POLAR_METRIC_NAMES[1:], key=len, reverse=True):
+        processed_string = processed_string.replace(metric_name,
+                                                    f"self.metric_value({POLAR_METRIC_NAMES.index(metric_name)})")
     processed_string = processed_string.replace("max(element_wise_operation(cl,cd,/))", "self.max_Cl_Cd")
     processed_string = processed_string.replace("alpha(maxclcd)", "self.max_Cl_Cd_Alpha")
 
@@ -548,6 +1567,547 @@ def process_equation_string(given_equation_string, csv_data_object):
     return processed_string
 
 
+# Exception for equations that use something the equation compiler doesn't know (any other python), these are still
+# scored the old way with process_equation_string and eval()
+class UnsupportedEquation(UnableToEvaluate):
+    pass
+
+
+# Base class for each step of a compiled scoring equation
+# returns_list is True for steps that return an array with a value for every angle of attack (cl, cd, etc.) and False
+# for steps that return a single value (max(cl), stall_angle, etc.)
+# row_selection is None to use every row of the polar or an array of row indices (used by norm() to only compare the
+# angles of attack both airfoils have data for)
+# evaluate_batch does the same thing for every polar of a PolarBatch at once, lists are (polars x angles of attack)
+# matrices where only the cells in list_mask mean anything and single values are arrays with one value per polar.
+# Polars that can't be scored are marked in polar_batch.failed instead of raising an exception
+# Each kind of step does its work in compute and compute_batch, evaluate and evaluate_batch wrap those with the memo
+class EquationNode:
+    returns_list = False
+    equation_text = None
+
+    def node_key(self):
+        # Two steps with the same key always give the same result, compile_equation uses this to share them (children
+        # are already shared by then, so they are part of the key by id)
+        raise NotImplementedError
+
+    def evaluate(self, csv_data, compiled_equation, row_selection):
+        # Steps that appear more than once in an equation are only computed once per polar, the rest of the times
+        # they are read out of the compiled equation's memo (the row selection is kept in the memo so its id can't be
+        # reused by a different selection while the memo is alive)
+        memo_key = (id(self), id(csv_data), id(row_selection))
+        memo_entry = compiled_equation.evaluation_memo.get(memo_key)
+        if memo_entry is not None:
+            compiled_equation.saved_evaluations += 1
+            return memo_entry[1]
+        value = self.compute(csv_data, compiled_equation, row_selection)
+        compiled_equation.evaluation_memo[memo_key] = (row_selection, value)
+        return value
+
+    def evaluate_batch(self, polar_batch, compiled_equation, value_mask):
+        # Same as evaluate for a whole batch
+        memo_key = (id(self), id(polar_batch), id(value_mask))
+        memo_entry = compiled_equation.evaluation_memo.get(memo_key)
+        if memo_entry is not None:
+            compiled_equation.saved_evaluations += 1
+            return memo_entry[1]
+        value = self.compute_batch(polar_batch, compiled_equation, value_mask)
+        compiled_equation.evaluation_memo[memo_key] = (value_mask, value)
+        return value
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        raise NotImplementedError
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        raise NotImplementedError
+
+    def list_mask(self, polar_batch, value_mask):
+        # The cells of the matrix returned by evaluate_batch that mean anything (only used for steps returning lists)
+        return value_mask
+
+
+# Constants are cheaper to return than to look up, so they skip the memo
+class ConstantNode(EquationNode):
+    def __init__(self, value):
+        self.value = value
+
+    def node_key(self):
+        # The type is part of the key so 2 and 2.0 stay different steps (int and float powers can round differently)
+        return "constant", type(self.value).__name__, self.value
+
+    def evaluate(self, csv_data, compiled_equation, row_selection):
+        return self.value
+
+    def evaluate_batch(self, polar_batch, compiled_equation, value_mask):
+        return self.value
+
+
+# One of the data columns (alpha, cl, cd, etc.), returned as is (a view, not a copy) when every row is used
+class ColumnNode(EquationNode):
+    returns_list = True
+
+    def __init__(self, column_index):
+        self.column_index = column_index
+
+    def node_key(self):
+        return "column", self.column_index
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        column = csv_data.value_columns[self.column_index]
+        if row_selection is None:
+            return column
+        return column[row_selection]
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        return polar_batch.column_matrix(self.column_index)
+
+
+# One of the POLAR_METRIC_NAMES values of the polar (stall_angle, cl_max, etc.), worked out once for each polar
+class PolarMetricNode(EquationNode):
+    def __init__(self, metric_name):
+        self.metric_name = metric_name
+
+    def node_key(self):
+        return "metric", self.metric_name
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        return csv_data.polar_metric(self.metric_name)
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        return polar_batch.polar_metrics(self.metric_name)
+
+
+# A value read from the top of the csv, i.e. alpha(maxclcd)
+class HeaderValueNode(EquationNode):
+    def __init__(self, attribute_name):
+        self.attribute_name = attribute_name
+
+    def node_key(self):
+        return "header", self.attribute_name
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        return getattr(csv_data, self.attribute_name)
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        return polar_batch.header_values(self.attribute_name)
+
+
+# max, min or average of a list
+class ReductionNode(EquationNode):
+    def __init__(self, function_name, child):
+        self.function_name = function_name
+        self.child = child
+
+    def node_key(self):
+        return "reduction", self.function_name, id(self.child)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        value = self.child.evaluate(csv_data, compiled_equation, row_selection)
+        if not self.child.returns_list:
+            # average of a single value is just that value
+            return value
+        if len(value) == 0:
+            raise UnableToEvaluate(f"{self.function_name}() of an empty list")
+        if self.function_name == "max":
+            return float(numpy.max(value))
+        elif self.function_name == "min":
+            return float(numpy.min(value))
+        return float(numpy.mean(value))
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        value = self.child.evaluate_batch(polar_batch, compiled_equation, value_mask)
+        if not self.child.returns_list:
+            return value
+        # Only the cells in the mask count, polars with no cells at all are an empty list
+        list_mask = self.child.list_mask(polar_batch, value_mask)
+        value_counts = numpy.count_nonzero(list_mask, axis=1)
+        polar_batch.mark_failed(value_counts == 0)
+        if self.function_name == "max":
+            return numpy.max(value, axis=1, where=list_mask, initial=-numpy.inf)
+        elif self.function_name == "min":
+            return numpy.min(value, axis=1, where=list_mask, initial=numpy.inf)
+        return numpy.sum(value, axis=1, where=list_mask) / numpy.maximum(value_counts, 1)
+
+
+# max, min or pow of single values (max(max(cl), 1.2), pow(max(cl), 2), etc.)
+class ScalarFunctionNode(EquationNode):
+    scalar_functions = {"max": max, "min": min, "pow": pow}
+    batch_functions = {"max": numpy.maximum, "min": numpy.minimum, "pow": numpy.power}
+
+    def __init__(self, function_name, children):
+        self.function_name = function_name
+        self.children = children
+
+    def node_key(self):
+        return ("scalar function", self.function_name) + tuple(id(child) for child in self.children)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        return self.scalar_functions[self.function_name](
+            *(child.evaluate(csv_data, compiled_equation, row_selection) for child in self.children))
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        values = [child.evaluate_batch(polar_batch, compiled_equation, value_mask) for child in self.children]
+        batch_function = self.batch_functions[self.function_name]
+        result = numpy.asarray(values[0], dtype=float)
+        for value in values[1:]:
+            result = batch_function(result, value)
+        return result
+
+
+# +, -, *, /, ** between single values
+class BinaryOperationNode(EquationNode):
+    def __init__(self, operator, left, right):
+        self.operator = operator
+        self.left = left
+        self.right = right
+
+    def node_key(self):
+        return "binary operation", self.operator, id(self.left), id(self.right)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        left_value = self.left.evaluate(csv_data, compiled_equation, row_selection)
+        right_value = self.right.evaluate(csv_data, compiled_equation, row_selection)
+        if self.operator == "+":
+            return left_value + right_value
+        elif self.operator == "-":
+            return left_value - right_value
+        elif self.operator == "*":
+            return left_value * right_value
+        elif self.operator == "/":
+            return left_value / right_value
+        return pow(left_value, right_value)
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        # ** works the same as "^" in element_wise_operation
+        return batch_array_operation(polar_batch,
+                                     self.left.evaluate_batch(polar_batch, compiled_equation, value_mask),
+                                     self.right.evaluate_batch(polar_batch, compiled_equation, value_mask),
+                                     "^" if self.operator == "**" else self.operator, None)
+
+
+class NegateNode(EquationNode):
+    def __init__(self, child):
+        self.child = child
+
+    def node_key(self):
+        return "negate", id(self.child)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        return -self.child.evaluate(csv_data, compiled_equation, row_selection)
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        return -numpy.asarray(self.child.evaluate_batch(polar_batch, compiled_equation, value_mask), dtype=float)
+
+
+# element_wise_operation between two lists (or two single values)
+class ElementWiseNode(EquationNode):
+    def __init__(self, left, right, operator):
+        self.left = left
+        self.right = right
+        self.operator = operator
+        self.returns_list = left.returns_list
+
+    def node_key(self):
+        return "element wise", self.operator, id(self.left), id(self.right)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        return array_operation(self.left.evaluate(csv_data, compiled_equation, row_selection),
+                               self.right.evaluate(csv_data, compiled_equation, row_selection),
+                               self.operator)
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        list_mask = None
+        if self.returns_list:
+            # Lists of different lengths (i.e. a normed list and a list that isn't) can't be used together
+            list_mask = self.left.list_mask(polar_batch, value_mask)
+            right_list_mask = self.right.list_mask(polar_batch, value_mask)
+            if right_list_mask is not list_mask:
+                polar_batch.mark_failed(numpy.count_nonzero(list_mask, axis=1) !=
+                                        numpy.count_nonzero(right_list_mask, axis=1))
+        return batch_array_operation(polar_batch,
+                                     self.left.evaluate_batch(polar_batch, compiled_equation, value_mask),
+                                     self.right.evaluate_batch(polar_batch, compiled_equation, value_mask),
+                                     self.operator, list_mask)
+
+    def list_mask(self, polar_batch, value_mask):
+        return self.left.list_mask(polar_batch, value_mask)
+
+
+# norm(expression), the expression for this airfoil divided by the expression for the norming airfoil
+class NormNode(EquationNode):
+    def __init__(self, child):
+        self.child = child
+        self.returns_list = child.returns_list
+
+    def node_key(self):
+        return "norm", id(self.child)
+
+    def compute(self, csv_data, compiled_equation, row_selection):
+        # The norming airfoil's side of the division (the baseline) is the same for every airfoil, so it is only
+        # evaluated once per run and then read from the compiled equation's norm baseline cache
+        norm_csv_data = compiled_equation.norm_csv_data
+        norm_baseline_cache = compiled_equation.norm_baseline_cache
+        if not self.returns_list:
+            return array_operation(self.child.evaluate(csv_data, compiled_equation, None),
+                                   self.value_baseline(compiled_equation), "/")
+
+        # Lists are only compared at the angles of attack both airfoils have data for, so list baselines are cached
+        # for each different set of shared angles of attack
+        self_rows, norm_rows = csv_data.norm_alignment(norm_csv_data)
+        cache_key = (id(self), norm_rows.tobytes())
+        if cache_key not in norm_baseline_cache:
+            norm_baseline_cache[cache_key] = self.child.evaluate(norm_csv_data, compiled_equation, norm_rows)
+        return array_operation(self.child.evaluate(csv_data, compiled_equation, self_rows),
+                               norm_baseline_cache[cache_key], "/")
+
+    def value_baseline(self, compiled_equation):
+        cache_key = id(self)
+        if cache_key not in compiled_equation.norm_baseline_cache:
+            compiled_equation.norm_baseline_cache[cache_key] = \
+                self.child.evaluate(compiled_equation.norm_csv_data, compiled_equation, None)
+        return compiled_equation.norm_baseline_cache[cache_key]
+
+    def compute_batch(self, polar_batch, compiled_equation, value_mask):
+        if not self.returns_list:
+            try:
+                baseline = self.value_baseline(compiled_equation)
+            except Exception as e:
+                print("Norming airfoil could not be scored\nError Output:")
+                print(repr(e))
+                polar_batch.mark_failed(True)
+                return numpy.zeros(polar_batch.polar_count)
+            return batch_array_operation(polar_batch,
+                                         self.child.evaluate_batch(polar_batch, compiled_equation, value_mask),
+                                         baseline, "/", None)
+
+        # The norming airfoil is loaded onto the same angle of attack axis as the batch, so lining the two up is just
+        # and-ing the masks together (and the baseline can be reused by any batch with the same axis)
+        norm_batch = polar_batch.norm_batch
+        cache_key = (id(self), polar_batch.alpha_axis.tobytes())
+        if cache_key not in compiled_equation.norm_baseline_cache:
+            compiled_equation.norm_baseline_cache[cache_key] = \
+                self.child.evaluate_batch(norm_batch, compiled_equation, norm_batch.value_mask)
+        if norm_batch.failed[0]:
+            polar_batch.mark_failed(True)
+        shared_value_mask = self.list_mask(polar_batch, value_mask)
+        return batch_array_operation(polar_batch,
+                                     self.child.evaluate_batch(polar_batch, compiled_equation, shared_value_mask),
+                                     compiled_equation.norm_baseline_cache[cache_key], "/", shared_value_mask)
+
+    def list_mask(self, polar_batch, value_mask):
+        return value_mask & polar_batch.norm_batch.value_mask
+
+
+# Same as element_wise_operation but for numpy arrays (or two single values), used by compiled equations
+def array_operation(parameter_one, parameter_two, operator):
+    if len(numpy.shape(parameter_one)) == 1 and len(parameter_one) != len(parameter_two):
+        raise UnableToEvaluate(
+            "Lists of unequal length passed to element_wise_operation, Operation cannot be performed")
+    if operator == "+":
+        return parameter_one + parameter_two
+    elif operator == "-":
+        return parameter_one - parameter_two
+    elif operator == "*":
+        return parameter_one * parameter_two
+    elif operator == "/":
+        if numpy.any(numpy.equal(parameter_two, 0)):
+            raise UnableToEvaluate("Value in divisor list passed to element_wise_operation contains 0, division by "
+                                   "zero cannot\nbe accomplished")
+        return parameter_one / parameter_two
+    elif operator == "^":
+        if len(numpy.shape(parameter_one)) == 1:
+            return numpy.power(parameter_one, parameter_two)
+        return pow(parameter_one, parameter_two)
+    raise UnableToEvaluate("Operator passed to element_wise_operation not recognized")
+
+
+# Same as array_operation but for every polar of a PolarBatch at once
+# value_mask is the mask of the cells that mean anything when the parameters are lists, or None for single values
+def batch_array_operation(polar_batch, parameter_one, parameter_two, operator, value_mask):
+    if operator == "+":
+        return numpy.add(parameter_one, parameter_two)
+    elif operator == "-":
+        return numpy.subtract(parameter_one, parameter_two)
+    elif operator == "*":
+        return numpy.multiply(parameter_one, parameter_two)
+    elif operator == "/":
+        # Same as division by zero raising an exception for a single airfoil, only that polar fails
+        zero_divisor = numpy.equal(parameter_two, 0)
+        if value_mask is not None:
+            zero_divisor = numpy.any(zero_divisor & value_mask, axis=1)
+        polar_batch.mark_failed(zero_divisor)
+        return numpy.divide(parameter_one, parameter_two)
+    return numpy.power(numpy.asarray(parameter_one, dtype=float), parameter_two)
+
+
+# Scoring equation that has been parsed and type checked once, and can then be used to score any number of airfoils
+class CompiledEquation:
+    def __init__(self, equation_string, root_node, norm_csv_data=None, step_count=None):
+        self.equation_string = equation_string
+        self.root_node = root_node
+        # Values of norm() terms for the norming airfoil, filled in by NormNode as the first airfoils are scored
+        self.norm_baseline_cache = {}
+        self._norm_csv_data = norm_csv_data
+        # Number of distinct steps in the equation once repeated ones are shared (see compile_equation_node)
+        self.step_count = step_count
+        # Results of every step for the airfoil (or batch) being scored, see EquationNode.evaluate
+        self.evaluation_memo = {}
+        # Number of times a step's result was reused from the memo instead of being worked out again
+        self.saved_evaluations = 0
+
+    @property
+    def norm_csv_data(self):
+        return self._norm_csv_data
+
+    @norm_csv_data.setter
+    def norm_csv_data(self, norm_csv_data):
+        # Baselines from a different norming airfoil can't be reused
+        self._norm_csv_data = norm_csv_data
+        self.norm_baseline_cache = {}
+
+    def score(self, csv_data):
+        # Same as CsvData.score_csv, anything that goes wrong for one airfoil means it just doesn't get a score
+        count_event("evaluations")
+        try:
+            return self.root_node.evaluate(csv_data, self, None)
+        except Exception as e:
+            count_event("exceptions_swallowed")
+            print("CSV could not be scored\nError Output:")
+            print(repr(e))
+            return None
+        finally:
+            self.evaluation_memo = {}
+
+    def score_batch(self, polar_batch):
+        # Scores every polar in the batch at once, returns a list of scores (None for polars that couldn't be scored,
+        # anything that isn't a finite number counts as not scored, like an overflow would for a single airfoil)
+        with numpy.errstate(all="ignore"):
+            try:
+                batch_scores = self.root_node.evaluate_batch(polar_batch, self, polar_batch.value_mask)
+            finally:
+                self.evaluation_memo = {}
+            batch_scores = numpy.broadcast_to(numpy.asarray(batch_scores, dtype=float), (polar_batch.polar_count,))
+            polar_batch.mark_failed(~numpy.isfinite(batch_scores))
+        count_event("evaluations", polar_batch.polar_count)
+        count_event("polars_failed", int(numpy.count_nonzero(polar_batch.failed)))
+        return [None if polar_failed else float(score)
+                for score, polar_failed in zip(batch_scores.tolist(), polar_batch.failed.tolist())]
+
+
+# Turns a scoring equation string into a CompiledEquation
+# Raises UnableToEvaluate if the equation mixes up lists and single values (i.e. .5*cl or max(max(cl))) so that can be
+# reported before any airfoils are scored, and UnsupportedEquation if it uses anything that isn't in the README
+def compile_equation(given_equation_string, norm_csv_data=None, node_table=None):
+    # standardizes the string so spaces and capitalization don't matter (same as process_equation_string)
+    processed_string = given_equation_string.replace(" ", "").lower()
+    try:
+        equation_tree = ast.parse(processed_string, mode="eval")
+    except SyntaxError:
+        raise UnsupportedEquation(f"Scoring equation {given_equation_string} could not be parsed")
+
+    # Equations compiled with the same node_table share their steps (see find_pareto_fronts)
+    if node_table is None:
+        node_table = {}
+    root_node = compile_equation_node(equation_tree.body, False, node_table)
+    if root_node.returns_list:
+        raise UnableToEvaluate("Scoring equation returns a list instead of a single value, use max, min or average to "
+                               "turn lists into a score")
+    return CompiledEquation(given_equation_string, root_node, norm_csv_data, len(node_table))
+
+
+# Turns one node of the python syntax tree of an equation into an EquationNode, checking the types as it goes
+# node_table pairs the node_key of every step compiled so far with its node, a step that is already in it (i.e. the
+# second max(cl) in max(cl)/min(cd) + norm(max(cl))) is shared instead of compiled again, so the equation becomes a graph
+# where every distinct step is only worked out once per polar
+def compile_equation_node(syntax_node, inside_norm, node_table):
+    equation_node = build_equation_node(syntax_node, inside_norm, node_table)
+    equation_node = node_table.setdefault(equation_node.node_key(), equation_node)
+    # The equation text this step came from, used when steps are shown to the user (see FeatureMatrix)
+    if equation_node.equation_text is None:
+        equation_node.equation_text = ast.unparse(syntax_node)
+    return equation_node
+
+
+def build_equation_node(syntax_node, inside_norm, node_table):
+    if isinstance(syntax_node, ast.Constant) and isinstance(syntax_node.value, (int, float)) and \
+            not isinstance(syntax_node.value, bool):
+        return ConstantNode(syntax_node.value)
+
+    if isinstance(syntax_node, ast.Name):
+        if syntax_node.id in value_index_dict:
+            return ColumnNode(value_index_dict[syntax_node.id])
+        if syntax_node.id in POLAR_METRIC_NAMES:
+            return PolarMetricNode(syntax_node.id)
+        raise UnsupportedEquation(f"Unknown value {syntax_node.id} in scoring equation")
+
+    if isinstance(syntax_node, ast.UnaryOp) and isinstance(syntax_node.op, (ast.USub, ast.UAdd)):
+        child = compile_equation_node(syntax_node.operand, inside_norm, node_table)
+        if child.returns_list:
+            raise UnableToEvaluate("Lists can't be negated, use element_wise_operation(list, -1, \"*\") instead")
+        return NegateNode(child) if isinstance(syntax_node.op, ast.USub) else child
+
+    binary_operators = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/", ast.Pow: "**"}
+    if isinstance(syntax_node, ast.BinOp) and type(syntax_node.op) in binary_operators:
+        left = compile_equation_node(syntax_node.left, inside_norm, node_table)
+        right = compile_equation_node(syntax_node.right, inside_norm, node_table)
+        operator = binary_operators[type(syntax_node.op)]
+        if left.returns_list or right.returns_list:
+            raise UnableToEvaluate(f"{operator} only works on single values, not lists. Use element_wise_operation "
+                                   f"for lists or max, min or average to turn a list into a value")
+        return BinaryOperationNode(operator, left, right)
+
+    if not (isinstance(syntax_node, ast.Call) and isinstance(syntax_node.func, ast.Name)) or \
+            len(syntax_node.keywords) > 0:
+        raise UnsupportedEquation(f"{ast.unparse(syntax_node)} in scoring equation is not supported by the equation "
+                                  f"compiler")
+
+    function_name = syntax_node.func.id
+    parameters = syntax_node.args
+
+    # alpha(maxclcd) is the angle of attack with the max Cl/Cd listed at the top of the csv
+    if function_name == "alpha" and len(parameters) == 1 and isinstance(parameters[0], ast.Name) and \
+            parameters[0].id == "maxclcd":
+        return HeaderValueNode("max_Cl_Cd_Alpha")
+
+    if function_name == "element_wise_operation":
+        if len(parameters) != 3 or not isinstance(parameters[2], ast.Constant) or \
+                parameters[2].value not in ["+", "-", "*", "/", "^"]:
+            raise UnableToEvaluate("element_wise_operation takes two lists and an operator in quotes, i.e. "
+                                   "element_wise_operation(cl, cd, \"/\")")
+        left = compile_equation_node(parameters[0], inside_norm, node_table)
+        right = compile_equation_node(parameters[1], inside_norm, node_table)
+        if left.returns_list != right.returns_list:
+            raise UnableToEvaluate(f"element_wise_operation was passed a list and a single value in "
+                                   f"{ast.unparse(syntax_node)}, it needs two lists or two values")
+        return ElementWiseNode(left, right, parameters[2].value)
+
+    if function_name == "norm":
+        if inside_norm:
+            raise UnableToEvaluate("norm() can't be used inside of another norm()")
+        if len(parameters) != 1:
+            raise UnableToEvaluate("norm() takes exactly one expression")
+        return NormNode(compile_equation_node(parameters[0], True, node_table))
+
+    if function_name in ["max", "min", "average", "pow"]:
+        children = [compile_equation_node(parameter, inside_norm, node_table) for parameter in parameters]
+        if len(children) == 0:
+            raise UnableToEvaluate(f"{function_name}() needs something to work on")
+        if function_name == "pow":
+            if len(children) != 2 or any(child.returns_list for child in children):
+                raise UnableToEvaluate("pow() takes two single values, i.e. pow(max(cl), 2)")
+            return ScalarFunctionNode(function_name, children)
+        if len(children) == 1:
+            if function_name != "average" and not children[0].returns_list:
+                raise UnableToEvaluate(f"{function_name}() was passed a single value in {ast.unparse(syntax_node)}, "
+                                       f"it needs a list")
+            return ReductionNode(function_name, children[0])
+        if function_name == "average" or any(child.returns_list for child in children):
+            raise UnableToEvaluate(f"{function_name}() takes either one list or several single values")
+        return ScalarFunctionNode(function_name, children)
+
+    raise UnsupportedEquation(f"Unknown function {function_name} in scoring equation")
+
+
 # Handles prompting the user for a float
 def input_float(prompt_string, range_bounds=None):
     while True:
@@ -678,92 +2238,996 @@ def element_wise_operation(parameter_one, parameter_two, operator):
 
 # Makes a list of all csv files that should be scored as they match whatever parameters were given
 def find_airfoil_csvs(config_settings):
-    all_file_names = os.listdir(config_settings.csv_directory_path)
-    csv_file_names = []
-    # For each file in this directory, checks if it is a CSV File of an airfoil with test parameters in range
-    for file_name in all_file_names:
+    # The filtering is done against the polar index for this directory (see PolarIndex), which is brought up to date
+    # first, so only csv files that are new or have changed since the last run are opened
+    polar_index = PolarIndex(config_settings.csv_directory_path)
+    indexed_count = polar_index.update()
+    if indexed_count > 0:
+        print(f"Indexed {indexed_count} new or changed csv files")
+    return polar_index.query(config_settings)
+
+
+# Packs every polar csv in a directory into a polar store inside that directory so later runs don't have to parse them
+# If there is already a store, polars whose csv has the same size and modification time as when it was stored are
+# copied over from it and only new or changed csv files are parsed, nothing is written if nothing changed
+# With hash_files, a hash of each csv's contents is kept too and decides whether it changed instead (so files that were
+# downloaded again but are the same aren't parsed again, and edits that keep the size and time are still caught)
+# Returns the number of polars copied from the old store and the number parsed
+def build_polar_store(csv_directory_path, hash_files=False):
+    store_directory_path = os.path.join(csv_directory_path, POLAR_STORE_DIRECTORY_NAME)
+    os.makedirs(store_directory_path, exist_ok=True)
+    old_polar_store = open_polar_store(csv_directory_path)
+
+    polar_headers = []
+    offsets = [0]
+    # Where the columns of each polar come from, the slice of the old store's rows for polars that are copied over or
+    # the parsed columns for the rest (only put together if the store has to be written)
+    polar_sources = []
+    reused_count = 0
+    parsed_count = 0
+
+    for file_name in sorted(os.listdir(csv_directory_path)):
         if file_name[-4:] != '.csv':
             continue
 
-        # Tries to parse reynolds and ncrit numbers from the file name
-        # On fail, this is the wrong type of csv file
-        try:
-            r_num_current = int(REYNOLDS_NUM_REGEX.search(file_name).group())
-            n_crit_current = int(N_CRIT_NUM_REGEX.search(file_name).group())
-        except AttributeError:
-            continue
+        file_path = csv_directory_path + '/' + file_name
+        file_stat = os.stat(file_path)
+        file_hash = hash_polar_file(file_path) if hash_files else None
+
+        # Stores made before metrics were added don't have them, so those polars are parsed again. Polars stored
+        # without a hash are compared by size and modification time (and get a hash from now on)
+        old_polar_index = None if old_polar_store is None else old_polar_store.polar_index_dict.get(file_name)
+        old_polar_header = None if old_polar_index is None else old_polar_store.polar_header(old_polar_index)
+        if old_polar_header is not None and "metrics" in old_polar_header and \
+                (old_polar_header["file_hash"] == file_hash if hash_files and "file_hash" in old_polar_header else
+                 old_polar_header["file_size"] == file_stat.st_size and
+                 old_polar_header["file_mtime"] == file_stat.st_mtime_ns):
+            polar_source = slice(int(old_polar_store.offsets[old_polar_index]),
+                                 int(old_polar_store.offsets[old_polar_index + 1]))
+            polar_row_count = polar_source.stop - polar_source.start
+            polar_header = dict(old_polar_header, file_size=file_stat.st_size, file_mtime=file_stat.st_mtime_ns)
+            reused_count += 1
+        else:
+            try:
+                r_num_current = int(REYNOLDS_NUM_REGEX.search(file_name).group())
+                n_crit_current = int(N_CRIT_NUM_REGEX.search(file_name).group())
+                airfoil_name = AIRFOIL_NAME_FILE_REGEX.search(file_name).group()
+            except (AttributeError, ValueError):
+                continue
+            try:
+                csv_data = CsvData(file_path)
+            except (IndexError, ValueError):
+                print("%s is not a polar csv file, skipping it\n" % file_name)
+                continue
+            polar_source = csv_data.value_columns
+            polar_row_count = len(csv_data.value_columns[0])
+            polar_header = {"file_name": file_name,
+                            "airfoil_name": airfoil_name,
+                            "reynolds_num": r_num_current,
+                            "n_crit_num": n_crit_current,
+                            "max_cl_cd": csv_data.max_Cl_Cd,
+                            "max_cl_cd_alpha": csv_data.max_Cl_Cd_Alpha,
+                            "max_thickness": csv_data.max_thickness,
+                            "max_camber": csv_data.max_camber,
+                            "metrics": {metric_name: None if numpy.isnan(metric_value) else metric_value
+                                        for metric_name, metric_value in csv_data.polar_metrics.items()},
+                            "file_size": file_stat.st_size,
+                            "file_mtime": file_stat.st_mtime_ns}
+            parsed_count += 1
+        if hash_files:
+            polar_header["file_hash"] = file_hash
+
+        polar_sources.append(polar_source)
+        offsets.append(offsets[-1] + polar_row_count)
+        polar_headers.append(polar_header)
+
+    count_event("polars_reused", reused_count)
+    count_event("polars_parsed", parsed_count)
+    removed_count = 0 if old_polar_store is None else \
+        len(set(old_polar_store.polar_index_dict) - {polar_header["file_name"] for polar_header in polar_headers})
+    print(f"Polar store: {reused_count} polars unchanged, {parsed_count} new or changed polars parsed, "
+          f"{removed_count} removed")
+    # Nothing to write if every polar was copied over as is
+    if old_polar_store is not None and polar_headers == old_polar_store.polar_headers:
+        return reused_count, parsed_count
+
+    # Everything is written to temporary files first and then swapped in, so a run that has the old store open keeps
+    # reading consistent data
+    written_file_names = []
+    for column_index, column_name in enumerate(value_index_dict):
+        old_column = None if old_polar_store is None else numpy.asarray(old_polar_store.columns[column_index])
+        column_arrays = [old_column[polar_source] if isinstance(polar_source, slice) else polar_source[column_index]
+                         for polar_source in polar_sources]
+        column = numpy.concatenate(column_arrays) if len(column_arrays) > 0 else numpy.zeros(0)
+        column.astype("<f8").tofile(os.path.join(store_directory_path, column_name + ".bin.tmp"))
+        written_file_names.append(column_name + ".bin")
+    numpy.array(offsets, dtype="<i8").tofile(os.path.join(store_directory_path, POLAR_STORE_OFFSETS_FILE_NAME + ".tmp"))
+    written_file_names.append(POLAR_STORE_OFFSETS_FILE_NAME)
+    with open(os.path.join(store_directory_path, POLAR_STORE_HEADER_FILE_NAME + ".tmp"), "w") as header_file:
+        json.dump({"version": POLAR_STORE_VERSION, "row_count": offsets[-1], "polars": polar_headers}, header_file)
+    written_file_names.append(POLAR_STORE_HEADER_FILE_NAME)
+
+    # The old store's files are still memory mapped until everything pointing into them is gone (windows can't
+    # replace a mapped file)
+    old_column = None
+    column_arrays = None
+    old_polar_store = None
+    opened_polar_stores.pop(store_directory_path, None)
+    for file_name in written_file_names:
+        os.replace(os.path.join(store_directory_path, file_name + ".tmp"), os.path.join(store_directory_path, file_name))
+
+    print(f"Polar store of {len(polar_headers)} polars ({offsets[-1]} rows) written to {store_directory_path}")
+    return reused_count, parsed_count
+
+
+# build_polar_store for anything that shouldn't stop because the store can't be written (i.e. the csv directory is read
+# only), says why and returns False instead, the csv files (or the store as it was) are used as they are
+def update_polar_store(csv_directory_path, hash_files=False):
+    try:
+        build_polar_store(csv_directory_path, hash_files)
+        return True
+    except OSError as e:
+        print(f"Polar store in {csv_directory_path} could not be updated, using the csv files as they are")
+        print(repr(e))
+        return False
 
-        # If the n_crit number matches the parameters passed and the reynolds number is within range, parses the
-        # max thickness and camber values from the csv file and if those are also within range, adds this csv file
-        # to the list, otherwise, continues
-        if not ((config_settings.reynolds_min <= r_num_current <= config_settings.reynolds_max) and
-                (config_settings.nCrit_num == 0 or n_crit_current == config_settings.nCrit_num)):
-            continue
 
-        # Opens and reads the file to parse thickness and camber values from it
-        csv_file_data = open(config_settings.csv_directory_path + '/' + file_name).readlines()
-        try:
-            csv_max_thickness = float(csv_file_data[8].split(',')[1])
-            csv_max_camber = float(csv_file_data[9].split(',')[1])
-        except ValueError:
-            print("Error parsing max thickness or max camber for %s\n" % file_name)
-            continue
+# Hash of a csv file's contents, for build_polar_store to tell whether a polar actually changed
+def hash_polar_file(file_path):
+    with open(file_path, "rb") as csv_file:
+        file_contents = csv_file.read()
+    count_event("files_opened")
+    count_event("bytes_read", len(file_contents))
+    return hashlib.blake2b(file_contents, digest_size=16).hexdigest()
 
-        # this is a way of doing it with a regex, they seem to be the same speed so either works
-        '''
-        try:
-            csv_max_thickness = float(AIRFOIL_MAX_THICKNESS_REGEX.search(csv_file_data).group())
-            csv_max_camber = float(AIRFOIL_MAX_CAMBER_REGEX.search(csv_file_data).group())
-        except (ValueError, AttributeError):
-            print("Unreadable Thickness or Camber value for %s\n" % file_name)
-            continue
-        '''
-        if config_settings.thickness_min <= csv_max_thickness <= config_settings.thickness_max and \
-                config_settings.camber_min <= csv_max_camber <= config_settings.camber_max:
-            csv_file_names.append(config_settings.csv_directory_path + '/' + file_name)
-    return csv_file_names
 
+# Polar stores that have been opened, paired with the size and modification time of their header table when they were,
+# so build_polar_store and the scoring after it share one PolarStore instead of reading the header table twice
+opened_polar_stores = {}
 
-# evaluates every airfoil, returns the 5 best scorers
-def find_best(csv_file_paths, given_equation_string, norm_file_path):
-    score_array = []
-    norm_airfoil_data = CsvData(norm_file_path)
 
-    # Running list of the best airfoils so far in order from best to worse
-    airfoil_best_running = []
+# Opens the polar store for a csv directory, returns None if there isn't one (or it can't be read)
+def open_polar_store(csv_directory_path):
+    store_directory_path = os.path.join(csv_directory_path, POLAR_STORE_DIRECTORY_NAME)
+    try:
+        header_stat = os.stat(os.path.join(store_directory_path, POLAR_STORE_HEADER_FILE_NAME))
+    except OSError:
+        return None
+    header_version = (header_stat.st_size, header_stat.st_mtime_ns)
+    if store_directory_path in opened_polar_stores and opened_polar_stores[store_directory_path][0] == header_version:
+        return opened_polar_stores[store_directory_path][1]
+    try:
+        polar_store = PolarStore(store_directory_path)
+        opened_polar_stores[store_directory_path] = (header_version, polar_store)
+        return polar_store
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Polar store at {store_directory_path} could not be opened, csv files will be parsed instead")
+        print(repr(e))
+        return None
 
-    # Parses the given equation string into something that can be evaluated
-    parsed_equation_string = process_equation_string(given_equation_string, norm_airfoil_data)
+
+# Ranking of every scored airfoil, best to worst, airfoils with the same score stay in the order they were added
+# Only the best top_k Airfoil objects are kept (in a bounded heap), everything else is kept as a compact
+# (name, file path, score) entry so scoring a whole directory doesn't keep every airfoil's data in memory
+# Places are 1 based like in the displayed list, removed places are tracked in a fenwick tree so removing a place or
+# finding what is at a place is O(log n) instead of shifting a list
+# Also behaves like the list find_best used to return (len, iteration, slicing, indexing and pop)
+class AirfoilRanking:
+    def __init__(self, top_k=5):
+        self.top_k = top_k
+        self.names = []
+        self.file_paths = []
+        self.scores = []
+        # Min heap of (score, -entry index, airfoil), the root is the worst of the best top_k
+        self.top_airfoil_heap = []
+        self.removed_entries = set()
+
+        # Built by rank_entries once everything is added
+        self.ranked_entries = None
+        self.removal_tree = None
+        self.remaining_count = 0
+        self.entry_airfoils = {}
+
+    def add(self, airfoil):
+        # Adds an already scored airfoil, airfoils without a score should not be added
+        # Only the top_k airfoils keep their polar data, any other airfoil's is let go of as soon as it is out of them
+        entry_index = self.add_score(airfoil.name, airfoil.file_path, airfoil.score)
+        heap_item = (airfoil.score, -entry_index, airfoil)
+        if len(self.top_airfoil_heap) < self.top_k:
+            heapq.heappush(self.top_airfoil_heap, heap_item)
+        elif heap_item[:2] > self.top_airfoil_heap[0][:2]:
+            heapq.heapreplace(self.top_airfoil_heap, heap_item)[2].csv_data = None
+        else:
+            airfoil.csv_data = None
+
+    def add_score(self, name, file_path, score):
+        # Adds an airfoil scored somewhere else (i.e. by a scoring worker) without keeping an Airfoil object for it
+        self.names.append(name)
+        self.file_paths.append(file_path)
+        self.scores.append(score)
+        self.ranked_entries = None
+        return len(self.scores) - 1
+
+    def rank_entries(self):
+        # Orders the entries best to worst (ties in the order they were added) and builds the fenwick tree over the
+        # places that haven't been removed
+        with profile_stage("rank airfoils"):
+            score_array = numpy.array(self.scores, dtype=numpy.float64)
+            entry_indices = numpy.arange(len(score_array))
+            self.ranked_entries = numpy.lexsort((entry_indices, -score_array))
+
+            present = numpy.ones(len(self.ranked_entries) + 1, dtype=numpy.int64)
+            present[0] = 0
+            if self.removed_entries:
+                rank_positions = numpy.empty_like(self.ranked_entries)
+                rank_positions[self.ranked_entries] = entry_indices
+                present[rank_positions[list(self.removed_entries)] + 1] = 0
+            self.remaining_count = int(present.sum())
+
+            # Linear fenwick tree construction, each node adds itself into its parent
+            removal_tree = present.tolist()
+            for tree_index in range(1, len(removal_tree)):
+                parent_index = tree_index + (tree_index & -tree_index)
+                if parent_index < len(removal_tree):
+                    removal_tree[parent_index] += removal_tree[tree_index]
+            self.removal_tree = removal_tree
+
+            self.entry_airfoils = {-negative_entry_index: airfoil
+                                   for _, negative_entry_index, airfoil in self.top_airfoil_heap}
+
+    def ranked_position(self, place):
+        # Position in ranked_entries of the place-th airfoil that hasn't been removed
+        if self.ranked_entries is None:
+            self.rank_entries()
+        if not 1 <= place <= self.remaining_count:
+            raise IndexError(f"There is no place {place} in a ranking of {self.remaining_count} airfoils")
+        tree_index = 0
+        step = 1 << (len(self.removal_tree) - 1).bit_length()
+        while step:
+            next_index = tree_index + step
+            if next_index < len(self.removal_tree) and self.removal_tree[next_index] < place:
+                tree_index = next_index
+                place -= self.removal_tree[next_index]
+            step >>= 1
+        return tree_index
+
+    def airfoil_at(self, place):
+        position = self.ranked_position(place)
+        entry_index = int(self.ranked_entries[position])
+        if entry_index not in self.entry_airfoils:
+            # Kept so the description is only looked up once if this place is displayed again
+            airfoil = Airfoil(self.names[entry_index], self.file_paths[entry_index], load_data=False)
+            airfoil.score = self.scores[entry_index]
+            self.entry_airfoils[entry_index] = airfoil
+        return self.entry_airfoils[entry_index]
+
+    def remove_place(self, place):
+        position = self.ranked_position(place)
+        entry_index = int(self.ranked_entries[position])
+        airfoil = self.airfoil_at(place)
+        self.removed_entries.add(entry_index)
+        self.entry_airfoils.pop(entry_index, None)
+        tree_index = position + 1
+        while tree_index < len(self.removal_tree):
+            self.removal_tree[tree_index] -= 1
+            tree_index += tree_index & -tree_index
+        self.remaining_count -= 1
+        return airfoil
+
+    def page(self, first_place, place_count=5):
+        # The airfoils from first_place up to place_count places after it, fewer if the ranking runs out
+        if self.ranked_entries is None:
+            self.rank_entries()
+        last_place = min(first_place + place_count - 1, self.remaining_count)
+        return [self.airfoil_at(place) for place in range(max(first_place, 1), last_place + 1)]
+
+    def __len__(self):
+        if self.ranked_entries is None:
+            self.rank_entries()
+        return self.remaining_count
+
+    def __iter__(self):
+        for place in range(1, len(self) + 1):
+            yield self.airfoil_at(place)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.airfoil_at(list_index + 1) for list_index in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        return self.airfoil_at(index + 1)
+
+    def pop(self, index=-1):
+        if index < 0:
+            index += len(self)
+        return self.remove_place(index + 1)
+
+
+# evaluates every airfoil, returns an AirfoilRanking of every airfoil that could be scored, the 5 best are kept whole
+# With batch set, equations the compiler supports score BATCH_CHUNK_POLARS airfoils at a time with find_best_batch
+# With workers more than 1, the airfoils are split up and scored by that many processes (see find_best_parallel), with a
+# top_k each worker only sends back its best top_k, so only the best top_k new scores are in the ranking
+# With an alpha_grid, every polar (and the norming airfoil) is resampled onto it first (see AlphaGrid)
+# With a score_cache, polars that were already scored with this equation in an earlier run (and haven't changed since)
+# aren't scored again (see ScoreCache)
+def find_best(csv_file_paths, given_equation_string, norm_file_path, polar_store=None, batch=False, workers=1,
+              alpha_grid=None, score_cache=None, top_k=None):
+    with profile_stage("prepare equation"):
+        norm_airfoil_data = CsvData(norm_file_path, polar_store, alpha_grid)
+        parsed_equation = parse_scoring_equation(given_equation_string, norm_airfoil_data)
+        if parsed_equation is None:
+            return AirfoilRanking()
+
+    score_cache_key = None if score_cache is None else \
+        score_cache.entry_key(given_equation_string, norm_file_path, alpha_grid)
+    unscored_file_paths = csv_file_paths
+    if score_cache_key is not None:
+        with profile_stage("score cache lookup"):
+            cached_scores, unscored_file_paths = score_cache.cached_scores(score_cache_key, csv_file_paths)
+            count_event("scores_reused", len(cached_scores))
+        print(f"Score cache: {len(cached_scores)} scores reused, {len(unscored_file_paths)} polars to score")
+
+    counts_before = dict(event_counts)
+    with profile_stage("score airfoils"):
+        if len(unscored_file_paths) == 0:
+            airfoil_ranking = AirfoilRanking()
+        elif workers > 1:
+            airfoil_ranking = find_best_parallel(unscored_file_paths, given_equation_string, norm_airfoil_data,
+                                                 polar_store, workers, top_k,
+                                                 step_count=getattr(parsed_equation, "step_count", None),
+                                                 alpha_grid=alpha_grid)
+        elif batch and isinstance(parsed_equation, CompiledEquation):
+            airfoil_ranking = find_best_batch(unscored_file_paths, parsed_equation, polar_store, alpha_grid)
+        else:
+            airfoil_ranking = find_best_serial(unscored_file_paths, parsed_equation, norm_airfoil_data, polar_store,
+                                               alpha_grid)
+    print_polar_sources(counts_before)
+    if score_cache_key is None:
+        return airfoil_ranking
+
+    # Every score (None for polars that couldn't be scored) goes in the cache, then the new scores and the cached ones
+    # are ranked together in file order (so ties come out the same as without the cache)
+    # Workers with a top_k only send back their best scores, the rest (and which polars couldn't be scored) aren't known
+    # so they are left out of the cache and the ranking
+    new_scores = dict(zip(airfoil_ranking.file_paths, airfoil_ranking.scores))
+    if workers <= 1 or top_k is None:
+        new_scores = {file_path: new_scores.get(file_path) for file_path in unscored_file_paths}
+    if len(new_scores) > 0:
+        score_cache.store_scores(score_cache_key, new_scores)
+    merged_ranking = AirfoilRanking()
+    for file_path in csv_file_paths:
+        if file_path not in new_scores and file_path not in cached_scores:
+            continue
+        airfoil_name = AIRFOIL_NAME_CSV_REGEX.search(file_path).group()
+        score = new_scores[file_path] if file_path in new_scores else cached_scores[file_path]
+        if score is None:
+            # Polars that were just scored have already been reported
+            if file_path not in new_scores:
+                print("No score could be calculated for:")
+                print(Airfoil(airfoil_name, file_path, load_data=False))
+            continue
+        merged_ranking.add_score(airfoil_name, file_path, score)
+    return merged_ranking
+
+
+# Compiles the equation once so it can be run on the numpy arrays of each airfoil, equations that use python the
+# compiler doesn't support are parsed into a string from process_equation_string to be evaluated with eval() instead
+# Returns None (after saying why) if the equation can't be used at all
+def parse_scoring_equation(given_equation_string, norm_airfoil_data):
+    try:
+        return compile_equation(given_equation_string, norm_airfoil_data)
+    except UnsupportedEquation as e:
+        print(str(e))
+        print("Scoring equation will be evaluated with eval() instead")
+        parsed_equation = process_equation_string(given_equation_string, norm_airfoil_data)
+        print(parsed_equation)
+        return parsed_equation
+    except UnableToEvaluate as e:
+        print("Scoring equation could not be compiled\nError Output:")
+        print(str(e))
+        return None
 
 
-    print(parsed_equation_string)
+# Same as find_best but scores the airfoils one at a time, parsed_equation is a CompiledEquation or a string from
+# process_equation_string
+def find_best_serial(csv_file_paths, parsed_equation, norm_airfoil_data, polar_store=None, alpha_grid=None):
+    airfoil_ranking = AirfoilRanking()
     for file_path in csv_file_paths:
         # Creates an Airfoil Data Class to store the values from this csv
-        current_airfoil = Airfoil(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path)
-        current_airfoil.score_airfoil(parsed_equation_string, norm_airfoil_data)
+        current_airfoil = Airfoil(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path, polar_store,
+                                  alpha_grid=alpha_grid)
+        current_airfoil.score_airfoil(parsed_equation, norm_airfoil_data)
         current_score = current_airfoil.score
-        score_array.append(current_score)
         if current_score is None:
             print("No score could be calculated for:")
             print(current_airfoil)
             continue
 
-        # Index that this value will replace if it's lower than all
-        # subsequent scores (If 5, it is lower than all scores)
-        replace_index = len(airfoil_best_running)
-        while replace_index > 0:
-            # Checks if it beats the score that's one higher than it on the list
-            if (airfoil_best_running[replace_index - 1].score is None
-                    or current_score > airfoil_best_running[replace_index - 1].score):
-                # If this is higher than the score that has an index of one lower, lowers index that this airfoil
-                # should replace
-                replace_index -= 1
-            else:
+        airfoil_ranking.add(current_airfoil)
+
+    if isinstance(parsed_equation, CompiledEquation):
+        print_saved_evaluations(parsed_equation.step_count, parsed_equation.saved_evaluations)
+    return airfoil_ranking
+
+
+# Scores every polar csv in the config's directory that is within its ranges in a single pass, without the polar index,
+# polar store or score cache: each csv is read once (by a thread that stays up to prefetch_count files ahead, so reading
+# overlaps with scoring), checked against the ranges using its first lines (the rest isn't read for polars out of
+# range) and only then parsed and scored
+# Only the best Airfoils are kept whole by the ranking, so memory use stays the same however big the directory is
+# Gives the same ranking as find_airfoil_csvs followed by find_best without a polar store
+def find_best_streaming(config_settings, given_equation_string, norm_file_path, alpha_grid=None,
+                        prefetch_count=STREAM_PREFETCH_COUNT):
+    with profile_stage("prepare equation"):
+        norm_airfoil_data = CsvData(norm_file_path, alpha_grid=alpha_grid)
+        parsed_equation = parse_scoring_equation(given_equation_string, norm_airfoil_data)
+        if parsed_equation is None:
+            return AirfoilRanking()
+
+    airfoil_ranking = AirfoilRanking()
+    for file_path, csv_text in stream_airfoil_csvs(config_settings, prefetch_count):
+        current_airfoil = Airfoil(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path, load_data=False)
+        try:
+            current_airfoil.csv_data = CsvData(file_path, alpha_grid=alpha_grid, csv_text=csv_text)
+        except (IndexError, ValueError):
+            print("%s is not a polar csv file, skipping it\n" % file_path)
+            continue
+        current_airfoil.score_airfoil(parsed_equation, norm_airfoil_data)
+        if current_airfoil.score is None:
+            print("No score could be calculated for:")
+            print(current_airfoil)
+            continue
+        airfoil_ranking.add(current_airfoil)
+
+    if isinstance(parsed_equation, CompiledEquation):
+        print_saved_evaluations(parsed_equation.step_count, parsed_equation.saved_evaluations)
+    return airfoil_ranking
+
+
+# Yields (file path, contents) of every polar csv in the config's directory within its ranges, in file name order
+# The reynolds number and nCrit are checked from the file name before the file is read, thickness and camber from the
+# first lines of the file before the rest of it is read (the same ranges as PolarIndex.query)
+def stream_airfoil_csvs(config_settings, prefetch_count=STREAM_PREFETCH_COUNT):
+    candidate_file_paths = []
+    for file_name in sorted(os.listdir(config_settings.csv_directory_path)):
+        if file_name[-4:] != '.csv':
+            continue
+        try:
+            r_num_current = int(REYNOLDS_NUM_REGEX.search(file_name).group())
+            n_crit_current = int(N_CRIT_NUM_REGEX.search(file_name).group())
+        except (AttributeError, ValueError):
+            continue
+        if config_settings.reynolds_min <= r_num_current <= config_settings.reynolds_max and \
+                config_settings.nCrit_num in [0, n_crit_current]:
+            candidate_file_paths.append(config_settings.csv_directory_path + '/' + file_name)
+    count_event("csv_files_listed", len(candidate_file_paths))
+
+    def polar_in_range(file_path, header_lines):
+        max_thickness, max_camber, _ = parse_polar_header(header_lines, file_path)
+        return max_thickness is not None and \
+            config_settings.thickness_min <= max_thickness <= config_settings.thickness_max and \
+            config_settings.camber_min <= max_camber <= config_settings.camber_max
+
+    for file_path, csv_text, bytes_read in prefetch_polar_texts(candidate_file_paths, prefetch_count, polar_in_range):
+        if bytes_read is None:
+            print("Error reading %s\n" % file_path)
+            continue
+        count_event("files_opened")
+        count_event("bytes_read", bytes_read)
+        if csv_text is not None:
+            yield file_path, csv_text
+
+
+# Yields (file path, contents, bytes read) of each file in csv_file_paths, read by a separate thread that keeps at most
+# prefetch_count files waiting, bytes read is None for files that couldn't be read
+# header_filter(file path, first 10 lines) is checked before the rest of a file is read, files it returns False for
+# are yielded with None for their contents and only their first lines read
+def prefetch_polar_texts(csv_file_paths, prefetch_count=STREAM_PREFETCH_COUNT, header_filter=None):
+    polar_text_queue = queue.Queue(maxsize=max(prefetch_count, 1))
+    # Set if the files aren't all used (i.e. scoring stopped with an error) so the reader doesn't wait for space forever
+    stop_reading = threading.Event()
+
+    def queue_polar_text(queue_item):
+        while not stop_reading.is_set():
+            try:
+                polar_text_queue.put(queue_item, timeout=.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def read_polar_texts():
+        for csv_file_path in csv_file_paths:
+            csv_text = None
+            try:
+                with open(csv_file_path, "r") as csv_file:
+                    header_lines = [csv_file.readline() for _ in range(10)]
+                    bytes_read = sum(len(header_line) for header_line in header_lines)
+                    if header_filter is None or header_filter(csv_file_path, header_lines):
+                        csv_text = "".join(header_lines) + csv_file.read()
+                        bytes_read = len(csv_text)
+            except OSError:
+                bytes_read = None
+            if not queue_polar_text((csv_file_path, csv_text, bytes_read)):
+                return
+        # None marks the end of the files
+        queue_polar_text(None)
+
+    threading.Thread(target=read_polar_texts, daemon=True).start()
+    try:
+        while True:
+            queue_item = polar_text_queue.get()
+            if queue_item is None:
+                return
+            yield queue_item
+    finally:
+        stop_reading.set()
+
+
+# Prints how many times a step of a compiled equation was reused instead of worked out again (see
+# compile_equation_node)
+def print_saved_evaluations(step_count, saved_evaluations):
+    print(f"Scoring equation has {step_count} distinct steps, {saved_evaluations} evaluations of repeated steps were "
+          f"saved by reusing their results")
+
+
+# Same as find_best but scores the airfoils BATCH_CHUNK_POLARS at a time, each chunk loaded into a PolarBatch and scored
+# all at once. A chunk's batch (and its value matrices) is let go of as soon as its scores are worked out, and each
+# polar's data is handed from the chunk to its Airfoil one at a time, so only the airfoils in the ranking's top_k keep
+# their data
+def find_best_batch(csv_file_paths, compiled_equation, polar_store=None, alpha_grid=None):
+    airfoil_ranking = AirfoilRanking()
+    for chunk_start in range(0, len(csv_file_paths), BATCH_CHUNK_POLARS):
+        chunk_file_paths = csv_file_paths[chunk_start:chunk_start + BATCH_CHUNK_POLARS]
+        csv_data_list = [CsvData(file_path, polar_store, alpha_grid) for file_path in chunk_file_paths]
+        batch_scores = compiled_equation.score_batch(PolarBatch(csv_data_list, compiled_equation.norm_csv_data))
+
+        for file_index, (file_path, score) in enumerate(zip(chunk_file_paths, batch_scores)):
+            airfoil = Airfoil(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path, load_data=False)
+            airfoil.csv_data = csv_data_list[file_index]
+            csv_data_list[file_index] = None
+            airfoil.score = score
+            if score is None:
+                print("No score could be calculated for:")
+                print(airfoil)
+                continue
+            airfoil_ranking.add(airfoil)
+    print_saved_evaluations(compiled_equation.step_count, compiled_equation.saved_evaluations)
+    return airfoil_ranking
+
+
+# Scores every airfoil on all of its polars together instead of each polar on its own, so one airfoil can't take several
+# places at different reynolds numbers. The polars are scored a reynolds number and nCrit at a time, each normed to the
+# norming airfoil's polar at that same reynolds number and nCrit (its csv in the norm file's directory, or the norm
+# file itself if there isn't one), then every airfoil's scores are combined with aggregate (one of GROUP_AGGREGATES)
+# With complete_only, airfoils missing a score at any of the reynolds number and nCrit pairs being scored are left out
+# Returns an AirfoilRanking of airfoil names and their combined scores, each with the file path of its best polar
+def find_best_grouped(csv_file_paths, given_equation_string, norm_file_path, polar_store=None, aggregate="mean",
+                      alpha_grid=None, complete_only=False):
+    polar_conditions = [(int(REYNOLDS_NUM_REGEX.search(file_path).group()),
+                         int(N_CRIT_NUM_REGEX.search(file_path).group())) for file_path in csv_file_paths]
+    norm_directory_path = os.path.dirname(norm_file_path)
+    norm_airfoil_name = AIRFOIL_NAME_FILE_REGEX.search(os.path.basename(norm_file_path)).group()
+
+    scored_file_paths = []
+    scored_conditions = []
+    scores = []
+    counts_before = dict(event_counts)
+    for reynolds_num, n_crit_num in sorted(set(polar_conditions)):
+        condition_file_paths = [file_path for file_path, polar_condition in zip(csv_file_paths, polar_conditions)
+                                if polar_condition == (reynolds_num, n_crit_num)]
+        condition_norm_file_path = os.path.join(norm_directory_path,
+                                                f"{norm_airfoil_name}_R_{reynolds_num}_N_{n_crit_num}.csv")
+        if not os.path.isfile(condition_norm_file_path):
+            print(f"There is no {os.path.basename(condition_norm_file_path)}, polars at reynolds number {reynolds_num} "
+                  f"and nCrit {n_crit_num} are normed to {os.path.basename(norm_file_path)} instead")
+            condition_norm_file_path = norm_file_path
+        norm_airfoil_data = CsvData(condition_norm_file_path, polar_store, alpha_grid)
+        try:
+            compiled_equation = compile_equation(given_equation_string, norm_airfoil_data)
+        except UnableToEvaluate as e:
+            print("Grouped scoring only works with equations the equation compiler supports\nError Output:")
+            print(str(e))
+            return AirfoilRanking()
+
+        polar_batch = PolarBatch([CsvData(file_path, polar_store, alpha_grid) for file_path in condition_file_paths],
+                                 norm_airfoil_data)
+        for file_path, score in zip(condition_file_paths, compiled_equation.score_batch(polar_batch)):
+            if score is not None:
+                scored_file_paths.append(file_path)
+                scored_conditions.append((reynolds_num, n_crit_num))
+                scores.append(score)
+    print(f"{len(scores)} of {len(csv_file_paths)} polars could be scored")
+    print_polar_sources(counts_before)
+
+    airfoil_names, polar_counts, group_aggregates, best_polar_indices = \
+        aggregate_airfoil_scores([AIRFOIL_NAME_CSV_REGEX.search(file_path).group() for file_path in scored_file_paths],
+                                 [reynolds_num for reynolds_num, _ in scored_conditions], scores)
+    if complete_only:
+        condition_count = len(set(polar_conditions))
+        complete_groups = polar_counts == condition_count
+        print(f"{int(numpy.count_nonzero(complete_groups))} of {len(airfoil_names)} airfoils have a score at all "
+              f"{condition_count} reynolds number and nCrit pairs")
+    else:
+        complete_groups = numpy.ones(len(airfoil_names), dtype=bool)
+
+    airfoil_ranking = AirfoilRanking()
+    for group_index in numpy.flatnonzero(complete_groups).tolist():
+        airfoil_ranking.add_score(str(airfoil_names[group_index]), scored_file_paths[best_polar_indices[group_index]],
+                                  float(group_aggregates[aggregate][group_index]))
+    return airfoil_ranking
+
+
+# Groups scores by airfoil name and works out every aggregate in GROUP_AGGREGATES for each airfoil in one vectorized
+# pass, reynolds_nums are the reynolds numbers of the scored polars (the weights for re_weighted)
+# Returns the airfoil names (sorted), the number of polars of each, a dictionary pairing each aggregate with an array of
+# its values and the index (into scores) of each airfoil's best polar
+def aggregate_airfoil_scores(airfoil_names, reynolds_nums, scores):
+    score_array = numpy.asarray(scores, dtype=float)
+    reynolds_array = numpy.asarray(reynolds_nums, dtype=float)
+    group_names, group_indices = numpy.unique(numpy.asarray(airfoil_names, dtype=str), return_inverse=True)
+    group_count = len(group_names)
+
+    polar_counts = numpy.bincount(group_indices, minlength=group_count)
+    group_minimums = numpy.full(group_count, numpy.inf)
+    numpy.minimum.at(group_minimums, group_indices, score_array)
+    with numpy.errstate(all="ignore"):
+        group_aggregates = {"mean": numpy.bincount(group_indices, score_array, group_count) / polar_counts,
+                            "min": group_minimums,
+                            "re_weighted": numpy.bincount(group_indices, score_array * reynolds_array, group_count) /
+                                           numpy.bincount(group_indices, reynolds_array, group_count)}
+
+    # Sorted by group and then best score first (ties go to the first polar), so each group's first polar is its best
+    polar_order = numpy.lexsort((numpy.arange(len(score_array)), -score_array, group_indices))
+    group_starts = numpy.cumsum(polar_counts) - polar_counts
+    best_polar_indices = polar_order[group_starts].tolist() if group_count > 0 else []
+    return group_names, polar_counts, group_aggregates, best_polar_indices
+
+
+# Works out several steps of compiled equations (i.e. the terms of one equation, or several whole equations) for every
+# polar in a PolarBatch, compiled_terms is a list of (compiled equation, equation node)
+# Returns an (polars x terms) array of the values of the polars that could be scored for every term, and the indices in
+# the batch of those polars
+def evaluate_batch_terms(polar_batch, compiled_terms):
+    term_columns = []
+    with numpy.errstate(all="ignore"):
+        try:
+            for compiled_equation, term_node in compiled_terms:
+                term_column = term_node.evaluate_batch(polar_batch, compiled_equation, polar_batch.value_mask)
+                term_column = numpy.broadcast_to(numpy.asarray(term_column, dtype=float), (polar_batch.polar_count,))
+                polar_batch.mark_failed(~numpy.isfinite(term_column))
+                term_columns.append(term_column)
+        finally:
+            # Steps shared between the terms are only worked out once, the memo is cleared once they are all done
+            for compiled_equation, _ in compiled_terms:
+                compiled_equation.evaluation_memo = {}
+
+    scored_indices = numpy.flatnonzero(~polar_batch.failed)
+    if len(term_columns) == 0:
+        return numpy.zeros((len(scored_indices), 0)), scored_indices
+    return numpy.column_stack(term_columns)[scored_indices], scored_indices
+
+
+# Value of a constant node, or of a negated one (-.3 is parsed as negate(.3)), None for anything else
+def signed_constant_value(equation_node):
+    if isinstance(equation_node, ConstantNode):
+        return equation_node.value
+    if isinstance(equation_node, NegateNode):
+        child_value = signed_constant_value(equation_node.child)
+        return None if child_value is None else -child_value
+    return None
+
+
+# Splits a compiled equation into a weighted sum of terms, returns a list of (weight, term node)
+# i.e. .4*norm(max(cl)) - .3*norm(max(cd)) is [(.4, norm(max(cl))), (-.3, norm(max(cd)))], anything that isn't a sum,
+# difference, negation, or product/division with a constant is one term. Terms that appear more than once (which
+# compile_equation shares) are combined into one
+def find_weighted_terms(equation_node, weight=1.0):
+    if isinstance(equation_node, BinaryOperationNode):
+        if equation_node.operator in ["+", "-"]:
+            right_weight = weight if equation_node.operator == "+" else -weight
+            weighted_terms = find_weighted_terms(equation_node.left, weight) + \
+                find_weighted_terms(equation_node.right, right_weight)
+            # Combines repeats of the same (shared) term
+            combined_weights = {}
+            term_nodes = {}
+            for term_weight, term_node in weighted_terms:
+                combined_weights[id(term_node)] = combined_weights.get(id(term_node), 0) + term_weight
+                term_nodes[id(term_node)] = term_node
+            return [(combined_weights[node_id], term_nodes[node_id]) for node_id in term_nodes]
+        left_value = signed_constant_value(equation_node.left)
+        right_value = signed_constant_value(equation_node.right)
+        if equation_node.operator == "*" and left_value is not None:
+            return find_weighted_terms(equation_node.right, weight * left_value)
+        if equation_node.operator == "*" and right_value is not None:
+            return find_weighted_terms(equation_node.left, weight * right_value)
+        if equation_node.operator == "/" and right_value is not None and right_value != 0:
+            return find_weighted_terms(equation_node.left, weight / right_value)
+    if isinstance(equation_node, NegateNode):
+        return find_weighted_terms(equation_node.child, -weight)
+    return [(weight, equation_node)]
+
+
+# Class for re-ranking airfoils with different weights on the terms of a scoring equation without scoring them again
+# Every term of the equation (see find_weighted_terms) is worked out once for every airfoil, norms included, into an
+# (airfoils x terms) feature matrix, so the scores for any weights are just feature_values @ weights
+# Airfoils that can't be scored for any of the terms are left out
+class FeatureMatrix:
+    def __init__(self, csv_file_paths, compiled_equation, polar_store=None, alpha_grid=None):
+        weighted_terms = find_weighted_terms(compiled_equation.root_node)
+        self.weights = numpy.array([term_weight for term_weight, _ in weighted_terms], dtype=float)
+        self.term_texts = [term_node.equation_text for _, term_node in weighted_terms]
+
+        csv_data_list = [CsvData(file_path, polar_store, alpha_grid) for file_path in csv_file_paths]
+        polar_batch = PolarBatch(csv_data_list, compiled_equation.norm_csv_data)
+        self.feature_values, scored_indices = evaluate_batch_terms(
+            polar_batch, [(compiled_equation, term_node) for _, term_node in weighted_terms])
+        self.file_paths = [csv_file_paths[file_index] for file_index in scored_indices]
+        self.names = [AIRFOIL_NAME_CSV_REGEX.search(file_path).group() for file_path in self.file_paths]
+
+    def scores(self, weights=None):
+        # Score of every airfoil for these weights (the equation's own weights if None)
+        return self.feature_values @ (self.weights if weights is None else numpy.asarray(weights, dtype=float))
+
+    def rank(self, weights=None):
+        airfoil_ranking = AirfoilRanking()
+        for name, file_path, score in zip(self.names, self.file_paths, self.scores(weights).tolist()):
+            airfoil_ranking.add_score(name, file_path, score)
+        return airfoil_ranking
+
+    def top_k_frequency(self, weight_samples, top_k=5):
+        # weight_samples is a (samples x terms) array of weights, returns the fraction of the samples for which each
+        # airfoil was in the top_k. The samples are scored a chunk at a time with one matrix product each (see
+        # WEIGHT_SWEEP_CHUNK_SCORES)
+        weight_samples = numpy.asarray(weight_samples, dtype=float)
+        airfoil_count = len(self.feature_values)
+        sample_count = len(weight_samples)
+        top_k = min(top_k, airfoil_count)
+        if top_k == 0 or sample_count == 0:
+            return numpy.zeros(airfoil_count)
+        top_k_counts = numpy.zeros(airfoil_count, dtype=numpy.int64)
+        chunk_size = max(1, WEIGHT_SWEEP_CHUNK_SCORES // airfoil_count)
+        for chunk_start in range(0, sample_count, chunk_size):
+            sample_scores = self.feature_values @ weight_samples[chunk_start:chunk_start + chunk_size].T
+            top_rows = numpy.argpartition(-sample_scores, top_k - 1, axis=0)[:top_k]
+            top_k_counts += numpy.bincount(top_rows.ravel(), minlength=airfoil_count)
+        return top_k_counts / sample_count
+
+    def monte_carlo_weights(self, sample_count, spread, seed=None):
+        # Random weights within +-spread (a fraction, .2 is +-20%) of the equation's weights, one row per sample
+        random_generator = numpy.random.default_rng(seed)
+        return self.weights * random_generator.uniform(1 - spread, 1 + spread, (sample_count, len(self.weights)))
+
+
+# Scores the airfoils for sample_count random variations of the scoring equation's weights (see
+# FeatureMatrix.monte_carlo_weights) and prints how often each airfoil was in the top 5, to show how much the ranking
+# depends on the exact weights
+def weight_sweep(csv_file_paths, given_equation_string, norm_file_path, polar_store=None, sample_count=1000,
+                 spread=.2, seed=None, shown_count=10, alpha_grid=None):
+    norm_airfoil_data = CsvData(norm_file_path, polar_store, alpha_grid)
+    try:
+        compiled_equation = compile_equation(given_equation_string, norm_airfoil_data)
+    except UnableToEvaluate as e:
+        print("Weights can only be swept for equations the equation compiler supports\nError Output:")
+        print(str(e))
+        return None
+
+    feature_matrix = FeatureMatrix(csv_file_paths, compiled_equation, polar_store, alpha_grid)
+    print(f"Scoring equation split into {len(feature_matrix.term_texts)} weighted terms:")
+    for term_weight, term_text in zip(feature_matrix.weights.tolist(), feature_matrix.term_texts):
+        print(f"{term_weight:+g} * {term_text}")
+    if len(feature_matrix.term_texts) < 2:
+        print("With only one term, changing its weight can't change the ranking")
+
+    top_5_frequency = feature_matrix.top_k_frequency(
+        feature_matrix.monte_carlo_weights(sample_count, spread, seed), 5)
+    print(f"Airfoils most often in the top 5 over {sample_count} samples of the weights within +-{spread:.0%}:")
+    for airfoil_index in numpy.argsort(-top_5_frequency, kind="stable")[:shown_count]:
+        if top_5_frequency[airfoil_index] == 0:
+            break
+        print(f"{top_5_frequency[airfoil_index]:7.1%}\t{feature_matrix.names[airfoil_index]}\t"
+              f"{feature_matrix.file_paths[airfoil_index]}")
+    return feature_matrix
+
+
+# Sorts airfoils into pareto fronts for several objectives at once, objective_values is an (airfoils x objectives)
+# array where higher is better for every objective. An airfoil is dominated by another that is at least as good for
+# every objective and better for at least one. The first front is every airfoil nothing dominates, the second front is
+# every airfoil only the first front dominates, etc
+# Returns a list of front_count arrays of airfoil indices (fewer if every airfoil is in a front already)
+# Sort-filter-skyline: airfoils are checked in order of their (normalized) sum of objectives, which means anything that
+# dominates an airfoil is always checked before it, so each airfoil only has to be compared with the fronts found so
+# far instead of with every other airfoil. The fronts an airfoil is dominated by are always the first few, so it goes in
+# the first front that doesn't dominate it
+def find_pareto_fronts(objective_values, front_count=1):
+    objective_values = numpy.asarray(objective_values, dtype=float)
+    airfoil_count, objective_count = objective_values.shape
+    if airfoil_count == 0:
+        return []
+
+    # Normalized so one objective with big numbers doesn't decide the order, ties in the sum (rounding) are broken by
+    # the objectives themselves so the order is always one a dominating airfoil comes first in
+    value_ranges = numpy.ptp(objective_values, axis=0)
+    normalized_values = (objective_values - objective_values.min(axis=0)) / numpy.where(value_ranges > 0,
+                                                                                       value_ranges, 1)
+    sort_keys = [-objective_values[:, objective_index] for objective_index in reversed(range(objective_count))]
+    check_order = numpy.lexsort(sort_keys + [-normalized_values.sum(axis=1)])
+
+    # Values of the airfoils in each front, in buffers that get filled up as airfoils are added
+    front_values = []
+    front_members = []
+    for airfoil_index in check_order.tolist():
+        airfoil_values = objective_values[airfoil_index]
+        for front_index in range(front_count):
+            if front_index == len(front_members):
+                front_values.append(numpy.empty((airfoil_count, objective_count)))
+                front_members.append([])
+            member_values = front_values[front_index][:len(front_members[front_index])]
+            dominated = numpy.any(numpy.all(member_values >= airfoil_values, axis=1) &
+                                  numpy.any(member_values > airfoil_values, axis=1))
+            if not dominated:
+                front_values[front_index][len(front_members[front_index])] = airfoil_values
+                front_members[front_index].append(airfoil_index)
                 break
+    return [numpy.array(members, dtype=numpy.intp) for members in front_members]
+
+
+# Multi objective version of find_best, every objective is an equation in the same language as the scoring equation
+# (higher is better, so use i.e. -min(cd) to look for low drag). The airfoils are loaded and each objective worked out
+# in one pass over the data (steps shared between objectives are only worked out once) and then sorted into pareto
+# fronts (see find_pareto_fronts)
+# Returns a list of fronts, each a list of (Airfoil, tuple of its objective values), best first in each front by the
+# sum of the normalized objectives
+def find_best_pareto(csv_file_paths, objective_strings, norm_file_path, polar_store=None, front_count=1,
+                     alpha_grid=None):
+    norm_airfoil_data = CsvData(norm_file_path, polar_store, alpha_grid)
+    node_table = {}
+    try:
+        compiled_objectives = [compile_equation(objective_string, norm_airfoil_data, node_table)
+                               for objective_string in objective_strings]
+    except UnableToEvaluate as e:
+        print("Objectives can only be equations the equation compiler supports\nError Output:")
+        print(str(e))
+        return []
+
+    csv_data_list = [CsvData(file_path, polar_store, alpha_grid) for file_path in csv_file_paths]
+    polar_batch = PolarBatch(csv_data_list, norm_airfoil_data)
+    # Shared steps are the same nodes, so evaluating every objective with the first one's memo reuses them
+    objective_values, scored_indices = evaluate_batch_terms(
+        polar_batch, [(compiled_objectives[0], compiled_objective.root_node)
+                      for compiled_objective in compiled_objectives])
+    print(f"{len(scored_indices)} of {len(csv_file_paths)} airfoils could be scored for every objective")
+
+    pareto_fronts = []
+    for front_indices in find_pareto_fronts(objective_values, front_count):
+        front = []
+        for airfoil_index in front_indices.tolist():
+            file_path = csv_file_paths[scored_indices[airfoil_index]]
+            airfoil = Airfoil(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path, load_data=False)
+            front.append((airfoil, tuple(objective_values[airfoil_index].tolist())))
+        pareto_fronts.append(front)
+    return pareto_fronts
+
+
+def display_pareto_fronts(pareto_fronts, objective_strings):
+    for front_number, front in enumerate(pareto_fronts, 1):
+        print(f"Front {front_number} ({len(front)} airfoils): " + ", ".join(objective_strings))
+        for airfoil, airfoil_objective_values in front:
+            print("\t".join(f"{objective_value:.6g}" for objective_value in airfoil_objective_values) +
+                  f"\t{airfoil.name}\t{airfoil.file_path}")
+
+
+# Everything a scoring worker process needs that is the same for every chunk, set up by initialize_scoring_worker
+scoring_worker_state = {}
+
+
+def initialize_scoring_worker(given_equation_string, norm_memory_name, norm_row_count, norm_file_path,
+                              norm_header_values, store_directory_path, alpha_grid_step=None, norm_alpha_grid_start=None):
+    # The norming airfoil is read straight out of the shared memory block the main process put it in (already
+    # resampled if there is an alpha grid, each worker makes its own copy of the grid for its polars)
+    norm_memory = shared_memory.SharedMemory(name=norm_memory_name)
+    norm_columns = numpy.ndarray((len(value_index_dict), norm_row_count), dtype=numpy.float64, buffer=norm_memory.buf)
+    alpha_grid = None if alpha_grid_step is None else AlphaGrid(alpha_grid_step)
+    norm_airfoil_data = CsvData.from_value_columns(norm_file_path, norm_columns, *norm_header_values,
+                                                   alpha_grid=alpha_grid, alpha_grid_start=norm_alpha_grid_start)
+
+    # Polars in a polar store are memory mapped, so every worker shares the same pages instead of copying them
+    polar_store = None if store_directory_path is None else PolarStore(store_directory_path)
+
+    try:
+        parsed_equation = compile_equation(given_equation_string, norm_airfoil_data)
+    except UnsupportedEquation:
+        parsed_equation = process_equation_string(given_equation_string, norm_airfoil_data)
+
+    scoring_worker_state["norm_memory"] = norm_memory
+    scoring_worker_state["norm_airfoil_data"] = norm_airfoil_data
+    scoring_worker_state["polar_store"] = polar_store
+    scoring_worker_state["alpha_grid"] = alpha_grid
+    scoring_worker_state["parsed_equation"] = parsed_equation
+
+
+def score_csv_chunk(chunk):
+    # Scores one chunk of csv files in a worker process, chunk is (index of the first file, list of file paths, top_k)
+    # Returns the (score, index) pairs of the top_k best airfoils (all of them if top_k is None) best first, the
+    # indices of the airfoils that couldn't be scored, the number of step evaluations that were saved and how many
+    # polars were read from the polar store and parsed ({"polars_from_store": ..., "polars_from_csv": ...})
+    first_index, csv_file_paths, top_k = chunk
+    parsed_equation = scoring_worker_state["parsed_equation"]
+    polar_store = scoring_worker_state["polar_store"]
+    counts_before = dict(event_counts)
+
+    csv_data_list = [CsvData(file_path, polar_store, scoring_worker_state["alpha_grid"])
+                     for file_path in csv_file_paths]
+    saved_evaluations = 0
+    if isinstance(parsed_equation, CompiledEquation):
+        parsed_equation.saved_evaluations = 0
+        chunk_scores = parsed_equation.score_batch(PolarBatch(csv_data_list, parsed_equation.norm_csv_data))
+        saved_evaluations = parsed_equation.saved_evaluations
+    else:
+        chunk_scores = [csv_data.score_csv(parsed_equation, scoring_worker_state["norm_airfoil_data"])
+                        for csv_data in csv_data_list]
+
+    scored = [(score, first_index + chunk_index) for chunk_index, score in enumerate(chunk_scores) if score is not None]
+    failed_indices = [first_index + chunk_index for chunk_index, score in enumerate(chunk_scores) if score is None]
+    # Best score first, ties stay in file order
+    scored.sort(key=lambda score_index: (-score_index[0], score_index[1]))
+    if top_k is not None:
+        scored = scored[:top_k]
+    polar_counts = {counter_name: event_counts.get(counter_name, 0) - counts_before.get(counter_name, 0)
+                    for counter_name in ["polars_from_store", "polars_from_csv"]}
+    return scored, failed_indices, saved_evaluations, polar_counts
+
+
+# Same as find_best but splits the csv files into chunks scored by a pool of worker processes
+# The norming airfoil is put in shared memory once instead of being pickled to every worker, and each worker sends back
+# only its top_k best (everything if top_k is None), which are then merged
+# step_count is the number of distinct steps of the compiled equation (None for eval() equations), for the saved
+# evaluations report
+def find_best_parallel(csv_file_paths, given_equation_string, norm_airfoil_data, polar_store, workers, top_k=None,
+                       step_count=None, alpha_grid=None):
+    norm_columns = numpy.array(norm_airfoil_data.value_columns, dtype=numpy.float64)
+    norm_memory = shared_memory.SharedMemory(create=True, size=max(norm_columns.nbytes, 1))
+    try:
+        numpy.ndarray(norm_columns.shape, dtype=numpy.float64, buffer=norm_memory.buf)[:] = norm_columns
+        norm_header_values = (norm_airfoil_data.max_Cl_Cd, norm_airfoil_data.max_Cl_Cd_Alpha,
+                              norm_airfoil_data.max_thickness, norm_airfoil_data.max_camber)
+        store_directory_path = None if polar_store is None else polar_store.store_directory_path
+
+        # A few chunks per worker so a slow chunk doesn't leave the other workers idle at the end
+        chunk_size = max(1, -(-len(csv_file_paths) // (workers * 4)))
+        chunks = [(first_index, csv_file_paths[first_index:first_index + chunk_size], top_k)
+                  for first_index in range(0, len(csv_file_paths), chunk_size)]
+
+        with multiprocessing.Pool(workers, initializer=initialize_scoring_worker,
+                                  initargs=(given_equation_string, norm_memory.name, norm_columns.shape[1],
+                                            norm_airfoil_data.csv_file_path, norm_header_values,
+                                            store_directory_path, None if alpha_grid is None else alpha_grid.alpha_step,
+                                            norm_airfoil_data.alpha_grid_start)) as scoring_pool:
+            chunk_results = scoring_pool.map(score_csv_chunk, chunks)
+    finally:
+        norm_memory.close()
+        norm_memory.unlink()
+
+    # The polar counts are added to the main process's so find_best can report them
+    for _, failed_indices, _, polar_counts in chunk_results:
+        for counter_name, polar_count in polar_counts.items():
+            count_event(counter_name, polar_count)
+        for failed_index in failed_indices:
+            print("No score could be calculated for:")
+            print(Airfoil(AIRFOIL_NAME_CSV_REGEX.search(csv_file_paths[failed_index]).group(),
+                          csv_file_paths[failed_index], load_data=False))
 
-        airfoil_best_running.insert(replace_index, current_airfoil)
+    if step_count is not None:
+        print_saved_evaluations(step_count, sum(saved_evaluations for _, _, saved_evaluations, _ in chunk_results))
 
-    return airfoil_best_running
+    airfoil_ranking = AirfoilRanking()
+    for score, file_index in heapq.merge(*(scored for scored, _, _, _ in chunk_results),
+                                         key=lambda score_index: (-score_index[0], score_index[1])):
+        if top_k is not None and len(airfoil_ranking.scores) >= top_k:
+            break
+        file_path = csv_file_paths[file_index]
+        airfoil_ranking.add_score(AIRFOIL_NAME_CSV_REGEX.search(file_path).group(), file_path, score)
+    return airfoil_ranking
 
 
 # Replaces an item in a list at a given index with some new value, pushes everything back one, removes the last element
@@ -780,52 +3244,644 @@ def replace_item(given_list, index_to_replace, item_to_insert):
     return shifted_list
 
 
-def display_airfoil_scores(ordered_airfoil_list):
-    place = 1
-    for airfoil in ordered_airfoil_list:
-        print(str(place)+". "+str(airfoil))
-        place += 1
+def display_airfoil_scores(ordered_airfoil_list, first_place=1):
+    with profile_stage("display_airfoil_scores"):
+        # Gives the descriptions a few seconds to be looked up (most will already be cached or prefetched)
+        if airfoil_description_cache is not None:
+            with profile_stage("wait for descriptions"):
+                airfoil_description_cache.wait_for([airfoil.name for airfoil in ordered_airfoil_list])
+        place = first_place
+        for airfoil in ordered_airfoil_list:
+            print(str(place)+". "+str(airfoil))
+            place += 1
+
+
+# Command line options shared by the interactive run and the score command
+def add_scoring_run_arguments(argument_parser):
+    argument_parser.add_argument("--workers", type=int, default=1,
+                                 help="number of processes used to score the airfoils (default 1)")
+    argument_parser.add_argument("--objective", action="append", default=[], metavar="EQUATION",
+                                 help="rank by pareto fronts over several objectives instead of the scoring equation, "
+                                      "give --objective once for each (higher is better)")
+    argument_parser.add_argument("--fronts", type=int, default=1,
+                                 help="number of pareto fronts to show with --objective (default 1)")
+    argument_parser.add_argument("--group-by-airfoil", default=None, choices=GROUP_AGGREGATES, metavar="AGGREGATE",
+                                 help="rank airfoils instead of polars, combining the scores of each airfoil's polars "
+                                      "with mean, min or re_weighted (each polar normed to the norming airfoil's "
+                                      "polar at the same reynolds number and nCrit)")
+    argument_parser.add_argument("--complete-groups", action="store_true",
+                                 help="with --group-by-airfoil, leave out airfoils that are missing a polar at any of "
+                                      "the reynolds numbers and nCrits being scored")
+    argument_parser.add_argument("--no-score-cache", action="store_true",
+                                 help="score every airfoil again instead of reusing scores from earlier runs")
+    argument_parser.add_argument("--stream", action="store_true",
+                                 help="read each csv file once straight from the directory and score it as it is read, "
+                                      "instead of using the polar index, polar store and score cache (for a directory "
+                                      "that is only scored once, or too big to keep a polar store for)")
+    argument_parser.add_argument("--update-store", action="store_true",
+                                 help="bring the csv directory's polar store up to date before scoring (making one if "
+                                      "there isn't one), same as running ingest first")
+    argument_parser.add_argument("--hash-polars", action="store_true",
+                                 help="with --update-store, decide which csv files changed since the store was last "
+                                      "updated by their contents instead of their size and modification time")
+    argument_parser.add_argument("--profile-report", default=None, metavar="FILE",
+                                 help="write the time, cpu time, peak memory, files and bytes read, rows parsed and "
+                                      "evaluations of each stage of the run to FILE as json")
+    argument_parser.add_argument("--profile-dump", default=None, metavar="FILE",
+                                 help="profile every function call with cProfile and write the stats to FILE")
+
+
+# ConfigSettings for the score command, the --config file (if there is one) with any settings given as arguments put
+# over it, settings that are in neither come from HEADLESS_DEFAULT_SETTINGS. Returns None if the settings aren't usable
+def headless_config_settings(command_line_arguments):
+    config_settings = ConfigSettings()
+    if command_line_arguments.config is not None:
+        if not config_settings.parse_config_file(command_line_arguments.config):
+            return None
+    # The arguments are named after the ConfigSettings attributes they set
+    for setting_name in vars(config_settings):
+        if getattr(command_line_arguments, setting_name) is not None:
+            setattr(config_settings, setting_name, getattr(command_line_arguments, setting_name))
+        elif getattr(config_settings, setting_name) is None and setting_name in HEADLESS_DEFAULT_SETTINGS:
+            setattr(config_settings, setting_name, HEADLESS_DEFAULT_SETTINGS[setting_name])
+
+    settings_found = True
+    if config_settings.csv_directory_path is None:
+        print("No csv directory given (use --csv-directory or --config)")
+        settings_found = False
+    if config_settings.norm_file_path is None:
+        print("No norm file given (use --norm-file or --config)")
+        settings_found = False
+    if config_settings.scoring_equation is None and not command_line_arguments.objective:
+        print("No scoring equation given (use --equation, --objective or --config)")
+        settings_found = False
+    if not settings_found or not config_settings.is_valid():
+        return None
+    return config_settings
+
+
+# Writes the rows of a score command's results to output_file as tab separated text, csv or json (a list with one
+# object per row)
+def write_headless_results(output_file, output_format, column_names, result_rows):
+    if output_format == "json":
+        json.dump([dict(zip(column_names, result_row)) for result_row in result_rows], output_file, indent=1)
+        output_file.write("\n")
+    elif output_format == "csv":
+        csv_writer = csv.writer(output_file, lineterminator="\n")
+        csv_writer.writerow(column_names)
+        csv_writer.writerows(result_rows)
+    else:
+        output_file.write("\t".join(column_names) + "\n")
+        for result_row in result_rows:
+            output_file.write("\t".join(str(value) for value in result_row) + "\n")
+
+
+# Packs a csv directory into a polar store (or brings its store up to date) and exits, returns the exit code: 0 if the
+# store was written (or was already up to date), 1 if it couldn't be and 2 if the directory isn't usable
+def run_ingest(argument_list):
+    argument_parser = argparse.ArgumentParser(prog="Airfoil Scoring Tool.py ingest",
+                                              description="Packs every polar csv in a directory into a polar store "
+                                                          "inside it, so later runs don't have to parse them")
+    argument_parser.add_argument("csv_directory_path", metavar="DIRECTORY", help="directory the polar csv files are in")
+    argument_parser.add_argument("--hash", action="store_true",
+                                 help="decide which csv files changed since the store was last updated by their "
+                                      "contents instead of their size and modification time")
+    command_line_arguments = argument_parser.parse_args(argument_list)
+    if not os.path.isdir(command_line_arguments.csv_directory_path):
+        print(f"{command_line_arguments.csv_directory_path} is not a directory")
+        return 2
+    return 0 if update_polar_store(command_line_arguments.csv_directory_path, command_line_arguments.hash) else 1
+
+
+# Scores the airfoils with everything given as command line arguments instead of prompts, for scripts and job
+# schedulers. Nothing is asked for, no gui is shown and no descriptions are looked up, messages go to stderr so only
+# the results end up on stdout (or in --output). Returns the exit code: 0 if there are results, 1 if nothing could be
+# scored and 2 if the settings aren't usable
+def run_headless(argument_list):
+    global run_profiler
+    argument_parser = argparse.ArgumentParser(prog="Airfoil Scoring Tool.py score",
+                                              description="Scores airfoil polar csv files without any prompts")
+    argument_parser.add_argument("--config", default=None, metavar="FILE",
+                                 help="config file to take the settings from (in the analysis_settings.config format), "
+                                      "settings given as arguments are used over the ones in it")
+    argument_parser.add_argument("--csv-directory", dest="csv_directory_path", default=None, metavar="DIRECTORY",
+                                 help="directory the polar csv files are in")
+    argument_parser.add_argument("--norm-file", dest="norm_file_path", default=None, metavar="FILE",
+                                 help="polar csv file of the airfoil the others are normed to")
+    argument_parser.add_argument("--equation", dest="scoring_equation", default=None,
+                                 help="scoring equation (see the README)")
+    argument_parser.add_argument("--ncrit", dest="nCrit_num", type=int, default=None, choices=[0, 5, 9],
+                                 help="nCrit of the polars to score, 0 for both (default 0)")
+    argument_parser.add_argument("--reynolds-min", dest="reynolds_min", type=int, default=None)
+    argument_parser.add_argument("--reynolds-max", dest="reynolds_max", type=int, default=None)
+    argument_parser.add_argument("--thickness-min", dest="thickness_min", type=float, default=None)
+    argument_parser.add_argument("--thickness-max", dest="thickness_max", type=float, default=None)
+    argument_parser.add_argument("--camber-min", dest="camber_min", type=float, default=None)
+    argument_parser.add_argument("--camber-max", dest="camber_max", type=float, default=None)
+    argument_parser.add_argument("--alpha-grid-step", dest="alpha_grid_step", type=float, default=None,
+                                 help="resample every polar onto a grid of angles of attack this far apart (default 0, "
+                                      "off)")
+    argument_parser.add_argument("--top", type=int, default=5,
+                                 help="number of airfoils in the results, 0 for all of them (default 5)")
+    argument_parser.add_argument("--output", default=None, metavar="FILE",
+                                 help="file the results are written to instead of stdout")
+    argument_parser.add_argument("--format", dest="output_format", choices=["text", "csv", "json"], default="text",
+                                 help="text (tab separated), csv or json (default text)")
+    add_scoring_run_arguments(argument_parser)
+    command_line_arguments = argument_parser.parse_args(argument_list)
+    if command_line_arguments.stream and (command_line_arguments.objective or
+                                          command_line_arguments.group_by_airfoil is not None):
+        argument_parser.error("--stream only works with a scoring equation, not --objective or --group-by-airfoil")
+
+    if command_line_arguments.profile_report is not None:
+        run_profiler = RunProfiler()
+    function_profiler = None
+    if command_line_arguments.profile_dump is not None:
+        function_profiler = cProfile.Profile()
+        function_profiler.enable()
+
+    with contextlib.redirect_stdout(sys.stderr):
+        # The profiles are written however the run ends (unusable settings, an error while scoring, etc)
+        try:
+            config_settings = headless_config_settings(command_line_arguments)
+            if config_settings is None:
+                return 2
+            alpha_grid = AlphaGrid(config_settings.alpha_grid_step) if config_settings.alpha_grid_step > 0 else None
+            if not command_line_arguments.stream:
+                with profile_stage("find_airfoil_csvs"):
+                    file_paths = find_airfoil_csvs(config_settings)
+                if command_line_arguments.update_store:
+                    with profile_stage("build_polar_store"):
+                        update_polar_store(config_settings.csv_directory_path, command_line_arguments.hash_polars)
+                polar_store = open_polar_store(config_settings.csv_directory_path)
+            score_cache = None if command_line_arguments.no_score_cache or command_line_arguments.stream else \
+                ScoreCache(os.path.join(os.path.abspath(os.path.dirname(sys.executable)), SCORE_CACHE_DIRECTORY_NAME))
+
+            if command_line_arguments.objective:
+                with profile_stage("find_best_pareto"):
+                    pareto_fronts = find_best_pareto(file_paths, command_line_arguments.objective,
+                                                     config_settings.norm_file_path, polar_store,
+                                                     command_line_arguments.fronts, alpha_grid)
+                column_names = ["front", "name"] + command_line_arguments.objective + ["file_path"]
+                result_rows = [[front_number, airfoil.name] + [float(objective_value)
+                                                               for objective_value in airfoil_objective_values] +
+                               [airfoil.file_path]
+                               for front_number, front in enumerate(pareto_fronts, 1)
+                               for airfoil, airfoil_objective_values in front]
+            else:
+                with profile_stage("find_best"):
+                    if command_line_arguments.stream:
+                        airfoil_ranking = find_best_streaming(config_settings, config_settings.scoring_equation,
+                                                              config_settings.norm_file_path, alpha_grid)
+                    elif command_line_arguments.group_by_airfoil is not None:
+                        airfoil_ranking = find_best_grouped(file_paths, config_settings.scoring_equation,
+                                                            config_settings.norm_file_path, polar_store,
+                                                            command_line_arguments.group_by_airfoil, alpha_grid,
+                                                            command_line_arguments.complete_groups)
+                    else:
+                        # Only the places that will be written out are needed, so with --workers each worker only sends
+                        # back its best --top scores
+                        airfoil_ranking = find_best(file_paths, config_settings.scoring_equation,
+                                                    config_settings.norm_file_path, polar_store, batch=True,
+                                                    workers=command_line_arguments.workers, alpha_grid=alpha_grid,
+                                                    score_cache=score_cache,
+                                                    top_k=None if command_line_arguments.top <= 0 else
+                                                    command_line_arguments.top)
+                place_count = len(airfoil_ranking) if command_line_arguments.top <= 0 else command_line_arguments.top
+                column_names = ["place", "name", "score", "file_path"]
+                result_rows = [[place, airfoil.name, float(airfoil.score), airfoil.file_path]
+                               for place, airfoil in enumerate(airfoil_ranking.page(1, place_count), 1)]
+        finally:
+            finish_profiling(command_line_arguments.profile_report, function_profiler,
+                             command_line_arguments.profile_dump)
+        if len(result_rows) == 0:
+            print("No airfoils could be scored")
+
+    if command_line_arguments.output is None:
+        write_headless_results(sys.stdout, command_line_arguments.output_format, column_names, result_rows)
+    else:
+        try:
+            with open(command_line_arguments.output, "w", newline="") as output_file:
+                write_headless_results(output_file, command_line_arguments.output_format, column_names,
+                                       result_rows)
+        except OSError:
+            print(f"Results could not be written to {command_line_arguments.output}", file=sys.stderr)
+            return 1
+    return 0 if len(result_rows) > 0 else 1
+
+
+# Every polar of a csv directory kept in memory for the serve command, so a scoring request only has to pick its polars
+# out with the polar index and score them. The PolarBatches made for the SERVER_BATCH_CACHE_SIZE most recent filters
+# and norm files are kept too, so asking again with the same filters only runs the equation
+# refresh_if_changed reloads just the csv files that changed since they were loaded (the polar store isn't rewritten
+# while the server has it open, changed polars are parsed from their csv instead)
+class ResidentPolars:
+    def __init__(self, csv_directory_path, polar_store=None, alpha_grid=None):
+        self.csv_directory_path = csv_directory_path
+        self.polar_store = polar_store
+        self.alpha_grid = alpha_grid
+        self.polar_index = PolarIndex(csv_directory_path)
+        self.polar_index.update()
+        # Size and modification time of every csv file when it was last loaded, to tell which ones have changed
+        self.file_stats = self.scan_directory()
+        # Dictionary pairing the path of each polar csv with its CsvData
+        self.csv_data_dict = {}
+        for file_name in self.polar_index.file_names:
+            self.load_polar(file_name)
+        # Dictionary pairing (norm file path, its size and modification time, filters) with (norm CsvData, csv file
+        # paths, airfoil names, PolarBatch), the most recently used last. The norm file can be changed without anything
+        # in the directory changing (i.e. the server's default one), so its stat is part of the key
+        self.batch_cache = {}
+        self.refresh_count = 0
+        # Scoring changes the PolarBatch (which polars failed) and the CompiledEquation (its evaluation memo), so
+        # requests are scored one at a time and polars are only reloaded in between them
+        self.lock = threading.Lock()
+
+    def scan_directory(self):
+        file_stats = {}
+        with os.scandir(self.csv_directory_path) as directory_entries:
+            for directory_entry in directory_entries:
+                if directory_entry.name[-4:] == '.csv':
+                    file_stat = directory_entry.stat()
+                    file_stats[directory_entry.name] = (file_stat.st_size, file_stat.st_mtime_ns)
+        return file_stats
+
+    def load_polar(self, file_name):
+        csv_file_path = self.csv_directory_path + '/' + file_name
+        try:
+            self.csv_data_dict[csv_file_path] = CsvData(csv_file_path, self.polar_store, self.alpha_grid)
+        except (IndexError, ValueError, OSError):
+            print("%s is not a polar csv file, it won't be scored" % file_name)
+            self.csv_data_dict.pop(csv_file_path, None)
+
+    def refresh_if_changed(self):
+        # Reloads every csv file that is new or has changed since the last check and drops removed ones, returns the
+        # number of files that changed. The directory is listed before taking the lock so requests aren't held up
+        file_stats = self.scan_directory()
+        changed_file_names = [file_name for file_name, file_stat in file_stats.items()
+                              if self.file_stats.get(file_name) != file_stat]
+        removed_file_names = [file_name for file_name in self.file_stats if file_name not in file_stats]
+        if len(changed_file_names) == 0 and len(removed_file_names) == 0:
+            return 0
+        with self.lock:
+            self.polar_index.update()
+            for file_name in removed_file_names:
+                self.csv_data_dict.pop(self.csv_directory_path + '/' + file_name, None)
+            for file_name in changed_file_names:
+                # Csv files without a polar's name (airfoil_R_reynolds_N_ncrit.csv) aren't in the index
+                if file_name in self.polar_index.polar_entries:
+                    self.load_polar(file_name)
+            self.file_stats = file_stats
+            self.batch_cache = {}
+            self.refresh_count += 1
+        print(f"Reloaded {len(changed_file_names)} new or changed csv files, {len(removed_file_names)} removed")
+        return len(changed_file_names) + len(removed_file_names)
+
+    def resident_norm_file_path(self, norm_file_path):
+        # Path of a norm file asked for by a request, which has to be a csv file in the csv directory so a request can't
+        # have the server read anything else (a bare file name is looked for in the csv directory)
+        # Raises ValueError for anything outside of it
+        csv_directory_path = os.path.realpath(self.csv_directory_path)
+        requested_file_path = os.path.realpath(os.path.join(csv_directory_path, norm_file_path))
+        if os.path.dirname(requested_file_path) != csv_directory_path or requested_file_path[-4:] != '.csv':
+            raise ValueError(f"norm_file has to be a csv file in {self.csv_directory_path}")
+        return requested_file_path
+
+    def score(self, equation_string, norm_file_path, config_settings):
+        # Scores every resident polar within the ranges in config_settings, returns the number of polars that were in
+        # range and an AirfoilRanking of the ones that could be scored
+        # Raises UnableToEvaluate for equations the compiler doesn't support, and OSError, IndexError or ValueError if
+        # the norm file can't be read
+        norm_file_stat = os.stat(norm_file_path)
+        batch_key = (norm_file_path, norm_file_stat.st_size, norm_file_stat.st_mtime_ns) + \
+            tuple(getattr(config_settings, setting_name) for setting_name in HEADLESS_DEFAULT_SETTINGS)
+        with self.lock:
+            if batch_key in self.batch_cache:
+                batch_entry = self.batch_cache.pop(batch_key)
+            else:
+                norm_csv_data = CsvData(norm_file_path, self.polar_store, self.alpha_grid)
+                csv_file_paths = [csv_file_path for csv_file_path in self.polar_index.query(config_settings)
+                                  if csv_file_path in self.csv_data_dict]
+                airfoil_names = [AIRFOIL_NAME_CSV_REGEX.search(csv_file_path).group()
+                                 for csv_file_path in csv_file_paths]
+                batch_entry = (norm_csv_data, csv_file_paths, airfoil_names,
+                               PolarBatch([self.csv_data_dict[csv_file_path] for csv_file_path in csv_file_paths],
+                                          norm_csv_data))
+            self.batch_cache[batch_key] = batch_entry
+            while len(self.batch_cache) > SERVER_BATCH_CACHE_SIZE:
+                del self.batch_cache[next(iter(self.batch_cache))]
+
+            norm_csv_data, csv_file_paths, airfoil_names, polar_batch = batch_entry
+            compiled_equation = compile_equation(equation_string, norm_csv_data)
+            polar_batch.reset_failed()
+            batch_scores = compiled_equation.score_batch(polar_batch)
+
+        airfoil_ranking = AirfoilRanking()
+        for airfoil_name, csv_file_path, score in zip(airfoil_names, csv_file_paths, batch_scores):
+            if score is not None:
+                airfoil_ranking.add_score(airfoil_name, csv_file_path, score)
+        return len(csv_file_paths), airfoil_ranking
+
+
+# ConfigSettings holding the filter ranges of a scoring request to the server, anything the request leaves out lets
+# every polar through. The request uses the names of the score command's arguments (ncrit, reynolds_min, etc.)
+# Raises ValueError if a range isn't a number
+def request_config_settings(score_request):
+    config_settings = ConfigSettings()
+    for setting_name, default_value in HEADLESS_DEFAULT_SETTINGS.items():
+        request_name = "ncrit" if setting_name == "nCrit_num" else setting_name
+        setting_type = int if setting_name in ["nCrit_num", "reynolds_min", "reynolds_max"] else float
+        try:
+            setattr(config_settings, setting_name, setting_type(score_request.get(request_name, default_value)))
+        except TypeError:
+            raise ValueError(f"{request_name} has to be a number")
+    if config_settings.nCrit_num not in [0, 5, 9]:
+        raise ValueError("ncrit has to be 5, 9 or 0 for both")
+    return config_settings
+
+
+# Runs the scoring server for the serve command, which loads every polar in the csv directory once (see ResidentPolars)
+# and then answers scoring requests over http on the local machine until it is stopped:
+#   POST /score with a json object {"equation": ..., "k": 5, "norm_file": ..., "reynolds_min": ..., etc.} returns
+#       {"polar_count": polars in range, "scored_count": ..., "milliseconds": ..., "ranking": [{"place", "name",
+#       "score", "file_path"}, ...]} with the best k airfoils (all of them if k is 0), a norm_file in the request has
+#       to be in the csv directory (see ResidentPolars.resident_norm_file_path)
+#   GET /status returns the directory, the number of resident polars and how many times they have been reloaded
+# Errors are returned as {"error": message} with status 400 (or 404 for anything else)
+def run_server(argument_list):
+    # Only needed here, so the other commands don't have to import it
+    import http.server
+
+    argument_parser = argparse.ArgumentParser(prog="Airfoil Scoring Tool.py serve",
+                                              description="Keeps the polars of a csv directory in memory and scores "
+                                                          "them for http requests")
+    argument_parser.add_argument("--config", default=None, metavar="FILE",
+                                 help="config file to take the csv directory, norm file and alpha grid step from")
+    argument_parser.add_argument("--csv-directory", dest="csv_directory_path", default=None, metavar="DIRECTORY")
+    argument_parser.add_argument("--norm-file", dest="norm_file_path", default=None, metavar="FILE",
+                                 help="norm file for requests that don't give one")
+    argument_parser.add_argument("--alpha-grid-step", dest="alpha_grid_step", type=float, default=None)
+    argument_parser.add_argument("--host", default="127.0.0.1",
+                                 help="address to listen on (default 127.0.0.1, only this computer)")
+    argument_parser.add_argument("--port", type=int, default=SERVER_DEFAULT_PORT,
+                                 help=f"port to listen on (default {SERVER_DEFAULT_PORT})")
+    argument_parser.add_argument("--poll-seconds", type=float, default=SERVER_POLL_SECONDS,
+                                 help="how often the csv directory is checked for changed files (default "
+                                      f"{SERVER_POLL_SECONDS})")
+    argument_parser.add_argument("--update-store", action="store_true",
+                                 help="bring the csv directory's polar store up to date before loading the polars")
+    command_line_arguments = argument_parser.parse_args(argument_list)
+
+    config_settings = ConfigSettings()
+    if command_line_arguments.config is not None:
+        if not config_settings.parse_config_file(command_line_arguments.config):
+            return 2
+    for setting_name in ["csv_directory_path", "norm_file_path", "alpha_grid_step"]:
+        if getattr(command_line_arguments, setting_name) is not None:
+            setattr(config_settings, setting_name, getattr(command_line_arguments, setting_name))
+    if config_settings.csv_directory_path is None or not os.path.isdir(config_settings.csv_directory_path):
+        print("No usable csv directory given (use --csv-directory or --config)")
+        return 2
+
+    print(f"Loading the polars in {config_settings.csv_directory_path}")
+    load_start_time = time.perf_counter()
+    if command_line_arguments.update_store:
+        update_polar_store(config_settings.csv_directory_path)
+    alpha_grid = AlphaGrid(config_settings.alpha_grid_step) if config_settings.alpha_grid_step > 0 else None
+    resident_polars = ResidentPolars(config_settings.csv_directory_path,
+                                     open_polar_store(config_settings.csv_directory_path), alpha_grid)
+    print(f"{len(resident_polars.csv_data_dict)} polars loaded in {time.perf_counter() - load_start_time:.2f}s")
+
+    class ScoreRequestHandler(http.server.BaseHTTPRequestHandler):
+        def send_json(self, status_code, response_table):
+            response_body = json.dumps(response_table).encode()
+            self.send_response(status_code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(response_body)))
+            self.end_headers()
+            self.wfile.write(response_body)
+
+        def do_GET(self):
+            if self.path != "/status":
+                self.send_json(404, {"error": f"No such path {self.path}, use POST /score or GET /status"})
+                return
+            self.send_json(200, {"csv_directory_path": resident_polars.csv_directory_path,
+                                 "polar_count": len(resident_polars.csv_data_dict),
+                                 "refresh_count": resident_polars.refresh_count})
+
+        def do_POST(self):
+            if self.path != "/score":
+                self.send_json(404, {"error": f"No such path {self.path}, use POST /score or GET /status"})
+                return
+            request_start_time = time.perf_counter()
+            try:
+                score_request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                if not isinstance(score_request, dict) or not isinstance(score_request.get("equation"), str):
+                    raise ValueError("The request has to be a json object with an equation")
+                norm_file_path = config_settings.norm_file_path
+                if "norm_file" in score_request:
+                    if not isinstance(score_request["norm_file"], str):
+                        raise ValueError("norm_file has to be a file name")
+                    norm_file_path = resident_polars.resident_norm_file_path(score_request["norm_file"])
+                if norm_file_path is None:
+                    raise ValueError("No norm_file given and the server doesn't have a default one")
+                place_count = int(score_request.get("k", 5))
+                polar_count, airfoil_ranking = resident_polars.score(score_request["equation"], norm_file_path,
+                                                                     request_config_settings(score_request))
+            except UnableToEvaluate as e:
+                self.send_json(400, {"error": "Scoring equation could not be compiled: " + str(e)})
+                return
+            except (OSError, IndexError) as e:
+                self.send_json(400, {"error": f"Norm file could not be read: {e!r}"})
+                return
+            except (ValueError, TypeError) as e:
+                self.send_json(400, {"error": str(e)})
+                return
+
+            ranked_airfoils = airfoil_ranking.page(1, len(airfoil_ranking) if place_count <= 0 else place_count)
+            self.send_json(200, {"polar_count": polar_count,
+                                 "scored_count": len(airfoil_ranking),
+                                 "milliseconds": (time.perf_counter() - request_start_time) * 1000,
+                                 "ranking": [{"place": place, "name": airfoil.name, "score": airfoil.score,
+                                              "file_path": airfoil.file_path}
+                                             for place, airfoil in enumerate(ranked_airfoils, 1)]})
+
+    def watch_directory():
+        while True:
+            time.sleep(command_line_arguments.poll_seconds)
+            try:
+                resident_polars.refresh_if_changed()
+            except OSError as e:
+                print(f"Csv directory could not be checked for changes: {e!r}")
+
+    threading.Thread(target=watch_directory, daemon=True).start()
+    scoring_server = http.server.ThreadingHTTPServer((command_line_arguments.host, command_line_arguments.port),
+                                                     ScoreRequestHandler)
+    print(f"Scoring server listening on http://{command_line_arguments.host}:{scoring_server.server_port}")
+    try:
+        scoring_server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scoring_server.server_close()
+    return 0
 
 
 if __name__ == "__main__":
-    mainConfig = ConfigSettings()
-    config_configured = input_y_n("Have you configured the analysis_settings.config to match your preferences?\n"
-                                  "Please enter yes if you have and would like to use these settings and no if\n"
-                                  "you have not (If not, the program will prompt you for those parameters now\n"
-                                  "and set up the analysis_settings.config with these parameters for use next time)\n")
-
-    if not config_configured:
-        mainConfig.input_config_settings()
-        mainConfig.write()
-    else:
-        parse_succeeded = mainConfig.parse_config_file()
-        if not parse_succeeded or not mainConfig.is_valid():
-            print("Config file is not usable, beginning config setup")
+    # Needed for the scoring worker processes to start in the frozen (pyinstaller) executable
+    multiprocessing.freeze_support()
+
+    # "Airfoil Scoring Tool.py ingest <csv directory> [--hash]" packs the directory into a polar store and exits (see
+    # run_ingest)
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "ingest":
+        sys.exit(run_ingest(sys.argv[2:]))
+
+    # "Airfoil Scoring Tool.py score --csv-directory <directory> --norm-file <csv> --equation <equation> ..." scores
+    # without any prompts and exits (see run_headless)
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "score":
+        sys.exit(run_headless(sys.argv[2:]))
+
+    # "Airfoil Scoring Tool.py serve --csv-directory <directory> [--norm-file <csv>] [--port 8765]" keeps the polars in
+    # memory and scores them for http requests until it is stopped (see run_server)
+    if len(sys.argv) > 1 and sys.argv[1].lower() == "serve":
+        sys.exit(run_server(sys.argv[2:]))
+
+    # Optional command line settings for the interactive run, i.e. "Airfoil Scoring Tool.py --workers 8"
+    argument_parser = argparse.ArgumentParser(description="Scores airfoil polar csv files with a scoring equation")
+    add_scoring_run_arguments(argument_parser)
+    argument_parser.add_argument("--sweep", type=int, default=0, metavar="SAMPLES",
+                                 help="also score SAMPLES random variations of the scoring equation's weights and show "
+                                      "how often each airfoil is in the top 5")
+    argument_parser.add_argument("--sweep-spread", type=float, default=.2, metavar="FRACTION",
+                                 help="how far the swept weights can be from the equation's weights (default .2 for "
+                                      "+-20%%)")
+    argument_parser.add_argument("--sweep-seed", type=int, default=None,
+                                 help="random seed for the swept weights, to repeat a sweep exactly")
+    command_line_arguments = argument_parser.parse_args()
+    if command_line_arguments.stream and (command_line_arguments.objective or command_line_arguments.sweep > 0 or
+                                          command_line_arguments.group_by_airfoil is not None):
+        argument_parser.error("--stream only works with a scoring equation, not --objective, --sweep or "
+                              "--group-by-airfoil")
+
+    if command_line_arguments.profile_report is not None:
+        run_profiler = RunProfiler()
+    main_function_profiler = None
+    if command_line_arguments.profile_dump is not None:
+        main_function_profiler = cProfile.Profile()
+        main_function_profiler.enable()
+
+    # The profiles are written however the run ends (an error while scoring, stopping it with ctrl+c, etc)
+    try:
+        mainConfig = ConfigSettings()
+        config_configured = input_y_n(
+            "Have you configured the analysis_settings.config to match your preferences?\n"
+            "Please enter yes if you have and would like to use these settings and no if\n"
+            "you have not (If not, the program will prompt you for those parameters now\n"
+            "and set up the analysis_settings.config with these parameters for use next time)\n")
+
+        if not config_configured:
             mainConfig.input_config_settings()
             mainConfig.write()
-
-    print("Configuration Settings to be used:")
-    print(mainConfig)
-
-    # Creates a list of all csv files that should be considered given parameters
-    print("Finding list of airfoils within parameters to use(can take a while depending on parameters)")
-    file_paths = find_airfoil_csvs(mainConfig)
-
-    print(f"List of {len(file_paths)} csv files for consideration created, beginning analysis")
-    print("This should be relatively quick(under 10 min)")
-    # Output the top 5 scores with associated polar file names
-    best_airfoil_list = find_best(file_paths, mainConfig.scoring_equation, mainConfig.norm_file_path)
-    display_airfoil_scores(best_airfoil_list[0:5])
-    airfoil_to_remove_place = input_integer("Please enter the placing of any airfoil you would like to remove from "
-                                            "consideration\nI.E enter 1 for the first place, 5 for the 5th place, "
-                                            "etc\nTo remove none, enter 0\n", [0, 1, 2, 3, 4, 5], True)
-    # Displays the scores and lets the user remove some of them from consideration
-    while airfoil_to_remove_place != 0:
-        best_airfoil_list.pop(airfoil_to_remove_place - 1)
-        display_airfoil_scores(best_airfoil_list[0:5])
-        airfoil_to_remove_place = input_integer("Please enter the placing of any airfoil you would like to remove from "
-                                                "consideration\nI.E enter 1 for the first place, 5 for the 5th place, "
-                                                "etc\nTo remove none, enter 0\n", [0, 1, 2, 3, 4, 5], True)
+        else:
+            parse_succeeded = mainConfig.parse_config_file()
+            if not parse_succeeded or not mainConfig.is_valid():
+                print("Config file is not usable, beginning config setup")
+                mainConfig.input_config_settings()
+                mainConfig.write()
+
+        print("Configuration Settings to be used:")
+        print(mainConfig)
+
+        # With --stream the csv files are found and read while they are scored instead (see find_best_streaming)
+        file_paths = None
+        main_polar_store = None
+        if not command_line_arguments.stream:
+            # Creates a list of all csv files that should be considered given parameters
+            print("Finding list of airfoils within parameters to use(can take a while depending on parameters)")
+            with profile_stage("find_airfoil_csvs"):
+                file_paths = find_airfoil_csvs(mainConfig)
+
+            # The polar store (if ingest or --update-store has made one) is only written to when asked, csv files that
+            # are new or have changed since it was last updated are parsed instead (see CsvData)
+            if command_line_arguments.update_store:
+                with profile_stage("build_polar_store"):
+                    update_polar_store(mainConfig.csv_directory_path, command_line_arguments.hash_polars)
+            main_polar_store = open_polar_store(mainConfig.csv_directory_path)
+            if main_polar_store is not None:
+                print(f"Using polar store of {len(main_polar_store.polar_headers)} polars")
+
+        # Polars are resampled onto one grid of angles of attack if the config sets an alpha grid step
+        main_alpha_grid = AlphaGrid(mainConfig.alpha_grid_step) if mainConfig.alpha_grid_step > 0 else None
+
+        # Descriptions of the best airfoils are looked up in the background and cached next to the config file
+        airfoil_description_cache = DescriptionCache(os.path.join(os.path.abspath(os.path.dirname(sys.executable)),
+                                                                  DESCRIPTION_CACHE_FILE_NAME))
+        # Scores from earlier runs are kept next to the config file too
+        main_score_cache = None if command_line_arguments.no_score_cache or command_line_arguments.stream else \
+            ScoreCache(os.path.join(os.path.abspath(os.path.dirname(sys.executable)), SCORE_CACHE_DIRECTORY_NAME))
+
+        if file_paths is not None:
+            print(f"List of {len(file_paths)} csv files for consideration created, beginning analysis")
+        print("This should be relatively quick(under 10 min)")
+        if command_line_arguments.objective:
+            with profile_stage("find_best_pareto"):
+                main_pareto_fronts = find_best_pareto(file_paths, command_line_arguments.objective,
+                                                      mainConfig.norm_file_path, main_polar_store,
+                                                      command_line_arguments.fronts, main_alpha_grid)
+            display_pareto_fronts(main_pareto_fronts, command_line_arguments.objective)
+        else:
+            # Output the top 5 scores with associated polar file names
+            with profile_stage("find_best"):
+                if command_line_arguments.stream:
+                    best_airfoil_list = find_best_streaming(mainConfig, mainConfig.scoring_equation,
+                                                            mainConfig.norm_file_path, main_alpha_grid)
+                elif command_line_arguments.group_by_airfoil is not None:
+                    best_airfoil_list = find_best_grouped(file_paths, mainConfig.scoring_equation,
+                                                          mainConfig.norm_file_path, main_polar_store,
+                                                          command_line_arguments.group_by_airfoil, main_alpha_grid,
+                                                          command_line_arguments.complete_groups)
+                else:
+                    best_airfoil_list = find_best(file_paths, mainConfig.scoring_equation, mainConfig.norm_file_path,
+                                                  main_polar_store, batch=True, workers=command_line_arguments.workers,
+                                                  alpha_grid=main_alpha_grid, score_cache=main_score_cache)
+            if command_line_arguments.sweep > 0:
+                with profile_stage("weight_sweep"):
+                    weight_sweep(file_paths, mainConfig.scoring_equation, mainConfig.norm_file_path, main_polar_store,
+                                 command_line_arguments.sweep, command_line_arguments.sweep_spread,
+                                 command_line_arguments.sweep_seed, alpha_grid=main_alpha_grid)
+            # Displays the scores 5 at a time and lets the user remove some of them from consideration or page through
+            # the rest of the ranking without scoring anything again
+            first_displayed_place = 1
+            while True:
+                displayed_airfoils = best_airfoil_list.page(first_displayed_place, 5)
+                # Starts on the descriptions of this page and the next one, so the next page is ready when asked for
+                airfoil_description_cache.prefetch([airfoil.name for airfoil in
+                                                    best_airfoil_list.page(first_displayed_place, 10)])
+                display_airfoil_scores(displayed_airfoils, first_displayed_place)
+                displayed_places = list(range(first_displayed_place, first_displayed_place + len(displayed_airfoils)))
+                airfoil_to_remove_place = input_integer(
+                    "Please enter the placing of any airfoil you would like to remove from consideration\n"
+                    f"I.E enter {first_displayed_place} for place {first_displayed_place}, "
+                    f"{first_displayed_place + 1} for place {first_displayed_place + 1}, etc\n"
+                    f"To see the next 5, enter -1, to see the previous 5, enter -2 "
+                    f"({len(best_airfoil_list)} airfoils ranked)\n"
+                    "To remove none, enter 0\n", [0, -1, -2] + displayed_places, True)
+                if airfoil_to_remove_place == 0:
+                    break
+                elif airfoil_to_remove_place == -1:
+                    if first_displayed_place + 5 <= len(best_airfoil_list):
+                        first_displayed_place += 5
+                elif airfoil_to_remove_place == -2:
+                    first_displayed_place = max(1, first_displayed_place - 5)
+                else:
+                    best_airfoil_list.remove_place(airfoil_to_remove_place)
+                    # Steps back a page if the last airfoil on this page was removed
+                    if first_displayed_place > len(best_airfoil_list):
+                        first_displayed_place = max(1, first_displayed_place - 5)
+        airfoil_description_cache.close()
+    finally:
+        finish_profiling(command_line_arguments.profile_report, main_function_profiler,
+                         command_line_arguments.profile_dump)
     input("Press enter to exit")
 
 
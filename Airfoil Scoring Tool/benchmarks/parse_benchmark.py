@@ -0,0 +1,103 @@
+# Micro-benchmark for reading polar csv files, compares the line by line parser CsvData used to have with
+# read_polar_csv over every csv in a directory (Full CSV Directory by default)
+# Run with: python "Airfoil Scoring Tool/benchmarks/parse_benchmark.py" [csv directory] [--limit N] [--repeat N]
+import argparse
+import contextlib
+import importlib.util
+import io
+import os
+import sys
+import time
+
+import regex
+
+BENCHMARK_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(BENCHMARK_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+DEFAULT_CSV_DIRECTORY_PATH = os.path.join(os.path.dirname(os.path.dirname(BENCHMARK_DIRECTORY_PATH)),
+                                          "Full CSV Directory")
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+# It is put in sys.modules so the scoring workers' functions can be pickled by name (see scoring_benchmark --workers)
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_spec.name] = scoring_tool
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+# The parser CsvData.parse_values used before read_polar_csv, kept here as the reference to measure against
+def line_by_line_parse(csv_file_path):
+    csv_file = open(csv_file_path, "r")
+    alpha_list = []
+    alpha_value_dict = {}
+    current_line_index = 13
+    all_lines = csv_file.readlines()
+    num_lines = len(all_lines)
+
+    if all_lines[0][0:12] != "Xfoil polar.":
+        raise IndexError
+
+    max_Cl_Cd = float(all_lines[6].split(',')[1])
+    max_Cl_Cd_Alpha = float(all_lines[7].split(',')[1])
+    try:
+        max_thickness = float(all_lines[8].split(',')[1])
+        max_camber = float(all_lines[9].split(',')[1])
+    except (ValueError, IndexError):
+        max_thickness = None
+        max_camber = None
+
+    while current_line_index < num_lines:
+        line_tokens = regex.split(r',', all_lines[current_line_index])
+        try:
+            alpha_value_dict[float(line_tokens[0])] = tuple((float(line_tokens[index]) for index in range(0, 7)))
+            alpha_list.append(float(line_tokens[0]))
+        except ValueError:
+            print(f"Error reading line {current_line_index} in {csv_file_path}")
+        current_line_index += 1
+
+    csv_file.close()
+    return [alpha_list, alpha_value_dict, max_Cl_Cd, max_Cl_Cd_Alpha, max_thickness, max_camber]
+
+
+# Best of repeat passes over every file, in seconds per file
+def time_per_file(parse_function, csv_file_paths, repeat):
+    best_time = None
+    for _ in range(repeat):
+        start_time = time.perf_counter()
+        # Malformed rows get printed by both parsers, that isn't what is being measured
+        with contextlib.redirect_stdout(io.StringIO()):
+            for csv_file_path in csv_file_paths:
+                parse_function(csv_file_path)
+        pass_time = time.perf_counter() - start_time
+        best_time = pass_time if best_time is None else min(best_time, pass_time)
+    return best_time / len(csv_file_paths)
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Times parsing polar csv files line by line against "
+                                                          "read_polar_csv")
+    argument_parser.add_argument("csv_directory_path", nargs="?", default=DEFAULT_CSV_DIRECTORY_PATH)
+    argument_parser.add_argument("--limit", type=int, default=None, help="only time the first N csv files")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="passes over the files, the best is kept")
+    command_line_arguments = argument_parser.parse_args()
+
+    scoring_tool = load_scoring_tool()
+    benchmark_file_paths = [os.path.join(command_line_arguments.csv_directory_path, file_name)
+                            for file_name in sorted(os.listdir(command_line_arguments.csv_directory_path))
+                            if file_name[-4:] == '.csv'][:command_line_arguments.limit]
+    print(f"Parsing {len(benchmark_file_paths)} csv files from {command_line_arguments.csv_directory_path}")
+
+    benchmark_results = [
+        ("line by line (old parse_values)", time_per_file(line_by_line_parse, benchmark_file_paths,
+                                                          command_line_arguments.repeat)),
+        ("read_polar_csv", time_per_file(scoring_tool.read_polar_csv, benchmark_file_paths,
+                                         command_line_arguments.repeat)),
+        ("CsvData (read_polar_csv + columns)", time_per_file(scoring_tool.CsvData, benchmark_file_paths,
+                                                             command_line_arguments.repeat)),
+    ]
+    reference_time = benchmark_results[0][1]
+    for parser_name, seconds_per_file in benchmark_results:
+        print(f"{parser_name:36s} {seconds_per_file * 1e6:9.1f} us per file   "
+              f"{reference_time / seconds_per_file:5.2f}x")
@@ -0,0 +1,248 @@
+# Benchmark suite for the scoring pipeline, times each stage of a scoring run separately over Full CSV Directory and
+# over synthetic copies of it scaled up 5x and 20x (every csv linked in again under a different airfoil name)
+# Each corpus is made in a temporary directory (hard links, so it is quick and takes no space) so the polar store the
+# tool keeps next to the csvs doesn't end up in the real csv directory, and the corpus's polar index (kept next to
+# analysis_settings.config) is deleted afterwards
+# Whole find_best runs are also timed with each number of --workers, reading the csv files and reading the polar store
+# Results are written to a json file that can be compared with one from another commit using --compare
+# Run with: python "Airfoil Scoring Tool/benchmarks/scoring_benchmark.py" [csv directory] [--scales 1 5 20]
+#           [--limit N] [--workers 1 2 4] [--output results.json] [--compare old_results.json]
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import numpy
+
+from parse_benchmark import DEFAULT_CSV_DIRECTORY_PATH, load_scoring_tool
+
+# The examples from the README plus a few that use the rest of the equation language
+BENCHMARK_EQUATIONS = [
+    "max(cl)",
+    ".4 * norm(max(cl)) -.3 * norm(max(cd))+.2*norm(min(element_wise_operation(cp,cd,'/')))+.1*norm(max(cm))",
+    "norm(max(cl))",
+    ".4*norm(max(cl)) - .3*norm(average(cd)) + .2*norm(average(cm))+.1*norm(stall_angle)",
+    "max(norm(element_wise_operation(cl,cd,'/')))",
+    "average(norm(cl)) + pow(max(cl), 2) - min(cd)*10",
+]
+NORM_FILE_NAME = "clarky-il_R_100000_N_9.csv"
+# Equation the --workers runs are timed with (the one in analysis_settings.config)
+WORKERS_BENCHMARK_EQUATION = BENCHMARK_EQUATIONS[3]
+
+
+# Links (or copies, if linking isn't possible) the first limit csvs of csv_directory_path into corpus_directory_path
+# scale times, copies after the first get "-x<copy number>" added to the airfoil name
+def make_corpus(csv_directory_path, corpus_directory_path, scale, limit):
+    csv_file_names = sorted(file_name for file_name in os.listdir(csv_directory_path)
+                            if file_name[-4:] == '.csv')[:limit]
+    if NORM_FILE_NAME not in csv_file_names and os.path.isfile(os.path.join(csv_directory_path, NORM_FILE_NAME)):
+        csv_file_names.append(NORM_FILE_NAME)
+    os.makedirs(corpus_directory_path)
+    for copy_number in range(scale):
+        for file_name in csv_file_names:
+            corpus_file_name = file_name if copy_number == 0 else file_name.replace("_R_", f"-x{copy_number}_R_", 1)
+            source_path = os.path.join(csv_directory_path, file_name)
+            corpus_path = os.path.join(corpus_directory_path, corpus_file_name)
+            try:
+                os.link(source_path, corpus_path)
+            except OSError:
+                shutil.copyfile(source_path, corpus_path)
+
+
+# Config that lets every polar in the corpus through find_airfoil_csvs
+def benchmark_config(scoring_tool, corpus_directory_path):
+    config_settings = scoring_tool.ConfigSettings()
+    config_settings.csv_directory_path = corpus_directory_path
+    config_settings.norm_file_path = os.path.join(corpus_directory_path, NORM_FILE_NAME)
+    config_settings.nCrit_num = 0
+    config_settings.reynolds_min = 0
+    config_settings.reynolds_max = 10000000
+    config_settings.thickness_min = 0
+    config_settings.thickness_max = 100
+    config_settings.camber_min = 0
+    config_settings.camber_max = 100
+    return config_settings
+
+
+# Runs function once with anything it prints thrown away (stall angle messages, etc.), returns (seconds, result)
+def time_call(function, *arguments):
+    with contextlib.redirect_stdout(io.StringIO()):
+        start_time = time.perf_counter()
+        result = function(*arguments)
+        return time.perf_counter() - start_time, result
+
+
+# Best of repeat runs of function, in seconds
+def best_time(function, repeat, *arguments):
+    return min(time_call(function, *arguments)[0] for _ in range(repeat))
+
+
+def score_each(parsed_equation, csv_data_list, norm_airfoil_data):
+    # Per airfoil evaluation, the same way find_best scores airfoils one at a time
+    if isinstance(parsed_equation, str):
+        return [csv_data.score_csv(parsed_equation, norm_airfoil_data) for csv_data in csv_data_list]
+    return [parsed_equation.score(csv_data) for csv_data in csv_data_list]
+
+
+def rank_scores(scoring_tool, csv_file_paths, scores):
+    airfoil_ranking = scoring_tool.AirfoilRanking()
+    for file_path, score in zip(csv_file_paths, scores):
+        if score is not None:
+            airfoil_ranking.add_score(os.path.basename(file_path), file_path, score)
+    airfoil_ranking.rank_entries()
+    return airfoil_ranking.page(1, 5)
+
+
+# 1, 2, 4, ... up to the number of CPU cores
+def default_worker_counts():
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= (os.cpu_count() or 1):
+        worker_counts.append(worker_counts[-1] * 2)
+    return worker_counts
+
+
+# Times every stage for one corpus, returns a list of result dictionaries
+def benchmark_corpus(scoring_tool, corpus_directory_path, scale, repeat, worker_counts):
+    results = []
+
+    # polar_count is None for stages that happen once per run instead of once per polar
+    def record(stage, seconds, polar_count, equation=None):
+        microseconds_per_polar = seconds * 1e6 / polar_count if polar_count else None
+        results.append({"scale": scale, "stage": stage, "equation": equation, "seconds": seconds,
+                        "polar_count": polar_count, "microseconds_per_polar": microseconds_per_polar})
+        print(f"{scale:3d}x  {stage:36s} {seconds:10.4f} s  "
+              + ("      per call      " if polar_count is None else
+                 f"{polar_count:7d} polars {microseconds_per_polar:7.1f} us each")
+              + ("" if equation is None else f"  {equation[:48]}"))
+
+    config_settings = benchmark_config(scoring_tool, corpus_directory_path)
+    # The first run builds the polar index, later runs only check it is up to date
+    seconds, csv_file_paths = time_call(scoring_tool.find_airfoil_csvs, config_settings)
+    record("find_airfoil_csvs (cold)", seconds, len(csv_file_paths))
+    record("find_airfoil_csvs (warm)", best_time(scoring_tool.find_airfoil_csvs, repeat, config_settings),
+           len(csv_file_paths))
+
+    seconds, csv_data_list = time_call(lambda: [scoring_tool.CsvData(file_path) for file_path in csv_file_paths])
+    record("CsvData (parse csv)", seconds, len(csv_file_paths))
+    record("build_polar_store", time_call(scoring_tool.build_polar_store, corpus_directory_path)[0],
+           len(csv_file_paths))
+    polar_store = scoring_tool.open_polar_store(corpus_directory_path)
+    record("CsvData (polar store)",
+           best_time(lambda: [scoring_tool.CsvData(file_path, polar_store) for file_path in csv_file_paths], repeat),
+           len(csv_file_paths))
+
+    norm_airfoil_data = scoring_tool.CsvData(config_settings.norm_file_path)
+    for equation in BENCHMARK_EQUATIONS:
+        # Both only happen once per run, so they are timed over 100 calls and recorded per call
+        record("process_equation_string",
+               best_time(lambda: [scoring_tool.process_equation_string(equation, norm_airfoil_data)
+                                  for _ in range(100)], repeat) / 100, None, equation)
+        record("compile_equation",
+               best_time(lambda: [scoring_tool.compile_equation(equation, norm_airfoil_data)
+                                  for _ in range(100)], repeat) / 100, None, equation)
+
+        processed_equation = scoring_tool.process_equation_string(equation, norm_airfoil_data)
+        compiled_equation = scoring_tool.compile_equation(equation, norm_airfoil_data)
+        seconds, scores = time_call(score_each, processed_equation, csv_data_list, norm_airfoil_data)
+        record("evaluate (eval, per airfoil)", seconds, len(csv_data_list), equation)
+        record("evaluate (compiled, per airfoil)",
+               best_time(score_each, repeat, compiled_equation, csv_data_list, norm_airfoil_data),
+               len(csv_data_list), equation)
+        record("evaluate (batch)",
+               best_time(lambda: compiled_equation.score_batch(
+                   scoring_tool.PolarBatch(csv_data_list, norm_airfoil_data)), repeat),
+               len(csv_data_list), equation)
+        record("ranking", best_time(rank_scores, repeat, scoring_tool, csv_file_paths, scores),
+               len(csv_data_list), equation)
+
+    # Without a polar store each worker parses its own share of the csv files, with one they read the same memory mapped
+    # store (one worker scores in batches like the interactive run, more split the polars between processes)
+    for workers in worker_counts:
+        for polar_source, workers_polar_store in [("csv", None), ("polar store", polar_store)]:
+            record(f"find_best --workers {workers} ({polar_source})",
+                   best_time(lambda: scoring_tool.find_best(csv_file_paths, WORKERS_BENCHMARK_EQUATION,
+                                                            config_settings.norm_file_path, workers_polar_store,
+                                                            batch=True, workers=workers), repeat),
+                   len(csv_file_paths), WORKERS_BENCHMARK_EQUATION)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Prints how much faster (or slower) every stage is than in an earlier results file, by time per polar so results made
+# with a different --limit can still be compared
+def compare_results(results, old_results_file_path):
+    with open(old_results_file_path, "r") as old_results_file:
+        old_results = json.load(old_results_file)
+
+    def stage_time(result):
+        return result["seconds"] if result["microseconds_per_polar"] is None else result["microseconds_per_polar"]
+
+    old_times = {(result["scale"], result["stage"], result["equation"]): stage_time(result)
+                 for result in old_results["results"]}
+    print(f"Speedup compared with {old_results_file_path} (commit {old_results.get('commit')}):")
+    for result in results:
+        result_key = (result["scale"], result["stage"], result["equation"])
+        if result_key in old_times and stage_time(result) > 0:
+            print(f"{result['scale']:3d}x  {result['stage']:36s} {old_times[result_key] / stage_time(result):6.2f}x"
+                  + ("" if result["equation"] is None else f"  {result['equation'][:48]}"))
+
+
+if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Times each stage of the scoring pipeline over the csv "
+                                                          "corpus and scaled up copies of it")
+    argument_parser.add_argument("csv_directory_path", nargs="?", default=DEFAULT_CSV_DIRECTORY_PATH)
+    argument_parser.add_argument("--scales", type=int, nargs="+", default=[1, 5, 20],
+                                 help="sizes of the corpora as multiples of the csv directory (default 1 5 20)")
+    argument_parser.add_argument("--limit", type=int, default=None,
+                                 help="only use the first N csv files of the directory (before scaling)")
+    argument_parser.add_argument("--repeat", type=int, default=3, help="passes over each stage, the best is kept")
+    argument_parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts(),
+                                 help="numbers of worker processes to time find_best with (default 1, 2, 4, ... up "
+                                      "to the number of CPU cores)")
+    argument_parser.add_argument("--output", default="scoring_benchmark_results.json",
+                                 help="json file the results are written to")
+    argument_parser.add_argument("--compare", default=None, metavar="OLD_RESULTS",
+                                 help="results file from an earlier run to compare against")
+    command_line_arguments = argument_parser.parse_args()
+
+    scoring_tool = load_scoring_tool()
+    all_results = []
+    for corpus_scale in command_line_arguments.scales:
+        with tempfile.TemporaryDirectory() as temporary_directory_path:
+            corpus_path = os.path.join(temporary_directory_path, f"corpus_{corpus_scale}x")
+            make_corpus(command_line_arguments.csv_directory_path, corpus_path, corpus_scale,
+                        command_line_arguments.limit)
+            try:
+                all_results.extend(benchmark_corpus(scoring_tool, corpus_path, corpus_scale,
+                                                    command_line_arguments.repeat, command_line_arguments.workers))
+            finally:
+                with contextlib.suppress(OSError):
+                    os.remove(scoring_tool.PolarIndex(corpus_path).index_file_path)
+
+    with open(command_line_arguments.output, "w") as output_file:
+        json.dump({"commit": git_commit(),
+                   "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                   "python": platform.python_version(),
+                   "numpy": numpy.__version__,
+                   "platform": platform.platform(),
+                   "csv_directory_path": command_line_arguments.csv_directory_path,
+                   "limit": command_line_arguments.limit,
+                   "cpu_count": os.cpu_count(),
+                   "results": all_results}, output_file, indent=1)
+    print(f"Results written to {command_line_arguments.output}")
+
+    if command_line_arguments.compare is not None:
+        compare_results(all_results, command_line_arguments.compare)
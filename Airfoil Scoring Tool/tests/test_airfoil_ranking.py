@@ -0,0 +1,138 @@
+# Tests for AirfoilRanking against a plain sorted list of (name, file path, score) entries, with random adds, removals
+# and pages mixed together and plenty of tied scores
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import importlib.util
+import os
+import random
+import unittest
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+# What AirfoilRanking should do, worked out the slow way: every entry in the order it was added, sorted best score
+# first (ties in the order they were added) whenever the ranking is asked for
+class SortedListRanking:
+    def __init__(self):
+        self.entries = []
+        self.removed_indices = set()
+
+    def add(self, name, file_path, score):
+        self.entries.append((name, file_path, score))
+
+    def ranked(self):
+        ranked_indices = sorted((entry_index for entry_index in range(len(self.entries))
+                                 if entry_index not in self.removed_indices),
+                                key=lambda entry_index: (-self.entries[entry_index][2], entry_index))
+        return [(entry_index,) + self.entries[entry_index] for entry_index in ranked_indices]
+
+    def remove_place(self, place):
+        removed_entry = self.ranked()[place - 1]
+        self.removed_indices.add(removed_entry[0])
+        return removed_entry
+
+    def page(self, first_place, place_count):
+        return self.ranked()[max(first_place, 1) - 1:max(first_place + place_count - 1, 0)]
+
+
+def entry_tuples(airfoils):
+    return [(airfoil.name, airfoil.file_path, airfoil.score) for airfoil in airfoils]
+
+
+def model_tuples(model_entries):
+    return [model_entry[1:] for model_entry in model_entries]
+
+
+class AirfoilRankingTest(unittest.TestCase):
+    def assert_same_ranking(self, airfoil_ranking, sorted_list_ranking, message=None):
+        self.assertEqual(len(airfoil_ranking), len(sorted_list_ranking.ranked()), message)
+        self.assertEqual(entry_tuples(airfoil_ranking), model_tuples(sorted_list_ranking.ranked()), message)
+
+    def test_ties_stay_in_the_order_they_were_added(self):
+        airfoil_ranking = scoring_tool.AirfoilRanking()
+        for name, score in [("a", 1.0), ("b", 2.0), ("c", 1.0), ("d", 2.0), ("e", -1.0), ("f", 1.0)]:
+            airfoil_ranking.add_score(name, name + ".csv", score)
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking], ["b", "d", "a", "c", "f", "e"])
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking.page(2, 3)], ["d", "a", "c"])
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking.page(5, 5)], ["f", "e"])
+        self.assertEqual(airfoil_ranking.page(7, 5), [])
+        self.assertEqual(airfoil_ranking[-1].name, "e")
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking[1:3]], ["d", "a"])
+
+        self.assertEqual(airfoil_ranking.remove_place(3).name, "a")
+        self.assertEqual(airfoil_ranking.pop(0).name, "b")
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking], ["d", "c", "f", "e"])
+        # Adding after a removal ranks everything again, the removed airfoils stay out
+        airfoil_ranking.add_score("g", "g.csv", 1.0)
+        self.assertEqual([airfoil.name for airfoil in airfoil_ranking], ["d", "c", "f", "g", "e"])
+        with self.assertRaises(IndexError):
+            airfoil_ranking.remove_place(6)
+        with self.assertRaises(IndexError):
+            airfoil_ranking.remove_place(0)
+
+    def test_matches_a_sorted_list(self):
+        for seed in range(20):
+            random_generator = random.Random(seed)
+            airfoil_ranking = scoring_tool.AirfoilRanking(top_k=random_generator.choice([1, 5]))
+            sorted_list_ranking = SortedListRanking()
+            # Airfoils added whole with add, paired with their entry index, to check which keep their polar data
+            whole_airfoils = []
+
+            for step in range(300):
+                message = f"seed {seed}, step {step}"
+                operation = random_generator.choice(["add", "add", "add_score", "add_score", "remove", "page"])
+                remaining_count = len(sorted_list_ranking.ranked())
+                if operation in ["add", "add_score"]:
+                    entry_index = len(sorted_list_ranking.entries)
+                    name = f"airfoil{entry_index}"
+                    file_path = name + "_R_100000_N_9.csv"
+                    # Few distinct scores so there are lots of ties
+                    score = random_generator.choice([-1.0, 0.0, .5, 1.0, 2.0, random_generator.uniform(-2, 3)])
+                    sorted_list_ranking.add(name, file_path, score)
+                    if operation == "add":
+                        airfoil = scoring_tool.Airfoil(name, file_path, load_data=False)
+                        airfoil.score = score
+                        # Stands in for the polar data
+                        airfoil.csv_data = object()
+                        airfoil_ranking.add(airfoil)
+                        whole_airfoils.append((entry_index, airfoil))
+                    else:
+                        airfoil_ranking.add_score(name, file_path, score)
+                elif operation == "remove" and remaining_count > 0:
+                    place = random_generator.randint(1, remaining_count)
+                    removed_airfoil = airfoil_ranking.remove_place(place)
+                    self.assertEqual(entry_tuples([removed_airfoil]),
+                                     model_tuples([sorted_list_ranking.remove_place(place)]), message)
+                elif operation == "page":
+                    first_place = random_generator.randint(-1, remaining_count + 2)
+                    place_count = random_generator.randint(0, 7)
+                    self.assertEqual(entry_tuples(airfoil_ranking.page(first_place, place_count)),
+                                     model_tuples(sorted_list_ranking.page(first_place, place_count)),
+                                     f"{message}, page({first_place}, {place_count})")
+                if step % 25 == 0:
+                    self.assert_same_ranking(airfoil_ranking, sorted_list_ranking, message)
+
+            self.assert_same_ranking(airfoil_ranking, sorted_list_ranking, f"seed {seed}")
+            # Only the best top_k airfoils that were added whole keep their polar data (removing a place doesn't
+            # change which ones those are)
+            best_entry_indices = sorted(whole_airfoils, key=lambda whole_airfoil: (-whole_airfoil[1].score,
+                                                                                   whole_airfoil[0]))
+            best_entry_indices = {entry_index for entry_index, _ in best_entry_indices[:airfoil_ranking.top_k]}
+            for entry_index, airfoil in whole_airfoils:
+                self.assertEqual(airfoil.csv_data is not None, entry_index in best_entry_indices,
+                                 f"seed {seed}, entry {entry_index}")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+# Tests for the equation compiler (compile_equation and the EquationNode classes): scores from CompiledEquation.score
+# and score_batch have to match scoring the same equation the old way (process_equation_string and eval()), on the
+# recorded polars in polars (Reynolds number 100000, nCrit 9)
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import contextlib
+import importlib.util
+import io
+import math
+import os
+import unittest
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+NORM_FILE_PATH = os.path.join(POLARS_DIRECTORY_PATH, "clarky-il_R_100000_N_9.csv")
+
+# The README examples, the equation in analysis_settings.config, and equations using the polar metrics, norms of lists
+# and steps that appear more than once
+EQUATION_STRINGS = [
+    "max(cl)",
+    ".4 * norm(max(cl)) -.3 * norm(max(cd))+.2*norm(min(element_wise_operation(cp,cd,'/')))+.1*norm(max(cm))",
+    "norm(max(cl))",
+    "norm(max(cm))",
+    "max(element_wise_operation(cl, cp, \"/\"))",
+    ".4*norm(max(cl)) - .3*norm(average(cd)) + .2*norm(average(cm))+.1*norm(stall_angle)",
+    "max(norm(element_wise_operation(cl,cd,'/')))",
+    "average(norm(cl)) + pow(max(cl), 2) - min(cd)*10",
+    "Max(CL) / min(cd) + norm(max(cl)) - max(cl)",
+    "cl_max + zero_lift_alpha - cd_min*10 + max_cl_cd/100 + cl_max_alpha + cm_zero_lift",
+    "stall_angle",
+]
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+class CompiledEquationTest(unittest.TestCase):
+    def setUp(self):
+        self.csv_file_paths = sorted(os.path.join(POLARS_DIRECTORY_PATH, file_name)
+                                     for file_name in os.listdir(POLARS_DIRECTORY_PATH))
+
+    # Scores of every polar with the compiled equation one at a time, all at once, and with eval()
+    def all_scores(self, equation_string, alpha_grid=None):
+        norm_csv_data = scoring_tool.CsvData(NORM_FILE_PATH, alpha_grid=alpha_grid)
+        csv_data_list = [scoring_tool.CsvData(file_path, alpha_grid=alpha_grid) for file_path in self.csv_file_paths]
+        compiled_equation = scoring_tool.compile_equation(equation_string, norm_csv_data)
+        with contextlib.redirect_stdout(io.StringIO()):
+            compiled_scores = [compiled_equation.score(csv_data) for csv_data in csv_data_list]
+            batch_scores = compiled_equation.score_batch(scoring_tool.PolarBatch(csv_data_list, norm_csv_data))
+            parsed_equation = scoring_tool.process_equation_string(equation_string, norm_csv_data)
+            eval_scores = [csv_data.score_csv(parsed_equation, norm_csv_data) for csv_data in csv_data_list]
+        return compiled_scores, batch_scores, eval_scores
+
+    def assert_same_scores(self, expected_scores, scores, equation_string):
+        self.assertEqual([score is None for score in scores], [score is None for score in expected_scores],
+                         equation_string)
+        for expected_score, score in zip(expected_scores, scores):
+            if expected_score is not None:
+                self.assertTrue(math.isclose(score, float(expected_score), rel_tol=1e-12, abs_tol=1e-12),
+                                f"{equation_string}: {score} != {expected_score}")
+
+    def test_compiled_scores_match_eval(self):
+        for equation_string in EQUATION_STRINGS:
+            compiled_scores, batch_scores, eval_scores = self.all_scores(equation_string)
+            self.assertTrue(any(score is not None for score in eval_scores), equation_string)
+            self.assert_same_scores(eval_scores, compiled_scores, equation_string)
+            self.assert_same_scores(eval_scores, batch_scores, equation_string)
+
+    def test_compiled_scores_match_eval_on_alpha_grid(self):
+        for equation_string in EQUATION_STRINGS:
+            compiled_scores, batch_scores, eval_scores = self.all_scores(equation_string, scoring_tool.AlphaGrid(.25))
+            self.assert_same_scores(eval_scores, compiled_scores, equation_string)
+            self.assert_same_scores(eval_scores, batch_scores, equation_string)
+
+    def test_scoring_twice_gives_the_same_scores(self):
+        # The norm baselines and evaluation memo are kept between polars, they mustn't change the next score
+        norm_csv_data = scoring_tool.CsvData(NORM_FILE_PATH)
+        compiled_equation = scoring_tool.compile_equation(EQUATION_STRINGS[1], norm_csv_data)
+        csv_data_list = [scoring_tool.CsvData(file_path) for file_path in self.csv_file_paths]
+        first_scores = [compiled_equation.score(csv_data) for csv_data in csv_data_list]
+        self.assertEqual([compiled_equation.score(csv_data) for csv_data in reversed(csv_data_list)],
+                         list(reversed(first_scores)))
+        self.assertGreater(compiled_equation.saved_evaluations, 0)
+
+    def test_lists_and_values_mixed_up(self):
+        for equation_string in ["max(max(cl))", "cl+1", "element_wise_operation(cl,2,'*')", "cl", ".4*cl"]:
+            with self.assertRaises(scoring_tool.UnableToEvaluate, msg=equation_string) as raised:
+                scoring_tool.compile_equation(equation_string)
+            # Mistakes are reported, not handed to eval()
+            self.assertNotIsInstance(raised.exception, scoring_tool.UnsupportedEquation, equation_string)
+
+    def test_other_python_is_left_to_eval(self):
+        with self.assertRaises(scoring_tool.UnsupportedEquation):
+            scoring_tool.compile_equation("abs(max(cl))")
+        with contextlib.redirect_stdout(io.StringIO()):
+            parsed_equation = scoring_tool.parse_scoring_equation("abs(max(cl))", scoring_tool.CsvData(NORM_FILE_PATH))
+        self.assertIsInstance(parsed_equation, str)
+
+    def test_division_by_zero_is_not_scored(self):
+        compiled_scores, batch_scores, eval_scores = self.all_scores("max(cl) / (max(cd) - max(cd))")
+        self.assertEqual(compiled_scores, [None] * len(self.csv_file_paths))
+        self.assertEqual(batch_scores, [None] * len(self.csv_file_paths))
+        self.assertEqual(eval_scores, [None] * len(self.csv_file_paths))
+
+    def test_batch_chunks_rank_the_same_as_scoring_one_at_a_time(self):
+        equation_string = EQUATION_STRINGS[1]
+        with contextlib.redirect_stdout(io.StringIO()):
+            serial_ranking = scoring_tool.find_best(self.csv_file_paths, equation_string, NORM_FILE_PATH)
+            # Down to 4 polars a chunk, so the last chunk is smaller than the others
+            original_chunk_polars = scoring_tool.BATCH_CHUNK_POLARS
+            scoring_tool.BATCH_CHUNK_POLARS = 4
+            try:
+                batch_ranking = scoring_tool.find_best(self.csv_file_paths, equation_string, NORM_FILE_PATH,
+                                                       batch=True)
+            finally:
+                scoring_tool.BATCH_CHUNK_POLARS = original_chunk_polars
+        self.assertEqual([airfoil.file_path for airfoil in batch_ranking],
+                         [airfoil.file_path for airfoil in serial_ranking])
+        for batch_airfoil, serial_airfoil in zip(batch_ranking, serial_ranking):
+            self.assertTrue(math.isclose(batch_airfoil.score, serial_airfoil.score, rel_tol=1e-12, abs_tol=1e-12))
+
+
+if __name__ == "__main__":
+    unittest.main()
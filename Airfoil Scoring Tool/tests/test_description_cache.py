@@ -0,0 +1,155 @@
+# Tests for DescriptionCache against a local stand-in for airfoiltools.com, which serves the details pages in
+# airfoil_pages (copies of the details page layout, trimmed down to the table the description is read from)
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import http.server
+import importlib.util
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.parse
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+AIRFOIL_PAGES_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "airfoil_pages")
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+# Serves /airfoil/details?airfoil=<name> from airfoil_pages/<name>.html (404 for airfoils that aren't there) and counts
+# the requests for each airfoil
+class StandInAirfoilServer:
+    def __init__(self):
+        self.request_counts = {}
+        self.lock = threading.Lock()
+        stand_in_server = self
+
+        class DetailsPageHandler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                request_url = urllib.parse.urlsplit(self.path)
+                airfoil_name = urllib.parse.parse_qs(request_url.query).get("airfoil", [""])[0]
+                with stand_in_server.lock:
+                    stand_in_server.request_counts[airfoil_name] = \
+                        stand_in_server.request_counts.get(airfoil_name, 0) + 1
+                page_path = os.path.join(AIRFOIL_PAGES_DIRECTORY_PATH, airfoil_name + ".html")
+                if request_url.path != "/airfoil/details" or not os.path.isfile(page_path):
+                    self.send_error(404)
+                    return
+                with open(page_path, "rb") as page_file:
+                    page_contents = page_file.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html")
+                self.send_header("Content-Length", str(len(page_contents)))
+                self.end_headers()
+                self.wfile.write(page_contents)
+
+            def log_message(self, *arguments):
+                pass
+
+        self.http_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), DetailsPageHandler)
+        self.details_url = f"http://127.0.0.1:{self.http_server.server_port}/airfoil/details?airfoil={{name}}"
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def request_count(self, airfoil_name):
+        with self.lock:
+            return self.request_counts.get(airfoil_name, 0)
+
+    def close(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+
+class DescriptionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.stand_in_server = StandInAirfoilServer()
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.cache_file_path = os.path.join(self.temporary_directory.name, "description_cache.json")
+
+    def tearDown(self):
+        self.stand_in_server.close()
+        self.temporary_directory.cleanup()
+
+    def make_cache(self, expiry_seconds=scoring_tool.DESCRIPTION_CACHE_EXPIRY_SECONDS):
+        description_cache = scoring_tool.DescriptionCache(self.cache_file_path, self.stand_in_server.details_url,
+                                                          expiry_seconds, workers=4)
+        self.addCleanup(description_cache.close)
+        return description_cache
+
+    def test_prefetch_looks_up_each_airfoil_once(self):
+        description_cache = self.make_cache()
+        description_cache.prefetch(["e387-il", "naca2412-il"])
+        description_cache.wait_for(["e387-il", "naca2412-il"])
+        self.assertEqual(description_cache.cached_description("e387-il"), "Eppler E387 low Reynolds number airfoil")
+        self.assertEqual(description_cache.cached_description("naca2412-il"), "NACA 2412 airfoil")
+
+        # Cached airfoils aren't looked up again
+        description_cache.prefetch(["e387-il", "naca2412-il"])
+        description_cache.wait_for(["e387-il", "naca2412-il"])
+        self.assertEqual(self.stand_in_server.request_count("e387-il"), 1)
+        self.assertEqual(self.stand_in_server.request_count("naca2412-il"), 1)
+
+    def test_descriptions_are_reloaded_from_disk(self):
+        description_cache = self.make_cache()
+        description_cache.wait_for(["e387-il"])
+        description_cache.close()
+        with open(self.cache_file_path, "r") as cache_file:
+            self.assertIn("e387-il", json.load(cache_file)["descriptions"])
+
+        reloaded_cache = self.make_cache()
+        self.assertTrue(reloaded_cache.is_cached("e387-il"))
+        self.assertEqual(reloaded_cache.cached_description("e387-il"), "Eppler E387 low Reynolds number airfoil")
+        reloaded_cache.wait_for(["e387-il"])
+        self.assertEqual(self.stand_in_server.request_count("e387-il"), 1)
+
+    def test_expired_descriptions_are_looked_up_again(self):
+        description_cache = self.make_cache(expiry_seconds=60)
+        description_cache.wait_for(["e387-il"])
+        description_cache.close()
+
+        # Ages the saved lookup past the expiry
+        with open(self.cache_file_path, "r") as cache_file:
+            cache_table = json.load(cache_file)
+        cache_table["descriptions"]["e387-il"][1] -= 120
+        with open(self.cache_file_path, "w") as cache_file:
+            json.dump(cache_table, cache_file)
+
+        expired_cache = self.make_cache(expiry_seconds=60)
+        self.assertFalse(expired_cache.is_cached("e387-il"))
+        # The old description is still shown until the new one is found
+        self.assertEqual(expired_cache.cached_description("e387-il"), "Eppler E387 low Reynolds number airfoil")
+        expired_cache.wait_for(["e387-il"])
+        self.assertTrue(expired_cache.is_cached("e387-il"))
+        self.assertEqual(self.stand_in_server.request_count("e387-il"), 2)
+
+    def test_missing_page_is_not_cached(self):
+        description_cache = self.make_cache()
+        description_cache.wait_for(["missing-il"])
+        self.assertIsNone(description_cache.cached_description("missing-il"))
+        self.assertFalse(description_cache.is_cached("missing-il"))
+
+        # Failed lookups are tried again
+        description_cache.wait_for(["missing-il"])
+        self.assertEqual(self.stand_in_server.request_count("missing-il"), 2)
+
+    def test_page_without_description_is_cached_as_none(self):
+        description_cache = self.make_cache()
+        description_cache.wait_for(["nodesc-il"])
+        self.assertTrue(description_cache.is_cached("nodesc-il"))
+        self.assertIsNone(description_cache.cached_description("nodesc-il"))
+
+        description_cache.wait_for(["nodesc-il"])
+        self.assertEqual(self.stand_in_server.request_count("nodesc-il"), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Tests for PolarIndex, on copies of the recorded polars in polars (Reynolds number 100000, nCrit 9) that csv files are
+# added to, changed in and removed from
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import importlib.util
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+# Stands in for ConfigSettings, only the filters PolarIndex.query looks at, by default letting every polar through
+def filter_settings(**filters):
+    settings = {"reynolds_min": 0, "reynolds_max": 10 ** 9, "nCrit_num": 0, "thickness_min": 0, "thickness_max": 100,
+                "camber_min": 0, "camber_max": 100}
+    settings.update(filters)
+    return types.SimpleNamespace(**settings)
+
+
+class PolarIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.csv_directory_path = os.path.join(self.temporary_directory.name, "csvs")
+        self.index_directory_path = os.path.join(self.temporary_directory.name, "polar_index")
+        shutil.copytree(POLARS_DIRECTORY_PATH, self.csv_directory_path)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def make_index(self, csv_directory_path=None):
+        return scoring_tool.PolarIndex(csv_directory_path or self.csv_directory_path, self.index_directory_path)
+
+    def queried_names(self, polar_index, **filters):
+        return [os.path.basename(file_path) for file_path in polar_index.query(filter_settings(**filters))]
+
+    # Rewrites one line of the header of a csv in the copied directory
+    def edit_header(self, file_name, old_line, new_line):
+        file_path = os.path.join(self.csv_directory_path, file_name)
+        with open(file_path, "r") as csv_file:
+            csv_text = csv_file.read()
+        self.assertIn(old_line, csv_text)
+        with open(file_path, "w") as csv_file:
+            csv_file.write(csv_text.replace(old_line, new_line, 1))
+        return file_path
+
+    def test_index_is_kept_out_of_the_csv_directory(self):
+        polar_index = self.make_index()
+        self.assertEqual(polar_index.update(), 6)
+        self.assertEqual(sorted(os.listdir(self.csv_directory_path)), sorted(os.listdir(POLARS_DIRECTORY_PATH)))
+        self.assertEqual(os.listdir(self.index_directory_path), [os.path.basename(polar_index.index_file_path)])
+
+        # Nothing is read again on the next run, and another csv directory gets its own index file
+        self.assertEqual(self.make_index().update(), 0)
+        other_csv_directory_path = os.path.join(self.temporary_directory.name, "other_csvs")
+        os.makedirs(other_csv_directory_path)
+        shutil.copy(os.path.join(self.csv_directory_path, "e387-il_R_100000_N_9.csv"), other_csv_directory_path)
+        other_polar_index = self.make_index(other_csv_directory_path)
+        self.assertEqual(other_polar_index.update(), 1)
+        self.assertEqual(self.queried_names(other_polar_index), ["e387-il_R_100000_N_9.csv"])
+        self.assertEqual(len(self.queried_names(self.make_index())), 6)
+
+    def test_query_filters(self):
+        polar_index = self.make_index()
+        polar_index.update()
+        self.assertEqual(self.queried_names(polar_index, thickness_min=9, thickness_max=10),
+                         ["e387-il_R_100000_N_9.csv", "sd7037-il_R_100000_N_9.csv"])
+        self.assertEqual(self.queried_names(polar_index, camber_min=3, camber_max=100),
+                         ["clarky-il_R_100000_N_9.csv", "e387-il_R_100000_N_9.csv", "s1223-il_R_100000_N_9.csv"])
+        self.assertEqual(self.queried_names(polar_index, nCrit_num=5), [])
+        self.assertEqual(self.queried_names(polar_index, reynolds_min=200000), [])
+
+    def test_added_replaced_and_removed_csvs(self):
+        self.make_index().update()
+
+        # Added
+        shutil.copy(os.path.join(self.csv_directory_path, "e387-il_R_100000_N_9.csv"),
+                    os.path.join(self.csv_directory_path, "e387-il_R_200000_N_9.csv"))
+        polar_index = self.make_index()
+        self.assertEqual(polar_index.update(), 1)
+        self.assertEqual(self.queried_names(polar_index, reynolds_min=200000), ["e387-il_R_200000_N_9.csv"])
+
+        # Replaced with a different size
+        self.edit_header("naca2412-il_R_100000_N_9.csv", "Max Thickness,12\n", "Max Thickness,21.5\n")
+        polar_index = self.make_index()
+        self.assertEqual(polar_index.update(), 1)
+        self.assertEqual(self.queried_names(polar_index, thickness_min=20), ["naca2412-il_R_100000_N_9.csv"])
+        self.assertNotIn("naca2412-il_R_100000_N_9.csv", self.queried_names(polar_index, thickness_max=12))
+
+        # Replaced with the same size, only the modification time tells it apart
+        csv_file_path = self.edit_header("ag35-il_R_100000_N_9.csv", "Max Camber,2.3\n", "Max Camber,7.3\n")
+        csv_file_stat = os.stat(csv_file_path)
+        os.utime(csv_file_path, ns=(csv_file_stat.st_atime_ns, csv_file_stat.st_mtime_ns + 10 ** 9))
+        polar_index = self.make_index()
+        self.assertEqual(polar_index.update(), 1)
+        self.assertEqual(self.queried_names(polar_index, camber_min=7, camber_max=8), ["ag35-il_R_100000_N_9.csv"])
+
+        # Removed
+        os.remove(os.path.join(self.csv_directory_path, "sd7037-il_R_100000_N_9.csv"))
+        polar_index = self.make_index()
+        self.assertEqual(polar_index.update(), 0)
+        self.assertEqual(self.queried_names(polar_index), self.queried_names(self.make_index()))
+        self.assertEqual(self.queried_names(polar_index),
+                         ["ag35-il_R_100000_N_9.csv", "clarky-il_R_100000_N_9.csv", "e387-il_R_100000_N_9.csv",
+                          "e387-il_R_200000_N_9.csv", "naca2412-il_R_100000_N_9.csv", "s1223-il_R_100000_N_9.csv"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+# Tests for updating the polar store and reading polars out of it, on copies of the recorded polars in polars (Reynolds
+# number 100000, nCrit 9) that are changed and removed between updates
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+
+# The equation in analysis_settings.config
+EQUATION_STRING = ".4*norm(max(cl)) - .3*norm(average(cd)) + .2*norm(average(cm))+.1*norm(stall_angle)"
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+# It is put in sys.modules so the scoring workers' functions can be pickled by name, and tests that run workers share
+# that one copy
+def load_scoring_tool():
+    if "airfoil_scoring_tool" in sys.modules:
+        return sys.modules["airfoil_scoring_tool"]
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_spec.name] = scoring_tool
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+class PolarStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.csv_directory_path = os.path.join(self.temporary_directory.name, "csvs")
+        shutil.copytree(POLARS_DIRECTORY_PATH, self.csv_directory_path)
+        self.norm_file_path = os.path.join(self.csv_directory_path, "clarky-il_R_100000_N_9.csv")
+
+    def tearDown(self):
+        # The stores opened from the temporary directory are memory mapped
+        scoring_tool.opened_polar_stores.clear()
+        self.temporary_directory.cleanup()
+
+    def csv_file_path(self, file_name):
+        return os.path.join(self.csv_directory_path, file_name)
+
+    def csv_file_paths(self):
+        return sorted(self.csv_file_path(file_name) for file_name in os.listdir(self.csv_directory_path)
+                      if file_name[-4:] == ".csv")
+
+    # Returns what function returned, what it printed and how much each counter in event_counts went up by
+    def counted_call(self, function, *arguments, **keyword_arguments):
+        counts_before = dict(scoring_tool.event_counts)
+        printed_text = io.StringIO()
+        with contextlib.redirect_stdout(printed_text):
+            result = function(*arguments, **keyword_arguments)
+        counts_added = {counter_name: count - counts_before.get(counter_name, 0)
+                        for counter_name, count in scoring_tool.event_counts.items()}
+        return result, printed_text.getvalue(), counts_added
+
+    def test_update_reuses_only_unchanged_polars(self):
+        self.assertEqual(self.counted_call(scoring_tool.build_polar_store, self.csv_directory_path)[0], (0, 6))
+
+        # ag35 gets the data rows of s1223 and sd7037 is deleted
+        shutil.copyfile(os.path.join(POLARS_DIRECTORY_PATH, "s1223-il_R_100000_N_9.csv"),
+                        self.csv_file_path("ag35-il_R_100000_N_9.csv"))
+        os.remove(self.csv_file_path("sd7037-il_R_100000_N_9.csv"))
+        store_counts, printed_text, counts_added = self.counted_call(scoring_tool.build_polar_store,
+                                                                     self.csv_directory_path)
+        self.assertEqual(store_counts, (4, 1))
+        self.assertIn("Polar store: 4 polars unchanged, 1 new or changed polars parsed, 1 removed", printed_text)
+        self.assertEqual(counts_added["polars_reused"], 4)
+        self.assertEqual(counts_added["polars_parsed"], 1)
+
+        polar_store = scoring_tool.open_polar_store(self.csv_directory_path)
+        self.assertEqual(sorted(polar_store.polar_index_dict),
+                         [os.path.basename(file_path) for file_path in self.csv_file_paths()])
+        # The changed polar's columns are the new ones, the rest are the same as parsing their csv
+        for file_path in self.csv_file_paths():
+            stored_columns = polar_store.polar_columns(polar_store.find_polar(file_path))
+            for stored_column, parsed_column in zip(stored_columns, scoring_tool.CsvData(file_path).value_columns):
+                numpy.testing.assert_array_equal(stored_column, parsed_column, file_path)
+
+        # Nothing is written when nothing changed
+        header_table_path = os.path.join(polar_store.store_directory_path, scoring_tool.POLAR_STORE_HEADER_FILE_NAME)
+        header_table_mtime = os.stat(header_table_path).st_mtime_ns
+        self.assertEqual(self.counted_call(scoring_tool.build_polar_store, self.csv_directory_path)[0], (5, 0))
+        self.assertEqual(os.stat(header_table_path).st_mtime_ns, header_table_mtime)
+
+    def test_scoring_reports_where_the_polars_came_from(self):
+        self.counted_call(scoring_tool.build_polar_store, self.csv_directory_path)
+        polar_store = scoring_tool.open_polar_store(self.csv_directory_path)
+        unstored_ranking, printed_text, counts_added = self.counted_call(
+            scoring_tool.find_best, self.csv_file_paths(), EQUATION_STRING, self.norm_file_path, batch=True)
+        self.assertIn("0 polars read from the polar store, 6 parsed from their csv files", printed_text)
+        # The norming airfoil is parsed too, but before scoring
+        self.assertEqual(counts_added["polars_from_csv"], 6 + 1)
+
+        # A csv that changed after the store was updated is parsed, the store's copy is out of date
+        changed_file_path = self.csv_file_path("e387-il_R_100000_N_9.csv")
+        changed_file_stat = os.stat(changed_file_path)
+        os.utime(changed_file_path, ns=(changed_file_stat.st_atime_ns, changed_file_stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNone(polar_store.find_polar(changed_file_path))
+
+        for find_best_arguments in [{"batch": True}, {"batch": False}, {"workers": 2}]:
+            stored_ranking, printed_text, counts_added = self.counted_call(
+                scoring_tool.find_best, self.csv_file_paths(), EQUATION_STRING, self.norm_file_path, polar_store,
+                **find_best_arguments)
+            self.assertIn("5 polars read from the polar store, 1 parsed from their csv files", printed_text,
+                          find_best_arguments)
+            self.assertEqual([(airfoil.file_path, airfoil.score) for airfoil in stored_ranking],
+                             [(airfoil.file_path, airfoil.score) for airfoil in unstored_ranking], find_best_arguments)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,157 @@
+# Tests for ScoreCache and how find_best uses it, on copies of the recorded polars in polars (Reynolds number 100000,
+# nCrit 9) so they can be changed, with the cache folder in a temporary directory
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import contextlib
+import importlib.util
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+
+# The equation in analysis_settings.config
+EQUATION_STRING = ".4*norm(max(cl)) - .3*norm(average(cd)) + .2*norm(average(cm))+.1*norm(stall_angle)"
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+# It is put in sys.modules so the scoring workers' functions can be pickled by name, and tests that run workers share
+# that one copy
+def load_scoring_tool():
+    if "airfoil_scoring_tool" in sys.modules:
+        return sys.modules["airfoil_scoring_tool"]
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    sys.modules[module_spec.name] = scoring_tool
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+class ScoreCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.csv_directory_path = os.path.join(self.temporary_directory.name, "csvs")
+        self.cache_directory_path = os.path.join(self.temporary_directory.name, "score_cache")
+        shutil.copytree(POLARS_DIRECTORY_PATH, self.csv_directory_path)
+        self.norm_file_path = os.path.join(self.csv_directory_path, "clarky-il_R_100000_N_9.csv")
+        self.csv_file_paths = sorted(os.path.join(self.csv_directory_path, file_name)
+                                     for file_name in os.listdir(self.csv_directory_path))
+        self.score_cache = scoring_tool.ScoreCache(self.cache_directory_path)
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    # (file path, score) of every place in the ranking, and what find_best printed
+    def ranked_scores(self, score_cache=None, **find_best_arguments):
+        printed_text = io.StringIO()
+        with contextlib.redirect_stdout(printed_text):
+            airfoil_ranking = scoring_tool.find_best(self.csv_file_paths, EQUATION_STRING, self.norm_file_path,
+                                                     score_cache=score_cache, **find_best_arguments)
+        return [(airfoil.file_path, airfoil.score) for airfoil in airfoil_ranking], printed_text.getvalue()
+
+    def entry_key(self, equation_string=EQUATION_STRING):
+        return self.score_cache.entry_key(equation_string, self.norm_file_path)
+
+    # Puts the data rows of another polar under the same file name, so the polar scores differently
+    def replace_polar(self, file_name, other_file_name):
+        shutil.copyfile(os.path.join(POLARS_DIRECTORY_PATH, other_file_name),
+                        os.path.join(self.csv_directory_path, file_name))
+
+    def test_repeat_run_reuses_every_score(self):
+        uncached_scores, _ = self.ranked_scores()
+        first_scores, first_printed_text = self.ranked_scores(self.score_cache)
+        self.assertIn("Score cache: 0 scores reused, 6 polars to score", first_printed_text)
+        repeat_scores, repeat_printed_text = self.ranked_scores(self.score_cache)
+        self.assertIn("Score cache: 6 scores reused, 0 polars to score", repeat_printed_text)
+
+        self.assertEqual(first_scores, uncached_scores)
+        self.assertEqual(repeat_scores, uncached_scores)
+        cached_scores, unscored_file_paths = self.score_cache.cached_scores(self.entry_key(), self.csv_file_paths)
+        self.assertEqual(unscored_file_paths, [])
+        self.assertEqual(sorted(cached_scores.items()), sorted(uncached_scores))
+
+    def test_changed_polar_is_scored_again(self):
+        self.ranked_scores(self.score_cache)
+        changed_file_path = os.path.join(self.csv_directory_path, "ag35-il_R_100000_N_9.csv")
+        self.replace_polar("ag35-il_R_100000_N_9.csv", "s1223-il_R_100000_N_9.csv")
+
+        cached_scores, unscored_file_paths = self.score_cache.cached_scores(self.entry_key(), self.csv_file_paths)
+        self.assertEqual(unscored_file_paths, [changed_file_path])
+        self.assertEqual(len(cached_scores), 5)
+        changed_scores, printed_text = self.ranked_scores(self.score_cache)
+        self.assertIn("Score cache: 5 scores reused, 1 polars to score", printed_text)
+        self.assertEqual(changed_scores, self.ranked_scores()[0])
+        self.assertEqual(dict(changed_scores)[changed_file_path],
+                         dict(changed_scores)[os.path.join(self.csv_directory_path, "s1223-il_R_100000_N_9.csv")])
+
+        # Only touching the file is enough for it to be scored again
+        changed_file_stat = os.stat(changed_file_path)
+        os.utime(changed_file_path, ns=(changed_file_stat.st_atime_ns, changed_file_stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.score_cache.cached_scores(self.entry_key(), self.csv_file_paths)[1], [changed_file_path])
+
+    def test_changed_norm_file_gives_a_new_key(self):
+        original_entry_key = self.entry_key()
+        # The key comes from the norm file's contents, not its modification time
+        norm_file_stat = os.stat(self.norm_file_path)
+        os.utime(self.norm_file_path, ns=(norm_file_stat.st_atime_ns, norm_file_stat.st_mtime_ns + 10 ** 9))
+        self.assertEqual(self.entry_key(), original_entry_key)
+
+        self.replace_polar("clarky-il_R_100000_N_9.csv", "e387-il_R_100000_N_9.csv")
+        self.assertNotEqual(self.entry_key(), original_entry_key)
+        self.assertNotEqual(self.score_cache.entry_key(EQUATION_STRING, self.norm_file_path,
+                                                       scoring_tool.AlphaGrid(.25)), self.entry_key())
+
+    def test_spacing_and_capitalization_share_a_key(self):
+        self.assertEqual(self.entry_key("max(cl)"), self.entry_key(" MAX ( Cl ) "))
+        self.assertEqual(self.entry_key(EQUATION_STRING), self.entry_key(EQUATION_STRING.upper().replace("*", " * ")))
+        self.assertNotEqual(self.entry_key("max(cl)"), self.entry_key("max(cd)"))
+        # Equations that can't be parsed aren't cached
+        self.assertIsNone(self.entry_key("max(cl"))
+
+    def test_eviction_keeps_the_entry_in_use(self):
+        file_scores = {file_path: 1.0 for file_path in self.csv_file_paths}
+        entry_keys = ["a" * 32, "b" * 32, "c" * 32]
+        for entry_age, entry_key in zip([30, 20, 10], entry_keys):
+            self.score_cache.store_scores(entry_key, file_scores)
+            os.utime(self.score_cache.entry_file_path(entry_key),
+                     ns=(0, os.stat(self.score_cache.entry_file_path(entry_key)).st_mtime_ns - entry_age * 10 ** 9))
+        entry_bytes = os.path.getsize(self.score_cache.entry_file_path(entry_keys[0]))
+
+        # Room for two entries, the least recently used one goes
+        scoring_tool.ScoreCache(self.cache_directory_path, max_bytes=2 * entry_bytes).evict(entry_keys[0])
+        self.assertEqual(sorted(os.listdir(self.cache_directory_path)), [entry_keys[0] + ".json",
+                                                                          entry_keys[2] + ".json"])
+
+        # Room for none, the kept entry still stays even though it is the oldest
+        scoring_tool.ScoreCache(self.cache_directory_path, max_bytes=0).evict(entry_keys[0])
+        self.assertEqual(os.listdir(self.cache_directory_path), [entry_keys[0] + ".json"])
+
+        # Storing scores never evicts the entry they went into
+        small_score_cache = scoring_tool.ScoreCache(self.cache_directory_path, max_bytes=0)
+        small_score_cache.store_scores(entry_keys[1], file_scores)
+        self.assertEqual(os.listdir(self.cache_directory_path), [entry_keys[1] + ".json"])
+
+    def test_workers_with_top_k_leave_the_rest_out(self):
+        top_scores, _ = self.ranked_scores(self.score_cache, workers=2, top_k=2)
+        uncached_scores, _ = self.ranked_scores()
+        self.assertEqual(top_scores, uncached_scores[:2])
+        # Only the scores the workers sent back are known, so only they are cached
+        cached_scores, unscored_file_paths = self.score_cache.cached_scores(self.entry_key(), self.csv_file_paths)
+        self.assertEqual(sorted(cached_scores.items()), sorted(uncached_scores[:2]))
+        self.assertEqual(len(unscored_file_paths), 4)
+
+        # The next run scores the rest
+        all_scores, printed_text = self.ranked_scores(self.score_cache)
+        self.assertIn("Score cache: 2 scores reused, 4 polars to score", printed_text)
+        self.assertEqual(all_scores, uncached_scores)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,168 @@
+# Tests for the serve command, which is started as its own process on a free port over a copy of the recorded polars in
+# polars (Reynolds number 100000, nCrit 9), and then sent scoring requests over http
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+import urllib.error
+import urllib.request
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+NORM_FILE_NAME = "clarky-il_R_100000_N_9.csv"
+
+# The equation in analysis_settings.config
+EQUATION_STRING = ".4*norm(max(cl)) - .3*norm(average(cd)) + .2*norm(average(cm))+.1*norm(stall_angle)"
+
+# Longest the server gets to start or to notice a changed csv
+SERVER_WAIT_SECONDS = 30
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+class ScoringServerTest(unittest.TestCase):
+    def setUp(self):
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.csv_directory_path = os.path.join(self.temporary_directory.name, "csvs")
+        shutil.copytree(POLARS_DIRECTORY_PATH, self.csv_directory_path)
+        self.addCleanup(self.temporary_directory.cleanup)
+        # The server keeps the directory's polar index next to the config, it isn't needed after the test
+        self.addCleanup(self.remove_polar_index)
+
+        # Everything the server prints goes to a file, which is read to find out which port it got
+        self.server_output_path = os.path.join(self.temporary_directory.name, "server_output.txt")
+        with open(self.server_output_path, "w") as server_output_file:
+            self.server_process = subprocess.Popen(
+                [sys.executable, "-u", SCORING_TOOL_PATH, "serve", "--csv-directory", self.csv_directory_path,
+                 "--norm-file", os.path.join(self.csv_directory_path, NORM_FILE_NAME), "--port", "0",
+                 "--poll-seconds", "0.1"], stdout=server_output_file, stderr=subprocess.STDOUT)
+        self.addCleanup(self.stop_server)
+        self.server_url = self.wait_for_server()
+
+    def stop_server(self):
+        self.server_process.kill()
+        self.server_process.wait()
+
+    def remove_polar_index(self):
+        with contextlib.suppress(OSError):
+            os.remove(scoring_tool.PolarIndex(self.csv_directory_path).index_file_path)
+
+    def server_output(self):
+        with open(self.server_output_path, "r") as server_output_file:
+            return server_output_file.read()
+
+    def wait_for_server(self):
+        wait_end_time = time.monotonic() + SERVER_WAIT_SECONDS
+        while time.monotonic() < wait_end_time:
+            listening_match = re.search(r"listening on (http://\S+)", self.server_output())
+            if listening_match is not None:
+                return listening_match.group(1)
+            self.assertIsNone(self.server_process.poll(), self.server_output())
+            time.sleep(.05)
+        self.fail("The server didn't start:\n" + self.server_output())
+
+    # Returns (status code, response json)
+    def request(self, path, request_body=None):
+        http_request = urllib.request.Request(self.server_url + path, data=request_body, method="GET" if
+                                              request_body is None else "POST")
+        try:
+            with urllib.request.urlopen(http_request, timeout=SERVER_WAIT_SECONDS) as http_response:
+                return http_response.status, json.load(http_response)
+        except urllib.error.HTTPError as e:
+            return e.code, json.load(e)
+
+    def score_request(self, **score_request):
+        return self.request("/score", json.dumps(score_request).encode())
+
+    # (file path, score) of every place find_best(batch=True) gives for the polars in the copied directory
+    def found_scores(self):
+        csv_file_paths = sorted(self.csv_directory_path + '/' + file_name
+                                for file_name in os.listdir(self.csv_directory_path) if file_name[-4:] == ".csv")
+        with contextlib.redirect_stdout(io.StringIO()):
+            airfoil_ranking = scoring_tool.find_best(csv_file_paths, EQUATION_STRING,
+                                                     os.path.join(self.csv_directory_path, NORM_FILE_NAME), batch=True)
+        return [(airfoil.file_path, airfoil.score) for airfoil in airfoil_ranking]
+
+    def assert_same_ranking(self, score_response, found_scores):
+        self.assertEqual([ranked_airfoil["file_path"] for ranked_airfoil in score_response["ranking"]],
+                         [file_path for file_path, _ in found_scores])
+        for ranked_airfoil, (_, found_score) in zip(score_response["ranking"], found_scores):
+            self.assertTrue(math.isclose(ranked_airfoil["score"], found_score, rel_tol=1e-12, abs_tol=1e-12))
+
+    def test_scores_match_find_best(self):
+        status_code, score_response = self.score_request(equation=EQUATION_STRING, k=0)
+        self.assertEqual(status_code, 200, score_response)
+        self.assertEqual(score_response["polar_count"], 6)
+        self.assertEqual(score_response["scored_count"], 6)
+        self.assert_same_ranking(score_response, self.found_scores())
+
+        # Only the best k, and filters are applied
+        status_code, score_response = self.score_request(equation=EQUATION_STRING, k=2, norm_file=NORM_FILE_NAME)
+        self.assertEqual(status_code, 200, score_response)
+        self.assert_same_ranking(score_response, self.found_scores()[:2])
+        status_code, score_response = self.score_request(equation=EQUATION_STRING, thickness_min=9, thickness_max=10)
+        self.assertEqual((status_code, score_response["polar_count"]), (200, 2))
+        self.assertEqual(self.request("/status")[1]["polar_count"], 6)
+
+    def test_bad_requests_are_refused(self):
+        for norm_file in ["../x.csv", "/etc/passwd", "../csvs/../../" + NORM_FILE_NAME, 5]:
+            status_code, score_response = self.score_request(equation="max(cl)", norm_file=norm_file)
+            self.assertEqual(status_code, 400, norm_file)
+            self.assertIn("error", score_response)
+        for request_body in [b"{not json", b"[1, 2]", b'{"k": 5}', b'{"equation": "max(cl)", "ncrit": "x"}']:
+            status_code, score_response = self.request("/score", request_body)
+            self.assertEqual(status_code, 400, request_body)
+            self.assertIn("error", score_response)
+        status_code, score_response = self.score_request(equation="abs(max(cl))")
+        self.assertEqual(status_code, 400)
+        self.assertIn("could not be compiled", score_response["error"])
+        self.assertEqual(self.request("/missing")[0], 404)
+
+        # Still answers after all of those
+        self.assertEqual(self.score_request(equation="max(cl)")[0], 200)
+
+    def test_edited_csv_is_reloaded(self):
+        original_scores = {ranked_airfoil["file_path"]: ranked_airfoil["score"]
+                           for ranked_airfoil in self.score_request(equation="max(cl)", k=0)[1]["ranking"]}
+        edited_file_path = self.csv_directory_path + "/ag35-il_R_100000_N_9.csv"
+        s1223_file_path = self.csv_directory_path + "/s1223-il_R_100000_N_9.csv"
+        self.assertNotEqual(original_scores[edited_file_path], original_scores[s1223_file_path])
+
+        # ag35 gets the data rows of s1223, the server picks it up on its next check of the directory
+        shutil.copyfile(s1223_file_path, edited_file_path)
+        wait_end_time = time.monotonic() + SERVER_WAIT_SECONDS
+        while self.request("/status")[1]["refresh_count"] == 0:
+            self.assertLess(time.monotonic(), wait_end_time, "The edited csv wasn't reloaded")
+            time.sleep(.05)
+        self.assertIn("Reloaded 1 new or changed csv files, 0 removed", self.server_output())
+
+        status_code, score_response = self.score_request(equation="max(cl)", k=0)
+        self.assertEqual(status_code, 200)
+        edited_scores = {ranked_airfoil["file_path"]: ranked_airfoil["score"]
+                         for ranked_airfoil in score_response["ranking"]}
+        self.assertEqual(edited_scores[edited_file_path], edited_scores[s1223_file_path])
+        self.assertEqual(edited_scores[s1223_file_path], original_scores[s1223_file_path])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+# Tests for splitting a scoring equation into weighted terms and sweeping their weights (see FeatureMatrix), on the
+# recorded polars in polars (Reynolds number 100000, nCrit 9)
+# Run with: python -m pytest "Airfoil Scoring Tool/tests"
+import importlib.util
+import os
+import unittest
+
+import numpy
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+SCORING_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Airfoil Scoring Tool.py")
+POLARS_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "polars")
+NORM_FILE_PATH = os.path.join(POLARS_DIRECTORY_PATH, "clarky-il_R_100000_N_9.csv")
+
+
+# The scoring tool's file name has spaces in it so it can't be imported normally
+def load_scoring_tool():
+    module_spec = importlib.util.spec_from_file_location("airfoil_scoring_tool", SCORING_TOOL_PATH)
+    scoring_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(scoring_tool)
+    return scoring_tool
+
+
+scoring_tool = load_scoring_tool()
+
+
+class WeightSweepTest(unittest.TestCase):
+    def setUp(self):
+        self.norm_csv_data = scoring_tool.CsvData(NORM_FILE_PATH)
+        self.csv_file_paths = sorted(os.path.join(POLARS_DIRECTORY_PATH, file_name)
+                                     for file_name in os.listdir(POLARS_DIRECTORY_PATH))
+
+    def weighted_terms(self, equation_string):
+        compiled_equation = scoring_tool.compile_equation(equation_string, self.norm_csv_data)
+        return [(term_weight, term_node.equation_text)
+                for term_weight, term_node in scoring_tool.find_weighted_terms(compiled_equation.root_node)]
+
+    def test_negative_weights_are_split_out(self):
+        # -.3 is parsed as a negated constant, its weight still goes to the term instead of staying in it
+        self.assertEqual(self.weighted_terms("-.3*norm(max(cd)) + .4*norm(max(cl))"),
+                         [(-.3, "norm(max(cd))"), (.4, "norm(max(cl))")])
+        self.assertEqual(self.weighted_terms(".4*norm(max(cl)) + -.3*norm(max(cd))"),
+                         [(.4, "norm(max(cl))"), (-.3, "norm(max(cd))")])
+        self.assertEqual(self.weighted_terms(".4*norm(max(cl)) - norm(max(cd))*-2"),
+                         [(.4, "norm(max(cl))"), (2.0, "norm(max(cd))")])
+        self.assertEqual(self.weighted_terms("norm(max(cl))/-2"), [(-.5, "norm(max(cl))")])
+
+    def test_feature_matrix_scores_match_find_best(self):
+        equation_string = "-.3*norm(max(cd)) + .4*norm(max(cl)) + .1*norm(max(cm))"
+        compiled_equation = scoring_tool.compile_equation(equation_string, self.norm_csv_data)
+        feature_matrix = scoring_tool.FeatureMatrix(self.csv_file_paths, compiled_equation)
+        self.assertEqual(len(feature_matrix.term_texts), 3)
+        self.assertEqual(feature_matrix.weights.tolist(), [-.3, .4, .1])
+
+        found_scores = {airfoil.file_path: airfoil.score
+                        for airfoil in scoring_tool.find_best(self.csv_file_paths, equation_string, NORM_FILE_PATH)}
+        self.assertEqual(sorted(feature_matrix.file_paths), sorted(found_scores))
+        for file_path, score in zip(feature_matrix.file_paths, feature_matrix.scores().tolist()):
+            self.assertAlmostEqual(score, found_scores[file_path], places=12)
+
+    def test_top_k_frequency_is_the_same_in_chunks(self):
+        compiled_equation = scoring_tool.compile_equation("-.3*norm(max(cd)) + .4*norm(max(cl))",
+                                                          self.norm_csv_data)
+        feature_matrix = scoring_tool.FeatureMatrix(self.csv_file_paths, compiled_equation)
+        weight_samples = feature_matrix.monte_carlo_weights(50, .5, seed=1)
+        top_k_frequency = feature_matrix.top_k_frequency(weight_samples, 2)
+        self.assertAlmostEqual(top_k_frequency.sum(), 2)
+
+        # Down to 2 samples a chunk
+        original_chunk_scores = scoring_tool.WEIGHT_SWEEP_CHUNK_SCORES
+        scoring_tool.WEIGHT_SWEEP_CHUNK_SCORES = 2 * len(feature_matrix.file_paths)
+        try:
+            chunked_top_k_frequency = feature_matrix.top_k_frequency(weight_samples, 2)
+        finally:
+            scoring_tool.WEIGHT_SWEEP_CHUNK_SCORES = original_chunk_scores
+        numpy.testing.assert_array_equal(chunked_top_k_frequency, top_k_frequency)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,16 +1,20 @@
 # Script for downloading all csv files from airfoiltools.com for later analysis
 # written by Max Pollard 2022 maxpollardii@gmail.com for use by UTD DBF
+import argparse
 import os
-import requests
 import re
-import bs4
-from tkinter import Tk, Button, Label
-from tkinter.filedialog import askdirectory, askopenfilename
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+# requests, bs4 and tkinter are imported where they are used, so importing this file (i.e. to reuse the parsing
+# functions) doesn't have to load them
 
 
 # Tkinter class that handles the prompting of the csv directory and the airfoil name list
 class PromptFileGui:
     def __init__(self, master, prompt_type):
+        from tkinter import Button, Label
         self.prompt_return = None
         self.master = master
         self.master.title("Airfoil Scoring Tool")
@@ -35,18 +39,30 @@ class PromptFileGui:
             self.choose_file_button.pack()
 
     def prompt_directory(self):
+        from tkinter.filedialog import askdirectory
         self.prompt_return = askdirectory()
         self.master.quit()
 
     def prompt_file(self):
+        from tkinter.filedialog import askopenfilename
         self.prompt_return = askopenfilename()
         self.master.quit()
 
 
 # I'm not sure why all of these are invalid escape sequences, but they work and pass all the tests I used so
 # this should be fine
-# URL for page with all airfoils linked
-ALL_AIRFOILS_PAGE = "http://airfoiltools.com/search/airfoils"
+# Site everything is downloaded from, can be changed with --base-url (i.e. to a local server with saved copies of its
+# pages for testing)
+AIRFOILTOOLS_URL = "http://airfoiltools.com"
+
+# Path (on AIRFOILTOOLS_URL) of the page with all airfoils linked
+ALL_AIRFOILS_PATH = "/search/airfoils"
+
+# Number of airfoils downloaded at once, each by its own thread with its own keep-alive connection
+DOWNLOAD_WORKERS = 8
+
+# Most requests sent to any one host per second across all the download threads, 0 for no limit
+DOWNLOAD_REQUESTS_PER_SECOND = 10
 
 # regex for finding the href for the csv file download
 CSV_FILE_REGEX = re.compile("(?<=href=\")(\S*\.csv)")
@@ -64,11 +80,13 @@ AIRFOIL_MAX_THICKNESS_REGEX = re.compile("((?<=thickness )[\d.]+?(?=%))")
 AIRFOIL_MAX_CAMBER_REGEX = re.compile("((?<=camber )[\d.]+?(?=%))")
 
 
-def get_airfoil_links():
+def get_airfoil_links(base_url=AIRFOILTOOLS_URL):
     # creates a list of the links for all airfoils listed on the main page in the following format
     # http://airfoiltools.com/airfoil/details?airfoil=airfoil_name
+    import requests
+    import bs4
     # create response object
-    all_airfoils_response = requests.get(ALL_AIRFOILS_PAGE)
+    all_airfoils_response = requests.get(base_url + ALL_AIRFOILS_PATH)
 
     # create beautiful-soup object with lxml parser
     all_airfoil_soup = bs4.BeautifulSoup(all_airfoils_response.content, "html.parser")
@@ -78,13 +96,14 @@ def get_airfoil_links():
 
     # For each link in the list (i.e. has a tag of 'a') that ends with -il, adds an element to
     # the list airfoil_links_list with the format root url + href portion
-    airfoil_links_list = [("http://airfoiltools.com" + link.get('href'))
+    airfoil_links_list = [(base_url + link.get('href'))
                           for link in link_elements if link['href'].endswith('il')]
     # print(airfoil_links_list)
     return airfoil_links_list
 
 
 def get_max_thickness_camber(airfoil_link, session):
+    import requests
     try:
         airfoil_page_text = str(session.get(airfoil_link).text)
         airfoil_max_thickness = AIRFOIL_MAX_THICKNESS_REGEX.search(airfoil_page_text).group()
@@ -96,8 +115,46 @@ def get_max_thickness_camber(airfoil_link, session):
     return [airfoil_max_thickness, airfoil_max_camber]
 
 
-def download_csv_files(all_airfoil_links, target_directory, parameters):
-    download_session = requests.Session()
+# Hands out one requests.Session per download thread (so each thread keeps its own keep-alive connection open) and
+# spaces out the requests sent to each host so no more than requests_per_second go to it (0 for no limit)
+class DownloadSessions:
+    def __init__(self, requests_per_second=DOWNLOAD_REQUESTS_PER_SECOND):
+        self.request_interval = 1 / requests_per_second if requests_per_second > 0 else 0
+        # Earliest time the next request to each host can be sent
+        self.next_request_times = {}
+        self.thread_sessions = threading.local()
+        self.all_sessions = []
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        # Same as requests.Session.get, after waiting for this host's turn
+        import requests
+        self.wait_for_turn(urllib.parse.urlsplit(url).netloc)
+        if not hasattr(self.thread_sessions, "session"):
+            self.thread_sessions.session = requests.Session()
+            with self.lock:
+                self.all_sessions.append(self.thread_sessions.session)
+        return self.thread_sessions.session.get(url)
+
+    def wait_for_turn(self, host):
+        if self.request_interval == 0:
+            return
+        with self.lock:
+            current_time = time.monotonic()
+            request_time = max(current_time, self.next_request_times.get(host, current_time))
+            self.next_request_times[host] = request_time + self.request_interval
+        if request_time > current_time:
+            time.sleep(request_time - current_time)
+
+    def close(self):
+        with self.lock:
+            for session in self.all_sessions:
+                session.close()
+            self.all_sessions = []
+
+
+def download_csv_files(all_airfoil_links, target_directory, parameters, workers=DOWNLOAD_WORKERS,
+                       requests_per_second=DOWNLOAD_REQUESTS_PER_SECOND, base_url=AIRFOILTOOLS_URL):
     # Writes a file of all airfoil links for which polar csv's should be downloaded for future reference
     all_airfoil_links_file = open(target_directory + '\\airfoils_links.txt', "w")
     for airfoil_link in all_airfoil_links:
@@ -112,7 +169,6 @@ def download_csv_files(all_airfoil_links, target_directory, parameters):
     # (one for each combination of Reynolds value and nCrit)
     csv_link_formats = []
     file_name_formats = []
-    file_name = ''  # in case of error, this should be defined to be something
 
     for value in [50000, 100000, 200000, 500000, 1000000]:
         # Parameters list is in format [nCrit Value, min Reynolds Value, max Reynolds value]
@@ -121,79 +177,104 @@ def download_csv_files(all_airfoil_links, target_directory, parameters):
 
         if parameters[1] <= value <= parameters[2]:
             if parameters[0] == 5 or parameters[0] == 0:
-                csv_link_formats.append("http://airfoiltools.com/polar/csv?polar=xf-{name}-" +
+                csv_link_formats.append(base_url + "/polar/csv?polar=xf-{name}-" +
                                         str(value) + "-n5\">xf-{name}-" + str(value) + "-n5.csv")
                 file_name_formats.append(target_directory + '\\' + "{name}" + '_R_' + str(value) + '_N_' + str(5) +
                                          '.csv')
             if parameters[0] == 9 or parameters[0] == 0:
-                csv_link_formats.append("http://airfoiltools.com/polar/csv?polar=xf-{name}-" +
+                csv_link_formats.append(base_url + "/polar/csv?polar=xf-{name}-" +
                                         str(value) + "\">xf-{name}-" + str(value) + ".csv")
                 file_name_formats.append(target_directory + '\\' + "{name}" + '_R_' + str(value) + '_N_' + str(9) +
                                          '.csv')
 
-    # For each link in the list, downloads a csv for each format in the csv_link_formats list
-    for airfoil_link in all_airfoil_links:
-        # Parses airfoil link to find airfoil name
-        airfoil_name = AIRFOIL_NAME_LINK_REGEX.search(airfoil_link).group()
-
-        thickness_camber_list = get_max_thickness_camber(airfoil_link, download_session)
-        if thickness_camber_list is None:
-            # This is a fail condition
-            for csv_link_format in csv_link_formats:
-                failed_download_file.write(csv_link_format.format(name=airfoil_name) + '\n')
-            continue
+    # Airfoils are downloaded workers at a time (see download_airfoil_csv_files), the failed links are written in the
+    # same order as the airfoils so failed_download_links.txt is the same as when they were downloaded one by one
+    download_sessions = DownloadSessions(requests_per_second)
+    download_pool = ThreadPoolExecutor(max(workers, 1))
+    try:
+        airfoil_downloads = download_pool.map(
+            lambda airfoil_link: download_airfoil_csv_files(airfoil_link, csv_link_formats, file_name_formats,
+                                                            download_sessions), all_airfoil_links)
+        for airfoil_link, failed_csv_links in zip(all_airfoil_links, airfoil_downloads):
+            if failed_csv_links is None:
+                # This is a fail condition
+                airfoil_name = AIRFOIL_NAME_LINK_REGEX.search(airfoil_link).group()
+                for csv_link_format in csv_link_formats:
+                    failed_download_file.write(csv_link_format.format(name=airfoil_name) + '\n')
+                continue
+            for csv_link in failed_csv_links:
+                failed_download_links.append(csv_link)
+                failed_download_file.write(csv_link + '\n')
+    finally:
+        # Airfoils that haven't been started aren't downloaded if something went wrong
+        download_pool.shutdown(cancel_futures=True)
+        download_sessions.close()
+        failed_download_file.close()
+    # print("Failed downloads: ")
+    # print(failed_download_links)
+
 
-        thickness_string_insert = f"Max Thickness,{thickness_camber_list[0]}\nMax Camber,{thickness_camber_list[1]}\n"
+# Downloads a csv for each format in the csv_link_formats list for one airfoil, with the max thickness and camber from
+# its details page added in, returns the list of csv links that failed or None if the details page couldn't be read
+def download_airfoil_csv_files(airfoil_link, csv_link_formats, file_name_formats, download_session):
+    import requests
+    # Parses airfoil link to find airfoil name
+    airfoil_name = AIRFOIL_NAME_LINK_REGEX.search(airfoil_link).group()
 
-        # Counter for which index of the file_name_format list should be used (the for statement iterates through the
-        # csv_link_formats so a separate counter is used
+    thickness_camber_list = get_max_thickness_camber(airfoil_link, download_session)
+    if thickness_camber_list is None:
+        return None
 
-        file_name_format_index = 0
-        for link_format in csv_link_formats:
-            # for each formattable string pair,
-            # downloads the csv at the formatted link, naming it the formatted name
+    thickness_string_insert = f"Max Thickness,{thickness_camber_list[0]}\nMax Camber,{thickness_camber_list[1]}\n"
 
-            # Flag for whether the download at this link was successful
-            failure = False
-            csv_link = link_format.format(name=airfoil_name)
+    failed_csv_links = []
+    file_name = ''  # in case of error, this should be defined to be something
+    # Counter for which index of the file_name_format list should be used (the for statement iterates through the
+    # csv_link_formats so a separate counter is used
 
-            try:
-                csv_request = download_session.get(csv_link)
-
-                if not csv_request.status_code == 200:
-                    # This means that this something went wrong (usually means there isn't a csv file for this combo)
-                    print("Status code: %s\t" % str(csv_request.status_code))
-                    failure = True
-                # print(csv_link)
-                # print(file_name)
-                if not failure:
-                    # Edits response to add the camber and thickness to the csv
-                    csv_request_split = csv_request.text.split("Url")
-                    csv_edited = csv_request_split[0] + thickness_string_insert + csv_request_split[1]
-
-                    file_name = file_name_formats[file_name_format_index].format(name=airfoil_name)
-                    csv_file = open(file_name, "w")
-                    csv_file.write(csv_edited)
-                    csv_file.close()
-
-            except requests.exceptions.RequestException as e:
-                print(str(e) + "\n")
-                failure = True
-            except PermissionError:
-                print("Permission error\nPlease close %s to be able to edit this file" % file_name)
-            if failure:
-                print("Failed to download %s\n" % csv_link)
-                failed_download_links.append(csv_link)
-                failed_download_file.write(csv_link + '\n')
+    file_name_format_index = 0
+    for link_format in csv_link_formats:
+        # for each formattable string pair,
+        # downloads the csv at the formatted link, naming it the formatted name
 
-            file_name_format_index += 1
+        # Flag for whether the download at this link was successful
+        failure = False
+        csv_link = link_format.format(name=airfoil_name)
 
-    failed_download_file.close()
-    # print("Failed downloads: ")
-    # print(failed_download_links)
+        try:
+            csv_request = download_session.get(csv_link)
+
+            if not csv_request.status_code == 200:
+                # This means that this something went wrong (usually means there isn't a csv file for this combo)
+                print("Status code: %s\t" % str(csv_request.status_code))
+                failure = True
+            # print(csv_link)
+            # print(file_name)
+            if not failure:
+                # Edits response to add the camber and thickness to the csv
+                csv_request_split = csv_request.text.split("Url")
+                csv_edited = csv_request_split[0] + thickness_string_insert + csv_request_split[1]
+
+                file_name = file_name_formats[file_name_format_index].format(name=airfoil_name)
+                csv_file = open(file_name, "w")
+                csv_file.write(csv_edited)
+                csv_file.close()
+
+        except requests.exceptions.RequestException as e:
+            print(str(e) + "\n")
+            failure = True
+        except PermissionError:
+            print("Permission error\nPlease close %s to be able to edit this file" % file_name)
+        if failure:
+            print("Failed to download %s\n" % csv_link)
+            failed_csv_links.append(csv_link)
+
+        file_name_format_index += 1
+    return failed_csv_links
 
 
 def download_csv_link_list(target_directory, csv_link_list):
+    import requests
     download_session = requests.Session()
     # Given a list of csv_links, will download them
     for csv_link in csv_link_list:
@@ -276,11 +357,11 @@ def prompt_file(prompt):
             print("This file appears to not exist, please try again hombre\n")
 
 
-def parse_airfoils_from_list(file_path):
+def parse_airfoils_from_list(file_path, base_url=AIRFOILTOOLS_URL):
     # Given a file that contains a list of name of airfoils separated by new lines(either containing or missing -il)
     # will return a list of links of the airfoils
     airfoil_file = open(file_path, "r")
-    link_format_string = "http://airfoiltools.com/airfoil/details?airfoil={airfoil_name}"
+    link_format_string = base_url + "/airfoil/details?airfoil={airfoil_name}"
 
     # If the line is just a name with -il, formats it using the format string (minus the \n character)
     # If the line is a name without -il, adds it then formats
@@ -294,6 +375,19 @@ def parse_airfoils_from_list(file_path):
 
 
 if __name__ == "__main__":
+    argument_parser = argparse.ArgumentParser(description="Downloads polar csv files from airfoiltools.com")
+    argument_parser.add_argument("--workers", type=int, default=DOWNLOAD_WORKERS,
+                                 help=f"number of airfoils downloaded at once (default {DOWNLOAD_WORKERS})")
+    argument_parser.add_argument("--requests-per-second", type=float, default=DOWNLOAD_REQUESTS_PER_SECOND,
+                                 help="most requests sent to the site per second, 0 for no limit "
+                                      f"(default {DOWNLOAD_REQUESTS_PER_SECOND})")
+    argument_parser.add_argument("--base-url", default=AIRFOILTOOLS_URL,
+                                 help="site to download from instead of airfoiltools.com (i.e. a local server with "
+                                      "saved copies of its pages)")
+    command_line_arguments = argument_parser.parse_args()
+    base_url = command_line_arguments.base_url.rstrip("/")
+
+    from tkinter import Tk
     # Creates a tkinter gui to prompt a directory
     root = Tk()
     prompt_directory_gui = PromptFileGui(root, "directory")
@@ -321,7 +415,7 @@ if __name__ == "__main__":
             root.destroy()
 
             try:
-                airfoil_links = parse_airfoils_from_list(airfoil_list_file_name)
+                airfoil_links = parse_airfoils_from_list(airfoil_list_file_name, base_url)
                 break
             except PermissionError:
                 print("This file could not be opened, please close it and select this or another list\n")
@@ -333,16 +427,17 @@ if __name__ == "__main__":
 
     # create the list of links of the airfoils if one wasn't explicitly given
     if airfoil_links is None:
-        airfoil_links = get_airfoil_links()
+        airfoil_links = get_airfoil_links(base_url)
 
     print("List of %d airfoil links created\n" % len(airfoil_links))
-    print("Beginning download, please leave this running undisturbed, the longest this\n"
-          "process has ran for me is about two hours, but your mileage may vary\n"
-          "depending on computer specs/network connection, etc.\n")
+    print("Beginning download of %d airfoils at a time, please leave this running undisturbed, downloading them\n"
+          "one at a time took about two hours, but your mileage may vary\n"
+          "depending on computer specs/network connection, etc.\n" % max(command_line_arguments.workers, 1))
 
     # downloads a list of all csv links matching parameters, creates list of all airfoil links, creates list of all
     # downloaded csv files
-    download_csv_files(airfoil_links, directory_path, search_parameters)
+    download_csv_files(airfoil_links, directory_path, search_parameters, command_line_arguments.workers,
+                       command_line_arguments.requests_per_second, base_url)
 
     print("Download Complete")
     input("Press enter to close")
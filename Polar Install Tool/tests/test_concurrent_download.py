@@ -0,0 +1,162 @@
+# Tests for the concurrent download against a local stand-in for airfoiltools.com, which serves the recorded pages in
+# airfoil_site (the airfoil list, a details page for each airfoil and the polar csv files, with some polars left out so
+# there are failed downloads)
+# Run with: python -m pytest "Polar Install Tool/tests"
+import http.server
+import importlib.util
+import os
+import tempfile
+import threading
+import time
+import unittest
+import urllib.parse
+
+TESTS_DIRECTORY_PATH = os.path.dirname(os.path.abspath(__file__))
+INSTALL_TOOL_PATH = os.path.join(os.path.dirname(TESTS_DIRECTORY_PATH), "Polar Install Tool.py")
+AIRFOIL_SITE_DIRECTORY_PATH = os.path.join(TESTS_DIRECTORY_PATH, "airfoil_site")
+
+# nCrit 5 and 9 at Reynolds numbers 100000 and 200000
+SEARCH_PARAMETERS = [0, 100000, 200000]
+
+# The polars that aren't in airfoil_site/polars, in the order the airfoils are listed
+EXPECTED_FAILED_POLARS = ["xf-naca2412-il-100000-n5", "xf-naca2412-il-200000-n5", "xf-s1223-il-200000-n5"]
+
+
+# The install tool's file name has spaces in it so it can't be imported normally
+def load_install_tool():
+    module_spec = importlib.util.spec_from_file_location("polar_install_tool", INSTALL_TOOL_PATH)
+    install_tool = importlib.util.module_from_spec(module_spec)
+    module_spec.loader.exec_module(install_tool)
+    return install_tool
+
+
+install_tool = load_install_tool()
+
+
+# Serves the pages in airfoil_site the way airfoiltools.com lays them out (404 for anything that isn't there), records
+# when each request came in and holds back the details pages of the airfoils in slow_airfoils for that many seconds
+class StandInAirfoilSite:
+    def __init__(self):
+        self.request_times = []
+        self.slow_airfoils = {}
+        self.lock = threading.Lock()
+        stand_in_site = self
+
+        class AirfoilSiteHandler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with stand_in_site.lock:
+                    stand_in_site.request_times.append(time.monotonic())
+                request_url = urllib.parse.urlsplit(self.path)
+                query = urllib.parse.parse_qs(request_url.query)
+                page_path = None
+                if request_url.path == "/search/airfoils":
+                    page_path = os.path.join(AIRFOIL_SITE_DIRECTORY_PATH, "search_airfoils.html")
+                elif request_url.path == "/airfoil/details":
+                    airfoil_name = query.get("airfoil", [""])[0]
+                    time.sleep(stand_in_site.slow_airfoils.get(airfoil_name, 0))
+                    page_path = os.path.join(AIRFOIL_SITE_DIRECTORY_PATH, "details", airfoil_name + ".html")
+                elif request_url.path == "/polar/csv":
+                    # The install tool asks for polar=xf-<name>-<reynolds>[-n5]">xf-...csv, only the part before the
+                    # quote is the polar key
+                    polar_key = query.get("polar", [""])[0].split('"')[0]
+                    page_path = os.path.join(AIRFOIL_SITE_DIRECTORY_PATH, "polars", polar_key + ".csv")
+                if page_path is None or not os.path.isfile(page_path):
+                    self.send_error(404)
+                    return
+                with open(page_path, "rb") as page_file:
+                    page_contents = page_file.read()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/csv" if page_path.endswith(".csv") else "text/html")
+                self.send_header("Content-Length", str(len(page_contents)))
+                self.end_headers()
+                self.wfile.write(page_contents)
+
+            def log_message(self, *arguments):
+                pass
+
+        self.http_server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), AirfoilSiteHandler)
+        self.base_url = f"http://127.0.0.1:{self.http_server.server_port}"
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.http_server.shutdown()
+        self.http_server.server_close()
+
+
+class ConcurrentDownloadTest(unittest.TestCase):
+    def setUp(self):
+        self.stand_in_site = StandInAirfoilSite()
+        self.temporary_directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.stand_in_site.close()
+        self.temporary_directory.cleanup()
+
+    # Downloads every listed airfoil into a new directory and returns {relative file path: file contents} for all
+    # the files written (download_csv_files joins paths with a backslash so on Linux the files end up next to the
+    # target directory instead of in it, both places are read)
+    def download(self, run_name, workers, requests_per_second=0):
+        run_directory_path = os.path.join(self.temporary_directory.name, run_name)
+        target_directory_path = os.path.join(run_directory_path, "polars")
+        os.makedirs(target_directory_path)
+        airfoil_links = install_tool.get_airfoil_links(self.stand_in_site.base_url)
+        install_tool.download_csv_files(airfoil_links, target_directory_path, SEARCH_PARAMETERS, workers,
+                                        requests_per_second, self.stand_in_site.base_url)
+
+        downloaded_files = {}
+        for directory_path, _, file_names in os.walk(run_directory_path):
+            for file_name in file_names:
+                file_path = os.path.join(directory_path, file_name)
+                with open(file_path, "r") as downloaded_file:
+                    downloaded_files[os.path.relpath(file_path, run_directory_path)] = downloaded_file.read()
+        return downloaded_files
+
+    def test_airfoil_links_are_read_from_the_list_page(self):
+        self.assertEqual(install_tool.get_airfoil_links(self.stand_in_site.base_url),
+                         [self.stand_in_site.base_url + "/airfoil/details?airfoil=" + airfoil_name
+                          for airfoil_name in ["e387-il", "naca2412-il", "s1223-il"]])
+
+    def test_workers_write_the_same_files(self):
+        one_worker_files = self.download("one_worker", 1)
+        # Holds back the first airfoil so the others finish before it
+        self.stand_in_site.slow_airfoils["e387-il"] = 0.3
+        several_worker_files = self.download("several_workers", 3)
+
+        self.assertEqual(sorted(one_worker_files), sorted(several_worker_files))
+        for file_path, file_contents in one_worker_files.items():
+            self.assertEqual(file_contents, several_worker_files[file_path], file_path)
+
+        # 3 airfoils * 4 polars - the 3 missing ones, plus the link lists
+        self.assertEqual(len(one_worker_files), 9 + 2)
+        failed_download_links = [file_contents for file_path, file_contents in one_worker_files.items()
+                                 if file_path.endswith("failed_download_links.txt")]
+        self.assertEqual(len(failed_download_links), 1)
+        self.assertEqual([urllib.parse.urlsplit(csv_link).query.split('"')[0][len("polar="):]
+                          for csv_link in failed_download_links[0].splitlines()], EXPECTED_FAILED_POLARS)
+
+        # The max thickness and camber from the details page take the place of the Url label
+        e387_file_contents = [file_contents for file_path, file_contents in one_worker_files.items()
+                              if file_path.endswith("e387-il_R_100000_N_9.csv")][0]
+        self.assertIn("Max Cl/Cd alpha,7.5\nMax Thickness,9.1\nMax Camber,3.2\n,http", e387_file_contents)
+
+    def test_requests_per_second_spaces_out_requests(self):
+        requests_per_second = 20
+        self.download("limited", 3, requests_per_second)
+        request_times = sorted(self.stand_in_site.request_times)
+
+        # The list page, then a details page and 4 polars for each airfoil
+        self.assertEqual(len(request_times), 1 + 3 * 5)
+        # Only the download is limited, not the list page
+        download_request_times = request_times[1:]
+        request_interval = 1 / requests_per_second
+        self.assertGreaterEqual(download_request_times[-1] - download_request_times[0],
+                                0.9 * request_interval * (len(download_request_times) - 1))
+        # Some leeway is given for when the requests get to the server
+        for earlier_request_time, later_request_time in zip(download_request_times, download_request_times[1:]):
+            self.assertGreaterEqual(later_request_time - earlier_request_time, 0.5 * request_interval)
+
+
+if __name__ == "__main__":
+    unittest.main()